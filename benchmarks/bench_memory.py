@@ -0,0 +1,187 @@
+"""Бенчмарк памяти, которую занимает загруженный каталог тестов.
+
+Запуск: python -m benchmarks.bench_memory [--tests N] [--questions N]
+    [--unique N]
+
+Строит синтетический каталог: --tests тестов по --questions вопросов,
+вопросы выбираются из --unique различных вопросов, тексты кнопок - из
+небольшого набора ("Да", "Нет", "True", "False", числа). Каждый тест
+разбирается из своей json-строки, как при чтении файла с диска, поэтому
+одинаковые строки разных тестов изначально являются разными объектами.
+
+Каталог загружается двумя способами:
+    plain - Test и Question создаются напрямую: у каждого вопроса свои
+        строки и своя клавиатура;
+    builder - BuilderTest.build_test: общие экземпляры строк, клавиатур и
+        одинаковых вопросов (src/interning.py).
+Для каждого способа выводятся память, которую занимает каталог
+(tracemalloc после сборки мусора), память на вопрос и время загрузки.
+Дополнительно выводится размер экземпляра Question со __slots__ и
+такого же объекта с __dict__.
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+from unittest.mock import patch
+
+os.environ.setdefault("TELEGRAM_TOKEN", "123:benchmark")
+
+from src.builder import BuilderTest  # noqa: E402
+from src.interning import Questions, _get_button, get_markup  # noqa: E402
+from src.question import Question  # noqa: E402
+from src.test import Test  # noqa: E402
+
+LABELS = [
+    ["Да", "Нет"],
+    ["True", "False"],
+    ["1", "2", "3", "4"],
+    ["Да", "Нет", "Не знаю"],
+]
+
+
+def _create_question(number: int) -> dict[str, Any]:
+    labels = LABELS[number % len(LABELS)]
+    if number % 3 == 0:
+        return {"body": f"Вопрос {number}", "answer": str(number)}
+    elif number % 3 == 1:
+        return {
+            "body": {"text": f"Вопрос {number}"},
+            "widget": {"type": "button", "body": labels},
+            "answer": number % len(labels) + 1,
+            "answer_explanation": "Объяснение ответа.",
+        }
+    return {
+        "body": f"Вопрос {number}",
+        "widget": {"type": "checkbox", "body": labels},
+        "answer": [1, len(labels)],
+    }
+
+
+def _create_catalog(tests: int, questions: int, unique: int) -> list[str]:
+    random.seed(tests)
+    pool = [_create_question(number) for number in range(unique)]
+    return [
+        json.dumps(
+            {
+                "command": f"/test_{number:07d}",
+                "name": f"Тест {number}",
+                "description": "Описание теста.",
+                "questions": random.choices(pool, k=questions),
+                "result_explanation": {"0": "Плохо", str(questions // 2): "Хорошо"},
+            },
+            ensure_ascii=False,
+        )
+        for number in range(tests)
+    ]
+
+
+def _load_plain(catalog: list[str]) -> list[Test]:
+    tests = []
+    for text in catalog:
+        content = json.loads(text)
+        questions = [
+            Question(
+                question["body"],
+                question.get("widget"),
+                question["answer"],
+                question.get("answer_explanation"),
+            )
+            for question in content["questions"]
+        ]
+        tests.append(
+            Test(
+                content["command"],
+                content["name"],
+                content.get("description"),
+                questions,
+                content.get("result_explanation"),
+            )
+        )
+    return tests
+
+
+def _load_builder(catalog: list[str]) -> list[Test]:
+    # BuilderTest - одиночка, __init__ читает PATH_OF_DATA
+    builder: BuilderTest = BuilderTest.__new__(BuilderTest)
+    return [
+        builder.build_test(1, number, json.loads(text), [])
+        for number, text in enumerate(catalog)
+    ]
+
+
+def _measure(
+    load: Callable[[list[str]], list[Test]], catalog: list[str]
+) -> tuple[list[Test], int, float]:
+    get_markup.cache_clear()
+    _get_button.cache_clear()
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    tests = load(catalog)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tests, current, elapsed
+
+
+def _instance_sizes() -> tuple[int, int]:
+    question = Question("Вопрос", {"type": "button", "body": ["Да", "Нет"]}, 1, None)
+    question.prepare()
+    fields = {slot: getattr(question, slot) for slot in Question.__slots__[:-1]}
+    with_dict = type("DictQuestion", (), {})()
+    with_dict.__dict__.update(fields)
+    return sys.getsizeof(question), sys.getsizeof(with_dict) + sys.getsizeof(
+        with_dict.__dict__
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tests", type=int, default=10000)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--unique", type=int, default=5000)
+    arguments = parser.parse_args()
+
+    catalog = _create_catalog(arguments.tests, arguments.questions, arguments.unique)
+    questions_number = arguments.tests * arguments.questions
+    print(
+        f"тестов: {arguments.tests}, вопросов: {questions_number}, "
+        f"различных вопросов: {arguments.unique}"
+    )
+    print(f"{'':<10}{'МБ':>10}{'байт/вопрос':>14}{'загрузка, с':>14}")
+
+    # Без общих клавиатур: каждый вопрос строит свою клавиатуру
+    with patch("src.question.get_markup", get_markup.__wrapped__):
+        plain, plain_memory, plain_time = _measure(_load_plain, catalog)
+    del plain
+    # built удерживает вопросы в пуле до вывода результатов
+    built, built_memory, built_time = _measure(_load_builder, catalog)
+
+    for name, memory, elapsed in [
+        ("plain", plain_memory, plain_time),
+        ("builder", built_memory, built_time),
+    ]:
+        print(
+            f"{name:<10}{memory / 2**20:10.1f}{memory / questions_number:14.0f}"
+            f"{elapsed:14.3f}"
+        )
+    print(
+        f"экономия: {1 - built_memory / plain_memory:.0%}, "
+        f"общих вопросов в пуле: {len(Questions)}, "
+        f"клавиатур: {get_markup.cache_info().currsize}"
+    )
+
+    slotted, with_dict = _instance_sizes()
+    print(f"экземпляр Question: {slotted} байт (с __dict__ было бы {with_dict})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Микробенчмарк формирования сообщений при ответе на вопрос и окончании теста.
+
+Запуск: python -m benchmarks.bench_messages [количество повторений]
+
+Бот и redis подменяются заглушками, поэтому замеряется только работа,
+которую выполняют Question.check и Test._finish.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from typing import Any, Awaitable, Callable
+from unittest.mock import patch
+
+os.environ.setdefault("TELEGRAM_TOKEN", "123:benchmark")
+
+from src.question import Question  # noqa: E402
+from src.test import Test  # noqa: E402
+
+
+class _FakeUser:
+    """Хранит пользовательские поля в словаре вместо redis."""
+
+    def __init__(self) -> None:
+        self.fields: dict[str, str] = {}
+
+    def get(self, from_user_id: int, field: str) -> str:
+        return self.fields[field]
+
+    def set(self, from_user_id: int, **kwargs: Any) -> None:
+        for key, value in kwargs.items():
+            self.fields[key] = str(value)
+
+    def delete(self, from_user_id: int, *args: str) -> None:
+        for arg in args:
+            self.fields.pop(arg, None)
+
+
+async def _send(*args: Any, **kwargs: Any) -> None:
+    return None
+
+
+def _create_test(questions_number: int) -> Test:
+    questions = []
+    for number in range(questions_number):
+        if number % 3 == 0:
+            questions.append(
+                Question(f"Вопрос {number}", {"type": "input"}, "Ответ", None)
+            )
+        elif number % 3 == 1:
+            questions.append(
+                Question(
+                    {"text": f"Вопрос {number}"},
+                    {"type": "button", "body": ["Да", "Нет"]},
+                    1,
+                    "Надо было нажать «Да».",
+                )
+            )
+        else:
+            questions.append(
+                Question(
+                    {"text": f"Вопрос {number}", "url": "photo.png"},
+                    {"type": "checkbox", "body": ["1", "2", "3", "4"]},
+                    [1, 3],
+                    {"text": "Надо было выбрать 1 и 3.", "url": "smile.png"},
+                )
+            )
+
+    return Test(
+        "/test_benchmark",
+        "Бенчмарк",
+        {"text": "Описание", "url": "photo.png"},
+        questions,
+        {str(key): f"Объяснение {key}" for key in range(0, questions_number, 3)},
+    )
+
+
+async def _measure(
+    name: str, repeat: int, function: Callable[[int], Awaitable[None]]
+) -> None:
+    start = time.perf_counter()
+    for number in range(repeat):
+        await function(number)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<20} {elapsed / repeat * 1e6:8.2f} мкс/вызов")
+
+
+async def _run(repeat: int) -> None:
+    user = _FakeUser()
+    test = _create_test(30)
+    prepare = getattr(test, "prepare", None)
+    if prepare is not None:
+        prepare()
+    answers: list[Any] = ["Ответ", "Да", [1, 3], "Неверно", "Нет", [2]]
+
+    async def check(number: int) -> None:
+        user.fields["question_index"] = "0"
+        user.fields["right_answers_number"] = "0"
+        question = test.questions[number % 3]
+        await question.check(1, answers[number % 3 + 3 * (number % 2)])
+
+    async def finish(number: int) -> None:
+        user.fields["question_index"] = str(number % 30)
+        user.fields["right_answers_number"] = str(number % 31)
+        await test._finish(1, is_stop=bool(number % 2))
+
+    with patch("src.question.User", user), patch("src.test.User", user), patch(
+        "src.question.bot.send_message", _send
+    ), patch("src.question.bot.send_photo", _send), patch(
+        "src.test.bot.send_message", _send
+    ), patch(
+        "src.test.bot.send_photo", _send
+    ):
+        await _measure("Question.check", repeat, check)
+        await _measure("Test._finish", repeat, finish)
+
+
+def main() -> None:
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    asyncio.run(_run(repeat))
+
+
+if __name__ == "__main__":
+    main()
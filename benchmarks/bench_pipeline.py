@@ -0,0 +1,287 @@
+"""Бенчмарк сквозной обработки: прохождение теста и создание теста через /create.
+
+Запуск: python -m benchmarks.bench_pipeline [--sessions N] [--concurrency N]
+    [--save-baseline] [--max-regression ДОЛЯ]
+
+Воспроизводит синтетические сессии пользователей:
+    answer - Test.start -> Test.check (Question.check и Question.__call__)
+        для каждого вопроса -> Test._finish;
+    create - последовательность сообщений конструктора теста (src/graph.py)
+        от команды /create до сохранения теста.
+Сессии выполняются одновременно (не больше --concurrency). Вместо redis
+используется FakeStrictRedis, вместо бота - заглушка, записывающая вызовы,
+сохранение созданного теста на диск заменено заглушкой, журнал ответов
+пишется во временный каталог.
+
+Для каждого сценария выводятся обновления в секунду, задержка p50/p99 и
+память, выделенная за прогон (tracemalloc, отдельный прогон). Результаты
+сравниваются с сохраненными в benchmarks/baselines/bench_pipeline.json;
+при ухудшении больше --max-regression команда завершается с кодом 1.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import ExitStack
+from typing import Any, Awaitable, Callable
+from unittest.mock import patch
+
+os.environ.setdefault("TELEGRAM_TOKEN", "123:benchmark")
+
+from fakeredis import FakeStrictRedis  # noqa: E402
+
+from src.answers import AnswerLog  # noqa: E402
+from src.constants import REDIS_SETTINGS  # noqa: E402
+from src.graph import STATES  # noqa: E402
+from src.question import Question  # noqa: E402
+from src.test import Test  # noqa: E402
+from src.user import User  # noqa: E402
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(__file__), "baselines", "bench_pipeline.json"
+)
+
+# Сообщения конструктора теста после /create (состояния 0 -> 22)
+CREATE_MESSAGES = [
+    "/test_benchmark_{user_id}",
+    "Бенчмарк",
+    "Нет",
+    "Вопрос",
+    "Нет",
+    "input",
+    "Ответ",
+    "Нет",
+    "Нет",
+    "Нет",
+]
+
+Session = Callable[[int, list[float]], Awaitable[None]]
+
+
+class _RecordingBot:
+    """Заглушка бота, которая записывает количество вызовов каждого метода."""
+
+    def __init__(self) -> None:
+        self.calls: Counter[str] = Counter()
+
+    async def send_message(self, *args: Any, **kwargs: Any) -> None:
+        self.calls["send_message"] += 1
+
+    async def send_photo(self, *args: Any, **kwargs: Any) -> None:
+        self.calls["send_photo"] += 1
+
+
+class _FakeBuilderTest:
+    """Заглушка BuilderTest, которая не сохраняет тест на диск."""
+
+    created = 0
+
+    async def create_test(
+        self, from_user_id: int, file_content: dict[str, Any]
+    ) -> None:
+        _FakeBuilderTest.created += 1
+
+
+def _create_test(questions_number: int) -> Test:
+    questions = []
+    for number in range(questions_number):
+        if number % 3 == 0:
+            questions.append(
+                Question(f"Вопрос {number}", {"type": "input"}, "Ответ", None)
+            )
+        elif number % 3 == 1:
+            questions.append(
+                Question(
+                    {"text": f"Вопрос {number}"},
+                    {"type": "button", "body": ["Да", "Нет"]},
+                    1,
+                    "Надо было нажать «Да».",
+                )
+            )
+        else:
+            questions.append(
+                Question(
+                    {"text": f"Вопрос {number}", "url": "photo.png"},
+                    {"type": "checkbox", "body": ["1", "2", "3", "4"]},
+                    [1, 3],
+                    {"text": "Надо было выбрать 1 и 3.", "url": "smile.png"},
+                )
+            )
+
+    return Test(
+        "/test_benchmark",
+        "Бенчмарк",
+        {"text": "Описание", "url": "photo.png"},
+        questions,
+        {str(key): f"Объяснение {key}" for key in range(0, questions_number, 3)},
+    )
+
+
+async def _timed(latencies: list[float], coroutine: Awaitable[None]) -> None:
+    start = time.perf_counter()
+    await coroutine
+    latencies.append(time.perf_counter() - start)
+
+
+def _answer_session(test: Test) -> Session:
+    answers: list[Any] = ["Ответ", "Да", [1, 3], "Неверно", "Нет", [2]]
+
+    async def session(user_id: int, latencies: list[float]) -> None:
+        await _timed(latencies, test.start(user_id))
+        for number in range(len(test.questions)):
+            answer = answers[number % 3 + 3 * ((user_id + number) % 2)]
+            await _timed(latencies, test.check(user_id, answer))
+            # Даем выполниться другим сессиям, как между сообщениями пользователя
+            await asyncio.sleep(0)
+
+    return session
+
+
+async def _create_session(user_id: int, latencies: list[float]) -> None:
+    User.set(user_id, state="0")
+    await _timed(latencies, STATES[0].send(user_id))
+    for message in CREATE_MESSAGES:
+        state = int(User.get(user_id, "state"))
+        text = message.format(user_id=user_id)
+
+        async def update() -> None:
+            await STATES[state].handle(user_id, text)
+            await STATES[int(User.get(user_id, "state"))].send(user_id)
+
+        await _timed(latencies, update())
+        await asyncio.sleep(0)
+
+
+async def _run_sessions(
+    session: Session, sessions: int, concurrency: int
+) -> tuple[float, list[float]]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def run(user_id: int) -> None:
+        async with semaphore:
+            await session(user_id, latencies)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(user_id) for user_id in range(1, sessions + 1)))
+    return time.perf_counter() - start, latencies
+
+
+async def _measure(
+    name: str, session: Session, sessions: int, concurrency: int
+) -> dict[str, float]:
+    User.redis_ = FakeStrictRedis(**REDIS_SETTINGS)
+    elapsed, latencies = await _run_sessions(session, sessions, concurrency)
+    quantiles = statistics.quantiles(latencies, n=100)
+
+    User.redis_ = FakeStrictRedis(**REDIS_SETTINGS)
+    tracemalloc.start()
+    await _run_sessions(session, max(sessions // 10, 1), concurrency)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "updates_per_second": len(latencies) / elapsed,
+        "p50_us": quantiles[49] * 1e6,
+        "p99_us": quantiles[98] * 1e6,
+        "peak_kib": peak / 1024,
+    }
+
+
+def _compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    max_regression: float,
+) -> bool:
+    """Печатает изменения относительно базовых значений.
+
+    Возвращает: True, если ни одна метрика не ухудшилась больше max_regression
+    """
+    is_ok = True
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(name, {}).get(metric)
+            if not base:
+                continue
+            change = (value - base) / base
+            # Для обновлений в секунду ухудшение - это уменьшение
+            regression = -change if metric == "updates_per_second" else change
+            mark = ""
+            if regression > max_regression:
+                mark = "  <- регрессия"
+                is_ok = False
+            print(f"{name + '.' + metric:<32} {change:+8.1%}{mark}")
+    return is_ok
+
+
+async def _run(arguments: argparse.Namespace) -> dict[str, dict[str, float]]:
+    recording_bot = _RecordingBot()
+    test = _create_test(30)
+    scenarios: dict[str, Session] = {
+        "answer": _answer_session(test),
+        "create": _create_session,
+    }
+
+    results = {}
+    with ExitStack() as stack:
+        for module in ("src.test", "src.question", "src.graph", "src.handlers"):
+            stack.enter_context(patch(module + ".bot", recording_bot))
+        stack.enter_context(patch("src.graph.BuilderTest", _FakeBuilderTest))
+        directory = stack.enter_context(tempfile.TemporaryDirectory())
+        stack.enter_context(
+            patch(
+                "src.test.answers",
+                AnswerLog(os.path.join(directory, "answers.jsonl"), 1000, 1.0),
+            )
+        )
+
+        for name, session in scenarios.items():
+            results[name] = await _measure(
+                name, session, arguments.sessions, arguments.concurrency
+            )
+
+    print(
+        f"сессий: {arguments.sessions}, одновременно: {arguments.concurrency}, "
+        f"вызовов бота: {sum(recording_bot.calls.values())}, "
+        f"создано тестов: {_FakeBuilderTest.created}"
+    )
+    for name, metrics in results.items():
+        print(
+            f"{name:<8} {metrics['updates_per_second']:10.0f} обн/с"
+            f"  p50 {metrics['p50_us']:8.1f} мкс  p99 {metrics['p99_us']:8.1f} мкс"
+            f"  память {metrics['peak_kib']:8.1f} КиБ"
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    arguments = parser.parse_args()
+
+    results = asyncio.run(_run(arguments))
+
+    if arguments.save_baseline:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=4, sort_keys=True)
+            file.write("\n")
+    elif os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if not _compare(results, baseline, arguments.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Бенчмарк маршрутизации входящих обновлений.
+
+Запуск: python -m benchmarks.bench_routing [количество повторений]
+
+Обновления проходят через Application.process_update со всеми
+обработчиками бота. Отправка сообщений заменена заглушкой, а redis -
+FakeStrictRedis, поэтому замеряется выбор обработчика, обращения к
+пользовательским данным и работа самого обработчика.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any
+from unittest.mock import patch
+
+os.environ.setdefault("TELEGRAM_TOKEN", "123:benchmark")
+
+from fakeredis import FakeStrictRedis  # noqa: E402
+from telegram import Chat, Message, MessageEntity, Update  # noqa: E402
+from telegram import User as TelegramUser  # noqa: E402
+
+from main import create_application  # noqa: E402
+from src.constants import REDIS_SETTINGS  # noqa: E402
+from src.user import User  # noqa: E402
+
+MESSAGES = [
+    "/start",
+    "/help",
+    "/list 1-10",
+    "/test_benchmark",
+    "/my_tests",
+    "просто текст",
+]
+
+
+class _CountingRedis(FakeStrictRedis):  # type: ignore
+    """FakeStrictRedis, считающий количество команд."""
+
+    commands = 0
+
+    def execute_command(self, *args: Any, **kwargs: Any) -> Any:
+        _CountingRedis.commands += 1
+        return super().execute_command(*args, **kwargs)
+
+
+async def _send(*args: Any, **kwargs: Any) -> None:
+    return None
+
+
+def _create_update(update_id: int, text: str, application: Any) -> Update:
+    user = TelegramUser(id=1, is_bot=False, first_name="Иван", last_name="Иванов")
+    entities = []
+    if text.startswith("/"):
+        entities.append(
+            MessageEntity(MessageEntity.BOT_COMMAND, 0, len(text.split(maxsplit=1)[0]))
+        )
+    message = Message(
+        message_id=update_id,
+        date=datetime.now(),
+        chat=Chat(1, Chat.PRIVATE),
+        from_user=user,
+        text=text,
+        entities=entities,
+    )
+    message.set_bot(application.bot)
+    return Update(update_id, message=message)
+
+
+async def _run(repeat: int) -> None:
+    User.redis_ = _CountingRedis(**REDIS_SETTINGS)
+    application = create_application()
+    # Инициализация обращается к Telegram, для бенчмарка она не нужна.
+    application._initialized = True
+    application.bot._bot_user = TelegramUser(
+        id=0, is_bot=True, first_name="Бот", username="benchmark_bot"
+    )
+
+    updates = [
+        _create_update(number, text, application)
+        for number, text in enumerate(MESSAGES)
+    ]
+
+    with patch("src.bot.bot.send_message", _send):
+        start = time.perf_counter()
+        for number in range(repeat):
+            await application.process_update(updates[number % len(updates)])
+        elapsed = time.perf_counter() - start
+
+    print(f"{'process_update':<20} {elapsed / repeat * 1e6:8.2f} мкс/обновление")
+    print(f"{'redis':<20} {_CountingRedis.commands / repeat:8.2f} команд/обновление")
+
+
+def main() -> None:
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    asyncio.run(_run(repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Микробенчмарк индекса тестов: CommandsTestTree и альтернативы.
+
+Запуск: python -m benchmarks.bench_tree [размер ...] (по умолчанию 1000 10000 100000)
+
+Для каждого размера замеряются вставка, поиск, упорядоченный обход и
+удаление половины команд (в случайном порядке) для:
+    tree - CommandsTestTree (красно-черное дерево из src/tree.py);
+    dict+bisect - словарь и отсортированный список команд;
+    sortedcontainers - SortedDict (если пакет sortedcontainers установлен).
+Для дерева дополнительно выводится глубина и проверяются свойства
+красно-черного дерева после вставок и после удалений.
+"""
+
+import bisect
+import os
+import random
+import sys
+import time
+from math import log2
+from typing import Any, Callable, Optional
+
+os.environ.setdefault("TELEGRAM_TOKEN", "123:benchmark")
+
+from src.test import Test  # noqa: E402
+from src.tree import ColorTree, CommandsTestTree, Node  # noqa: E402
+
+try:
+    from sortedcontainers import SortedDict
+except ImportError:  # pragma: no cover
+    SortedDict = None
+
+
+class _TreeIndex:
+    name = "tree"
+
+    def __init__(self) -> None:
+        # CommandsTestTree - одиночка, для бенчмарка нужны отдельные деревья
+        self.tree: CommandsTestTree = CommandsTestTree.__new__(CommandsTestTree)
+        self.tree.__init__()  # type: ignore
+
+    def insert(self, test: Test) -> None:
+        self.tree.append(Node(test))
+
+    def search(self, test: Test) -> Optional[Test]:
+        node = self.tree.search(Node(test))
+        return node.key if node else None
+
+    def delete(self, test: Test) -> None:
+        node = self.tree.search(Node(test))
+        if node:
+            self.tree.delete(node)
+
+    def iterate(self) -> list[str]:
+        # sort() кэширует результат, поэтому обход вызывается напрямую
+        result: list[str] = []
+        self.tree._inorder_tree_walk(self.tree.root, result)
+        return result
+
+
+class _BisectIndex:
+    name = "dict+bisect"
+
+    def __init__(self) -> None:
+        self.tests: dict[str, Test] = {}
+        self.commands: list[str] = []
+
+    def insert(self, test: Test) -> None:
+        self.tests[test.command] = test
+        bisect.insort(self.commands, test.command)
+
+    def search(self, test: Test) -> Optional[Test]:
+        return self.tests.get(test.command)
+
+    def delete(self, test: Test) -> None:
+        if self.tests.pop(test.command, None) is not None:
+            del self.commands[bisect.bisect_left(self.commands, test.command)]
+
+    def iterate(self) -> list[str]:
+        tests = self.tests
+        return [command + " - " + tests[command].name for command in self.commands]
+
+
+class _SortedDictIndex:
+    name = "sortedcontainers"
+
+    def __init__(self) -> None:
+        self.tests = SortedDict()
+
+    def insert(self, test: Test) -> None:
+        self.tests[test.command] = test
+
+    def search(self, test: Test) -> Optional[Test]:
+        # sortedcontainers не типизирован
+        found: Optional[Test] = self.tests.get(test.command)
+        return found
+
+    def delete(self, test: Test) -> None:
+        self.tests.pop(test.command, None)
+
+    def iterate(self) -> list[str]:
+        return [command + " - " + test.name for command, test in self.tests.items()]
+
+
+def check_red_black(tree: CommandsTestTree) -> int:
+    """Проверяет свойства красно-черного дерева и ссылки на родителей.
+
+    Аргументы:
+        tree - дерево
+    Возвращает: количество узлов
+    Вызывает: AssertionError, если свойство нарушено
+    """
+
+    def check(node: Optional[Node], parent: Optional[Node]) -> tuple[int, int]:
+        if node is None:
+            return 1, 0
+        assert node.parent is parent, "неверная ссылка на родителя"
+        if node.color == ColorTree.RED:
+            for child in (node.left, node.right):
+                assert child is None or child.color == ColorTree.BLACK, "два красных"
+        if node.left is not None:
+            assert node.left.key < node.key, "нарушен порядок слева"
+        if node.right is not None:
+            assert node.key < node.right.key, "нарушен порядок справа"
+        left_height, left_size = check(node.left, node)
+        right_height, right_size = check(node.right, node)
+        assert left_height == right_height, "разная черная высота"
+        return left_height + (node.color == ColorTree.BLACK), left_size + right_size + 1
+
+    assert tree.root is None or tree.root.color == ColorTree.BLACK, "красный корень"
+    _, size = check(tree.root, None)
+    assert size == tree.size, f"size = {tree.size}, узлов {size}"
+    return size
+
+
+def _measure(function: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def _run(size: int) -> None:
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    random.seed(size)
+    tests = [
+        Test(f"/test_{number:07d}", f"Тест {number}", None, [], None)
+        for number in range(size)
+    ]
+    random.shuffle(tests)
+    queries = random.sample(tests, min(size, 100000))
+    deleted = tests[: size // 2]
+
+    indexes: list[Any] = [_TreeIndex(), _BisectIndex()]
+    if SortedDict is not None:
+        indexes.append(_SortedDictIndex())
+
+    print(f"\nкомандам: {size}")
+    print(
+        f"{'':<18}{'вставка':>12}{'поиск':>12}{'обход':>12}{'удаление':>12}  мкс/операция"
+    )
+    for index in indexes:
+        insert = _measure(lambda: [index.insert(test) for test in tests]) / size
+        search = _measure(lambda: [index.search(test) for test in queries]) / len(
+            queries
+        )
+        iterate = _measure(index.iterate) / size
+        delete = _measure(lambda: [index.delete(test) for test in deleted]) / len(
+            deleted
+        )
+        print(
+            f"{index.name:<18}{insert * 1e6:12.3f}{search * 1e6:12.3f}"
+            f"{iterate * 1e6:12.3f}{delete * 1e6:12.3f}"
+        )
+
+        if isinstance(index, _TreeIndex):
+            tree = _TreeIndex()
+            for test in tests:
+                tree.insert(test)
+            depth = tree.tree.depth()
+            check_red_black(tree.tree)
+            for test in deleted:
+                tree.delete(test)
+            check_red_black(tree.tree)
+            assert tree.iterate() == index.iterate(), "обход после удаления"
+            print(
+                f"{'':<18}глубина {depth} (предел 2*log2(n+1) = "
+                f"{2 * log2(size + 1):.1f}), свойства дерева соблюдаются"
+            )
+
+
+def main() -> None:
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 10000, 100000]
+    for size in sizes:
+        _run(size)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,54 @@
 import asyncio
 import os
-import shutil
+import signal
+import time
+from concurrent.futures import Future
 from traceback import print_exception
-from typing import Any, Union
+from typing import Any, Awaitable, Callable, Optional, Union
 from xml.dom import NoModificationAllowedErr
 
 from telegram import Update
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
-    CallbackContext,
     CallbackQueryHandler,
-    CommandHandler,
+    ContextTypes,
     MessageHandler,
     filters,
 )
 
+from src.bot import bot
 from src.builder import BuilderTest
-from src.constants import PATH_OF_DATA, REGEX_COMMAND, REGEX_LIST
+from src.checkbox import EXPIRED, Checkboxes, parse_callback_data
+from src.commands import Commands
+from src.constants import (
+    METRICS_SETTINGS,
+    PATH_OF_DATA,
+    PROFILER_SETTINGS,
+    REGEX_COMMAND,
+    REGEX_LIST,
+    SESSION_SETTINGS,
+    WATCHER_SETTINGS,
+)
 from src.errors import BotException, BotFilesException, BotParseException
 from src.graph import STATES
-from src.log import logger
+from src.interning import Questions
+from src.log import logger, updates_logger
+from src.metrics import QUESTIONS, TREE_DEPTH, TREE_SIZE, start_server, track_update
+from src.profiler import Profiler
+from src.reclaimer import Reclaimer
+from src.stats import Stats, format_stats
 from src.test import Test
+from src.tracing import start_trace
 from src.tree import CommandsTestTree, Node
 from src.user import User
+from src.versions import Versions
+from src.watcher import Watcher
 
 
-async def handle(state: str, update: Update, context: CallbackContext) -> None:
+async def handle(
+    state: str, update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
     int_state = int(state)
     await STATES[int_state].handle(update.effective_user.id, update.message.text)
     await STATES[int(User.get(update.effective_user.id, "state"))].send(
@@ -33,13 +56,12 @@ async def handle(state: str, update: Update, context: CallbackContext) -> None:
     )
 
 
-async def create(update: Update, context: CallbackContext) -> None:
-    path = os.path.join(PATH_OF_DATA, str(update.effective_user.id))
-    if os.path.exists(path):
-        BuilderTest().get_directory_number(os.listdir(path), [])
-    try:
-        state = User.get(update.effective_user.id, "state")
-    except ValueError:
+async def create(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, session: dict[str, str]
+) -> None:
+    BuilderTest().check_quota(update.effective_user.id, [])
+    state = session.get("state")
+    if state is None:
         User.set(update.effective_user.id, state="0")
         await context.bot.send_message(
             update.effective_user.id,
@@ -54,45 +76,37 @@ async def create(update: Update, context: CallbackContext) -> None:
         await STATES[int(state)].send(update.effective_user.id)
 
 
-def allow(function: Any) -> Any:
-    async def wrapper(update: Update, context: CallbackContext) -> Any:
-        try:
-            state = User.get(update.effective_user.id, "state")
-        except ValueError:
-            return await function(update, context)
-        else:
-            return await handle(state, update, context)
-
-    return wrapper
-
-
-@allow
-async def start(update: Update, context: CallbackContext) -> None:
+async def start(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, session: dict[str, str]
+) -> None:
     await context.bot.send_message(
         update.effective_user.id,
         text=f"Приветствую тебя, {update.effective_user.first_name} {update.effective_user.last_name}. Если хочешь узнать больше информации про этого бота, пропиши /help.",
     )
 
 
-@allow
-async def help(update: Update, context: CallbackContext) -> None:
+async def help(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, session: dict[str, str]
+) -> None:
     await context.bot.send_message(
         update.effective_user.id,
-        '*Описание*:\nБот создан для создания и решения разнообразных тестов. Тесты создаются на основе json-файла или последовательно с помощью команды /create.\n\n Вот список моих команд в алфавитном порядке 👇:\n/about - показывает информацию о боте\n/create - последовательное создание теста\n/delete \\[command] - удаляет тест. \n/help - показывает все возможные команды бота.\n/list \\[start-end] - показывает список тестов от start до end в алфавитном порядке (лимит - 50 тестов).\n/my\\_tests - показывает список тестов, которые создал пользователь.\n/start - приветствует пользователя и советует использовать команду /help.\n/start\\_test - начинает решение теста (работает только после команды "/test\\_{characters}")\n/stop - заканчивает тест и показывает результат пользователя (работает только после команды "/start\\_test").\n/test\\_{characters} - показывает описание теста, после слова "/test\\_" допускается использование прописных и строчных латинских букв, десятичных цифр и знака "\\_".\n\nЖелаю удачи в создании и в решении тестов!',
+        '*Описание*:\nБот создан для создания и решения разнообразных тестов. Тесты создаются на основе json-файла или последовательно с помощью команды /create.\n\n Вот список моих команд в алфавитном порядке 👇:\n/about - показывает информацию о боте\n/create - последовательное создание теста\n/delete \\[command] - удаляет тест. \n/help - показывает все возможные команды бота.\n/list \\[start-end] - показывает список тестов от start до end в алфавитном порядке (лимит - 50 тестов).\n/my\\_tests - показывает список тестов, которые создал пользователь.\n/stats \\[command] - показывает статистику прохождений теста, который создал пользователь.\n/start - приветствует пользователя и советует использовать команду /help.\n/start\\_test - начинает решение теста (работает только после команды "/test\\_{characters}")\n/stop - заканчивает тест и показывает результат пользователя (работает только после команды "/start\\_test").\n/test\\_{characters} - показывает описание теста, после слова "/test\\_" допускается использование прописных и строчных латинских букв, десятичных цифр и знака "\\_".\n/update - подпись к zip файлу с новой версией теста, который создал пользователь (начатые прохождения заканчиваются по прежней версии).\n\nЖелаю удачи в создании и в решении тестов!',
         parse_mode="Markdown",
     )
 
 
-@allow
-async def about(update: Update, context: CallbackContext) -> None:
+async def about(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, session: dict[str, str]
+) -> None:
     await context.bot.send_message(
         update.effective_user.id,
         "О боте:\nGithub: https://github.com/izveigor/bot-tests\nАвтор: Igor Izvekov\nEmail: izveigor@gmail.com\nLicense: MIT",
     )
 
 
-@allow
-async def my_tests(update: Update, context: CallbackContext) -> None:
+async def my_tests(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, session: dict[str, str]
+) -> None:
     tests = User.get_tests(update.effective_user.id)
     if not tests or len(tests) == 0:
         await context.bot.send_message(
@@ -108,8 +122,9 @@ async def my_tests(update: Update, context: CallbackContext) -> None:
         )
 
 
-@allow
-async def delete(update: Update, context: CallbackContext) -> None:
+async def delete(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, session: dict[str, str]
+) -> None:
     _, test = update.message.text.split()
     if not REGEX_COMMAND.match(test):
         await context.bot.send_message(
@@ -117,20 +132,22 @@ async def delete(update: Update, context: CallbackContext) -> None:
             'Команда не подходит под заданный шаблон. После слова /delete должен стоять пробел и слово, со следующими правилами: в начале должно стоять слово "test_". Далее к нему приписываются все буквы латинского алфавита (прописные и/или строчные) и/или десятичные цифры и/или _. Максимальная длина команды с учетом начального слова не должна превышать 40.',
         )
     else:
-        if test in User.get_tests(update.effective_user.id):
-            number = None
-            for hset in User.get_tests_with_numbers(update.effective_user.id):
-                if list(hset.values())[0] == test:
-                    number = list(hset.keys())[0]
-                    break
+        number = User.find_test(update.effective_user.id, test)
+        if number is not None:
             found = CommandsTestTree().search(Node(Test(test, "", None, [], None)))
             if found:
                 CommandsTestTree().delete(found)
+                # Начатые прохождения заканчиваются по удаленной версии
+                Versions.retire(found.key)
 
             User.delete_test(update.effective_user.id, test)
-            shutil.rmtree(
-                os.path.join(PATH_OF_DATA, str(update.effective_user.id), str(number))
-            )
+            # Команда освобождается до удаления статистики: записанные
+            # после этого события теста пропускаются (см. src/stats.py)
+            Commands.release(test)
+            Stats.delete(test)
+            # Файлы теста удаляются в фоне
+            Reclaimer.delete(update.effective_user.id, number)
+            Watcher.forget(update.effective_user.id, number)
             await context.bot.send_message(
                 update.effective_user.id,
                 f'Тест с командой "{test}" был успешно удален.',
@@ -141,12 +158,28 @@ async def delete(update: Update, context: CallbackContext) -> None:
             )
 
 
-@allow
-async def test(update: Update, context: CallbackContext) -> None:
-    try:
-        active_test = User.get(update.effective_user.id, "active_test")
-    except ValueError:
-        active_test = None
+def find_active_test(session: dict[str, str]) -> Optional[Test]:
+    """Возвращает версию теста, которую проходит пользователь.
+
+    Аргументы:
+        session - сессия пользователя с полем active_test
+    Возвращает: тест или None, если теста с такой командой больше нет
+    """
+    command = session["active_test"]
+    version = session.get("active_version")
+    if version is not None:
+        test = Versions.get(command, version)
+        if test is not None:
+            return test
+    # Версия не заменялась или недоступна после перезапуска
+    found = CommandsTestTree().search(Node(Test(command, "", None, [], None)))
+    return found.key if found else None
+
+
+async def test(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, session: dict[str, str]
+) -> None:
+    active_test = session.get("active_test")
 
     if active_test is not None:
         await context.bot.send_message(
@@ -172,12 +205,10 @@ async def test(update: Update, context: CallbackContext) -> None:
                 await test.key.see(update.effective_user.id)
 
 
-@allow
-async def start_test(update: Update, context: CallbackContext) -> None:
-    try:
-        test_command = User.get(update.effective_user.id, "checked")
-    except ValueError:
-        test_command = None
+async def start_test(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, session: dict[str, str]
+) -> None:
+    test_command = session.get("checked")
 
     if test_command is None:
         await context.bot.send_message(
@@ -190,12 +221,10 @@ async def start_test(update: Update, context: CallbackContext) -> None:
             await test.key.start(update.effective_user.id)
 
 
-@allow
-async def stop(update: Update, context: CallbackContext) -> None:
-    try:
-        test_command = User.get(update.effective_user.id, "active_test")
-    except ValueError:
-        test_command = None
+async def stop(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, session: dict[str, str]
+) -> None:
+    test_command = session.get("active_test")
 
     if test_command is None:
         await context.bot.send_message(
@@ -203,13 +232,14 @@ async def stop(update: Update, context: CallbackContext) -> None:
             "Вы не можете закончить тест, так как вы не начали ни одного теста.",
         )
     else:
-        test = CommandsTestTree().search(Node(Test(test_command, "", None, [], None)))
+        test = find_active_test(session)
         if test:
-            await test.key.stop(update.effective_user.id)
+            await test.stop(update.effective_user.id)
 
 
-@allow
-async def list_(update: Update, context: CallbackContext) -> None:
+async def list_(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, session: dict[str, str]
+) -> None:
     if not REGEX_LIST.match(update.message.text):
         await context.bot.send_message(
             update.effective_user.id,
@@ -238,12 +268,10 @@ async def list_(update: Update, context: CallbackContext) -> None:
             )
 
 
-@allow
-async def other_message(update: Update, context: CallbackContext) -> None:
-    try:
-        active_test = User.get(update.effective_user.id, "active_test")
-    except ValueError:
-        active_test = None
+async def other_message(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, session: dict[str, str]
+) -> None:
+    active_test = session.get("active_test")
 
     if active_test is None:
         await context.bot.send_message(
@@ -251,127 +279,312 @@ async def other_message(update: Update, context: CallbackContext) -> None:
             "Такой команды нет, если хочешь увидеть список всех возможных команд, набери /help.",
         )
     else:
-        test = CommandsTestTree().search(Node(Test(active_test, "", None, [], None)))
+        test = find_active_test(session)
         if test:
-            await test.key.check(update.effective_user.id, update.message.text)
+            await test.check(update.effective_user.id, update.message.text)
 
 
-async def button(update: Update, context: CallbackContext) -> None:
-    query = update.callback_query
-    markup = query["message"]["reply_markup"]
-    if query.data == "1":
-        if "✅" not in markup.inline_keyboard[0][0].text:
-            markup.inline_keyboard[0][0].text += "✅"
-        else:
-            markup.inline_keyboard[0][0].text = markup.inline_keyboard[0][0].text[:-1]
-        await query.edit_message_reply_markup(
-            reply_markup=markup,
+async def send_profile(user_id: int, future: "Future[tuple[str, str]]") -> None:
+    try:
+        folded, report = await asyncio.wrap_future(future)
+    except Exception as error:
+        logger.error(error)
+        await bot.send_message(user_id, f"Профилирование завершилось ошибкой: {error}")
+    else:
+        await bot.send_message(
+            user_id, f"Профилирование завершено.\nСтеки: {folded}\nОтчет: {report}"
         )
-    elif query.data == "2":
-        if "✅" not in markup.inline_keyboard[0][1].text:
-            markup.inline_keyboard[0][1].text += "✅"
-        else:
-            markup.inline_keyboard[0][1].text = markup.inline_keyboard[0][1].text[:-1]
-        await query.edit_message_reply_markup(
-            reply_markup=markup,
+
+
+async def profile(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, session: dict[str, str]
+) -> None:
+    user_id = update.effective_user.id
+    if user_id not in PROFILER_SETTINGS["admins"]:
+        await other_message(update, context, session)
+        return
+
+    arguments = update.message.text.split()
+    try:
+        duration = float(arguments[1]) if len(arguments) > 1 else None
+    except ValueError:
+        duration = 0
+    if duration is None:
+        duration = PROFILER_SETTINGS["duration"]
+    elif not 0 < duration <= PROFILER_SETTINGS["max_duration"]:
+        await context.bot.send_message(
+            user_id,
+            f"Длительность профилирования должна быть числом от 0 до {PROFILER_SETTINGS['max_duration']} секунд.",
         )
-    elif query.data == "3":
-        if "✅" not in markup.inline_keyboard[1][0].text:
-            markup.inline_keyboard[1][0].text += "✅"
-        else:
-            markup.inline_keyboard[1][0].text = markup.inline_keyboard[1][0].text[:-1]
-        await query.edit_message_reply_markup(
-            reply_markup=markup,
+        return
+
+    if Profiler.running:
+        await context.bot.send_message(user_id, "Профилирование уже запущено.")
+        return
+
+    future = Profiler.start(duration)
+    await context.bot.send_message(user_id, f"Профилирование запущено на {duration} с.")
+    asyncio.create_task(send_profile(user_id, future))
+
+
+async def stats(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, session: dict[str, str]
+) -> None:
+    user_id = update.effective_user.id
+    arguments = update.message.text.split()
+    # Команду теста можно указать без начального "/"
+    test = "/" + arguments[1].lstrip("/") if len(arguments) == 2 else ""
+    if not REGEX_COMMAND.match(test):
+        await context.bot.send_message(
+            user_id,
+            "После слова /stats должен стоять пробел и команда вашего теста, например: /stats test_example.",
         )
-    elif query.data == "4":
-        if "✅" not in markup.inline_keyboard[1][1].text:
-            markup.inline_keyboard[1][1].text += "✅"
-        else:
-            markup.inline_keyboard[1][1].text = markup.inline_keyboard[1][1].text[:-1]
-        await query.edit_message_reply_markup(
-            reply_markup=markup,
+        return
+
+    if User.find_test(user_id, test) is None:
+        await context.bot.send_message(
+            user_id, "Вы не являетесь владельцом этого теста."
         )
-    elif query.data == "Ответить":
-        active_test = User.get(query["from"]["id"], "active_test")
+        return
+
+    # Статистика показывается для текущей версии теста
+    found = CommandsTestTree().search(Node(Test(test, "", None, [], None)))
+    await context.bot.send_message(
+        user_id,
+        format_stats(test, Stats.get(test, found.key.version) if found else {}),
+    )
 
-        answer = []
-        for i in range(len(markup.inline_keyboard)):
-            for j in range(len(markup.inline_keyboard[i])):
-                if "✅" in markup.inline_keyboard[i][j].text:
-                    answer.append(i * 2 + j + 1)
 
-        test = CommandsTestTree().search(Node(Test(active_test, "", None, [], None)))
-        if test:
-            await test.key.check(query["from"]["id"], answer)
+Handler = Callable[[Update, ContextTypes.DEFAULT_TYPE, dict[str, str]], Awaitable[None]]
+
+COMMANDS: dict[str, Handler] = {
+    "/start": start,
+    "/help": help,
+    "/about": about,
+    "/my_tests": my_tests,
+    "/start_test": start_test,
+    "/stop": stop,
+    "/delete": delete,
+    "/list": list_,
+    "/profile": profile,
+    "/stats": stats,
+}
+
+
+def get_command(text: str) -> str:
+    """Возвращает команду сообщения без аргументов и имени бота."""
+    command = text.split(maxsplit=1)[0] if text else ""
+    return command.partition("@")[0]
 
 
-async def get_document_messages(update: Update, context: CallbackContext) -> None:
+async def route(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Единая точка входа для текстовых сообщений.
+
+    Команда разбирается один раз, данные пользователя читаются из redis одним
+    запросом и передаются обработчику. Пока пользователь создает тест,
+    все сообщения, кроме /create, передаются конструктору теста.
+    """
+    start_time = time.perf_counter()
+    command = get_command(update.message.text)
+
+    with track_update("other_message") as labels, start_trace(
+        "update", user_id=update.effective_user.id
+    ) as span:
+        session = User.get_all(update.effective_user.id)
+        try:
+            if command == "/create":
+                labels["command"] = command
+                await create(update, context, session)
+            elif "state" in session:
+                labels["command"] = "builder"
+                await handle(session["state"], update, context)
+            elif command.startswith("/test_"):
+                labels["command"] = "/test_"
+                await test(update, context, session)
+            else:
+                if command in COMMANDS:
+                    labels["command"] = command
+                await COMMANDS.get(command, other_message)(update, context, session)
+        finally:
+            if span is not None:
+                span.attributes.update(labels)
+            updates_logger.info(
+                "update",
+                extra={
+                    "user_id": update.effective_user.id,
+                    "command": command if command.startswith("/") else None,
+                    "state": session.get("state"),
+                    "latency": round(time.perf_counter() - start_time, 6),
+                },
+            )
+
+
+async def button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    try:
+        _, number = parse_callback_data(query.data)
+    except ValueError:
+        # Клавиатура отправлена в прежнем формате, ее состояние не восстановить
+        await resend_question(update, context)
+        return
+
+    if number is not None:
+        await Checkboxes.toggle(query)
+    else:
+        with track_update("button"), start_trace(
+            "update", user_id=query.from_user.id, command="button"
+        ):
+            answer = Checkboxes.submit(query)
+            session = User.get_all(query.from_user.id)
+            if session.get("active_test") is None:
+                # Тест уже закончен или сессия удалена по истечении срока
+                await context.bot.send_message(
+                    query.from_user.id,
+                    "Вы не можете ответить на вопрос, так как вы не начали ни одного теста.",
+                )
+                return
+            test = find_active_test(session)
+            if test:
+                await test.check(query.from_user.id, answer)
+
+
+async def resend_question(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Отвечает на нажатие устаревшей клавиатуры и отправляет текущий вопрос заново."""
+    query = update.callback_query
+    await query.answer(EXPIRED)
+    session = User.get_all(query.from_user.id)
+    if session.get("active_test") is None:
+        return
+    test = find_active_test(session)
+    question_index = int(session.get("question_index", 0))
+    if test and question_index < len(test.questions):
+        await test.questions[question_index](query.from_user.id)
+
+
+async def get_document_messages(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
     file_name = update.message.document.file_name
-    if update.message.caption == "/create" and ".zip" in file_name:
+    if update.message.caption in ("/create", "/update") and ".zip" in file_name:
+        is_update = update.message.caption == "/update"
         errors: list[Union[str, int]] = []
         try:
-            await asyncio.gather(
-                BuilderTest().create_test_by_json(update.message, file_name, errors)
-            )
-        except BotParseException:
-            shutil.rmtree(
-                os.path.join(
-                    PATH_OF_DATA, str(update.message.from_user.id), str(errors[0])
+            if is_update:
+                await BuilderTest().update_test_by_json(
+                    update.message, file_name, errors
                 )
-            )
+            else:
+                await BuilderTest().create_test_by_json(
+                    update.message, file_name, errors
+                )
+        except BotParseException:
             await context.bot.send_message(
                 update.message.from_user.id,
-                "Произошла следующая ошибка в тестовом файле: " + f'"{errors[1]}".',
+                "Произошла следующая ошибка в тестовом файле: " + f'"{errors[0]}".',
             )
         except BotFilesException:
-            if isinstance(errors[0], int):
-                shutil.rmtree(
-                    os.path.join(
-                        PATH_OF_DATA, str(update.message.from_user.id), str(errors[0])
-                    )
-                )
-                error_message = errors[1]
-            else:
-                error_message = errors[0]
-
             await context.bot.send_message(
                 update.message.from_user.id,
-                "Произошла следующая ошибка с обработкой файлов: "
-                + f'"{error_message}".',
+                "Произошла следующая ошибка с обработкой файлов: " + f'"{errors[0]}".',
             )
         except Exception as error:
             logger.error(error)
         else:
             await context.bot.send_message(
                 update.message.from_user.id,
-                "Тест был успешно создан.",
+                "Тест был успешно обновлен."
+                if is_update
+                else "Тест был успешно создан.",
             )
     else:
         await context.bot.send_message(
             update.message.from_user.id,
-            'Файл не был принят. Если вы хотите создать тест, отправьте zip файл с caption "/create".',
+            'Файл не был принят. Если вы хотите создать тест, отправьте zip файл с caption "/create", а если обновить свой тест - с caption "/update".',
         )
 
 
-def start_bot() -> None:
-    application = ApplicationBuilder().token(os.environ.get("TELEGRAM_TOKEN")).build()
+async def sweep_sessions(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Удаляет устаревшие сессии пачками, не блокируя надолго цикл событий."""
+    cleared = reclaimed = 0
+    has_more = True
+    while has_more:
+        batch_cleared, batch_reclaimed, has_more = User.sweep()
+        cleared += batch_cleared
+        reclaimed += batch_reclaimed
+        await asyncio.sleep(0)
+
+    if cleared:
+        logger.info(
+            "sweep: cleared %d sessions, reclaimed %d bytes", cleared, reclaimed
+        )
+
+
+async def migrate_sessions(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Переносит хеши сессий прежнего формата в компактные записи пачками."""
+    cursor, migrated = User.migrate()
+    while cursor:
+        await asyncio.sleep(0)
+        cursor, batch_migrated = User.migrate(cursor)
+        migrated += batch_migrated
 
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("help", help))
-    application.add_handler(CommandHandler("about", about))
-    application.add_handler(CommandHandler("my_tests", my_tests))
-    application.add_handler(CommandHandler("start_test", start_test))
-    application.add_handler(CommandHandler("stop", stop))
-    application.add_handler(CommandHandler("delete", delete))
-    application.add_handler(CommandHandler("create", create))
+    if migrated:
+        logger.info("migrate: %d sessions moved to packed records", migrated)
+
+
+async def watch_catalog(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Применяет изменения тестов, сделанные в PATH_OF_DATA в обход бота."""
+    await Watcher.poll()
+
+
+def create_application() -> "Application[Any, Any, Any, Any, Any, Any]":
+    application = ApplicationBuilder().bot(bot).build()
 
     application.add_handler(CallbackQueryHandler(button))
-    application.add_handler(MessageHandler(filters.Regex(r"^/list+"), list_))
-    application.add_handler(MessageHandler(filters.Regex(r"^/test_+"), test))
-    application.add_handler(MessageHandler(filters.TEXT, other_message))
+    application.add_handler(MessageHandler(filters.TEXT, route))
     application.add_handler(MessageHandler(filters.Document.ALL, get_document_messages))
+    if application.job_queue is not None:
+        application.job_queue.run_repeating(
+            sweep_sessions, interval=SESSION_SETTINGS["sweep_interval"]
+        )
+        if SESSION_SETTINGS["encoding"] == "packed":
+            application.job_queue.run_once(migrate_sessions, 0)
+        if WATCHER_SETTINGS["interval"]:
+            Watcher.start()
+            application.job_queue.run_repeating(
+                watch_catalog, interval=WATCHER_SETTINGS["interval"]
+            )
 
-    application.run_polling()
+    return application
+
+
+def start_metrics() -> None:
+    TREE_SIZE.set_function(lambda: CommandsTestTree().size)
+    TREE_DEPTH.set_function(lambda: CommandsTestTree().depth())
+    QUESTIONS.set_function(lambda: len(Questions))
+    if METRICS_SETTINGS["port"]:
+        start_server(METRICS_SETTINGS["host"], METRICS_SETTINGS["port"])
+
+
+def start_profiler_signal() -> None:
+    """Запускает профилирование на PROFILER_SETTINGS["duration"] секунд по SIGUSR1."""
+
+    def log_profile(future: "Future[tuple[str, str]]") -> None:
+        error = future.exception()
+        if error is None:
+            logger.info("profile: %s, %s", *future.result())
+        else:
+            logger.error(error)
+
+    def handle_signal(signum: int, frame: object) -> None:
+        if not Profiler.running:
+            Profiler.start(PROFILER_SETTINGS["duration"]).add_done_callback(log_profile)
+
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, handle_signal)
+
+
+def start_bot() -> None:
+    create_application().run_polling()
 
 
 def main() -> None:
@@ -388,7 +601,11 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    # Обработчик сигнала регистрируется до загрузки тестов, чтобы можно было
+    # профилировать и ее
+    start_profiler_signal()
     BuilderTest()
     if not os.path.exists(PATH_OF_DATA):
         os.mkdir(PATH_OF_DATA)
+    start_metrics()
     main()
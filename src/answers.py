@@ -0,0 +1,362 @@
+"""Модуль журнала ответов на вопросы тестов.
+
+Каждый ответ пользователя записывается событием: время, пользователь,
+тест и его версия, номер вопроса, ответ, правильность и время, прошедшее
+с отправки вопроса. Окончание теста записывается событием с количеством правильных
+ответов и временем прохождения. Test только кладет событие в очередь, а
+отдельный поток пачками дописывает события в файл ANSWERS_SETTINGS["path"]
+(формат JSON, по одному событию на строку) и обновляет по ним статистику
+тестов (src/stats.py), поэтому запись не задерживает обработку ответа.
+Когда файл журнала превышает ANSWERS_SETTINGS["max_bytes"], он
+переименовывается в "<path>.1" (прежние - в "<path>.2" и т. д., хранится
+ANSWERS_SETTINGS["backup_count"] прежних файлов), и запись начинается
+в новый файл.
+
+По журналу aggregate вычисляет для каждого вопроса долю неправильных
+ответов (сложность), среднее время ответа и распределение ответов.
+
+Классы:
+    AnswerEvent - открытый класс, событие ответа на вопрос.
+    FinishEvent - открытый класс, событие окончания теста.
+    AnswerLog - открытый класс, журнал ответов с записью в фоновом потоке.
+    QuestionStats - открытый класс, статистика ответов на вопрос.
+Функции:
+    read_events - открытая функция, читает события из файла журнала.
+    aggregate - открытая функция, вычисляет статистику вопросов по событиям.
+Экземпляры классов:
+    answers - экземпляр класса AnswerLog.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    Literal,
+    NamedTuple,
+    Optional,
+    Union,
+)
+
+from .constants import ANSWERS_SETTINGS
+from .log import logger
+from .stats import Stats
+from .user import User
+
+Answer = Union[str, int, list[int]]
+Event = dict[str, Any]
+
+
+class AnswerEvent(NamedTuple):
+    """Событие ответа на вопрос."""
+
+    event: Literal["answer"]
+    time: float
+    user_id: int
+    test: str
+    version: str
+    question: int
+    answer: Answer
+    right: bool
+    seconds: Optional[float]
+
+
+class FinishEvent(NamedTuple):
+    """Событие окончания теста."""
+
+    event: Literal["finish"]
+    time: float
+    user_id: int
+    test: str
+    version: str
+    right: int
+    questions: int
+    stopped: bool
+    seconds: Optional[float]
+
+
+LogEvent = Union[AnswerEvent, FinishEvent]
+# Кодировщик создается один раз: json.dumps с параметрами создает его заново
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+class AnswerLog:
+    """Журнал ответов, который пишет события пачками в фоновом потоке.
+
+    Время начала теста и отправки текущего вопроса хранится в памяти
+    процесса и забывается, когда тест закончен или очищена сессия брошенного
+    теста (см. _User.sweep).
+
+    Аргументы конструктора:
+        path - файл журнала
+        batch_size - максимальное количество событий в пачке
+        interval - максимальное время ожидания пачки в секундах
+        on_batch - функция, которой после записи передается каждая пачка
+        max_bytes - размер файла, после которого он заменяется новым
+            (0 - файл не ограничен)
+        backup_count - количество хранимых прежних файлов
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int,
+        interval: float,
+        on_batch: Optional[Callable[[list[LogEvent]], None]] = None,
+        max_bytes: int = 0,
+        backup_count: int = 0,
+    ) -> None:
+        self._path = path
+        self._batch_size = batch_size
+        self._interval = interval
+        self._on_batch = on_batch
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        # Обработчик только добавляет событие в конец очереди, а поток
+        # записи забирает события раз в interval секунд или когда набралась
+        # пачка, поэтому он не просыпается на каждое событие
+        self._events: deque[LogEvent] = deque()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Время начала теста и отправки текущего вопроса каждому пользователю
+        self._started: dict[int, float] = {}
+        self._asked: dict[int, float] = {}
+
+    def start(self, from_user_id: int) -> None:
+        """Запоминает время начала теста и отправки первого вопроса.
+
+        Аргументы:
+            from_user_id - пользовательский id
+        Возвращает: None
+        """
+        self._started[from_user_id] = self._asked[from_user_id] = time.monotonic()
+
+    def ask(self, from_user_id: int) -> None:
+        """Запоминает время отправки вопроса пользователю.
+
+        Аргументы:
+            from_user_id - пользовательский id
+        Возвращает: None
+        """
+        self._asked[from_user_id] = time.monotonic()
+
+    def forget(self, from_user_id: int) -> None:
+        """Забывает время начала теста и отправки вопроса.
+
+        Аргументы:
+            from_user_id - пользовательский id
+        Возвращает: None
+        """
+        self._started.pop(from_user_id, None)
+        self._asked.pop(from_user_id, None)
+
+    def record(
+        self,
+        from_user_id: int,
+        test: str,
+        version: str,
+        question: int,
+        answer: Answer,
+        is_right: bool,
+    ) -> None:
+        """Добавляет событие ответа в очередь записи.
+
+        Аргументы:
+            from_user_id - пользовательский id
+            test - команда теста
+            version - версия теста
+            question - номер вопроса (с нуля)
+            answer - ответ пользователя
+            is_right - True, если ответ правильный
+        Возвращает: None
+        """
+        asked = self._asked.pop(from_user_id, None)
+        self._put(
+            AnswerEvent(
+                "answer",
+                time.time(),
+                from_user_id,
+                test,
+                version,
+                question,
+                answer,
+                is_right,
+                None if asked is None else time.monotonic() - asked,
+            )
+        )
+
+    def finish(
+        self,
+        from_user_id: int,
+        test: str,
+        version: str,
+        right_answers_number: int,
+        questions_number: int,
+        is_stop: bool,
+    ) -> None:
+        """Добавляет событие окончания теста в очередь записи.
+
+        Аргументы:
+            from_user_id - пользовательский id
+            test - команда теста
+            version - версия теста
+            right_answers_number - количество правильных ответов
+            questions_number - количество вопросов теста
+            is_stop - True, если тест остановлен преждевременно
+        Возвращает: None
+        """
+        self._asked.pop(from_user_id, None)
+        started = self._started.pop(from_user_id, None)
+        self._put(
+            FinishEvent(
+                "finish",
+                time.time(),
+                from_user_id,
+                test,
+                version,
+                right_answers_number,
+                questions_number,
+                is_stop,
+                None if started is None else time.monotonic() - started,
+            )
+        )
+
+    def _put(self, event: LogEvent) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="answer-log", daemon=True
+            )
+            self._thread.start()
+        self._events.append(event)
+        if len(self._events) == self._batch_size:
+            self._wakeup.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self._interval)
+            self._wakeup.clear()
+            while self._events:
+                batch: list[LogEvent] = []
+                while self._events and len(batch) < self._batch_size:
+                    batch.append(self._events.popleft())
+                self._flush(batch)
+
+    def _flush(self, batch: list[LogEvent]) -> None:
+        try:
+            self.write(batch)
+        except OSError as error:
+            logger.error(error)
+        if self._on_batch is not None:
+            try:
+                self._on_batch(batch)
+            except Exception as error:
+                logger.error(error)
+
+    def write(self, batch: list[LogEvent]) -> None:
+        """Дописывает пачку событий в файл журнала.
+
+        Аргументы:
+            batch - события
+        Возвращает: None
+        """
+        with open(self._path, "a", encoding="utf-8") as file:
+            # Словарь события нужен только на время его кодирования
+            file.writelines(_encode(event._asdict()) + "\n" for event in batch)
+            size = file.tell()
+        if self._max_bytes and size >= self._max_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        for number in range(self._backup_count - 1, 0, -1):
+            source = f"{self._path}.{number}"
+            if os.path.exists(source):
+                os.replace(source, f"{self._path}.{number + 1}")
+        if self._backup_count:
+            os.replace(self._path, self._path + ".1")
+        else:
+            os.remove(self._path)
+
+
+@dataclass
+class QuestionStats:
+    """Статистика ответов на вопрос теста."""
+
+    answers: int = 0
+    right: int = 0
+    timed: int = 0
+    seconds: float = 0.0
+    # Количество выборов каждого варианта ответа (для флаговых кнопок
+    # каждый отмеченный вариант считается отдельно)
+    options: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def difficulty(self) -> float:
+        """Доля неправильных ответов."""
+        return 1 - self.right / self.answers if self.answers else 0.0
+
+    @property
+    def mean_seconds(self) -> Optional[float]:
+        return self.seconds / self.timed if self.timed else None
+
+    def add(self, event: Event) -> None:
+        self.answers += 1
+        self.right += bool(event["right"])
+        if event.get("seconds") is not None:
+            self.timed += 1
+            self.seconds += event["seconds"]
+        answer = event["answer"]
+        if isinstance(answer, list):
+            self.options.update(str(option) for option in answer)
+        else:
+            self.options[str(answer)] += 1
+
+
+def read_events(path: str) -> Iterator[Event]:
+    """Читает события из файла журнала, пропуская поврежденные строки.
+
+    Аргументы:
+        path - файл журнала
+    Возвращает: итератор событий
+    """
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def aggregate(events: Iterable[Event]) -> dict[str, dict[int, QuestionStats]]:
+    """Вычисляет статистику ответов на каждый вопрос каждого теста.
+
+    Аргументы:
+        events - события журнала ответов (события окончания теста пропускаются)
+    Возвращает: словарь (команда теста)-(словарь (номер вопроса)-(статистика))
+    """
+    stats: dict[str, dict[int, QuestionStats]] = {}
+    for event in events:
+        if event.get("event", "answer") != "answer":
+            continue
+        questions = stats.setdefault(event["test"], {})
+        question = questions.get(event["question"])
+        if question is None:
+            question = questions[event["question"]] = QuestionStats()
+        question.add(event)
+    return stats
+
+
+answers = AnswerLog(
+    ANSWERS_SETTINGS["path"],
+    ANSWERS_SETTINGS["batch_size"],
+    ANSWERS_SETTINGS["interval"],
+    Stats.update,
+    ANSWERS_SETTINGS["max_bytes"],
+    ANSWERS_SETTINGS["backup_count"],
+)
+User.add_expire_callback(answers.forget)
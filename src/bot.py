@@ -1,5 +1,29 @@
 import os
+import time
+from typing import Any
 
 from telegram import Bot
+from telegram.error import TelegramError
 
-bot = Bot(os.environ.get("TELEGRAM_TOKEN"))
+from .metrics import TELEGRAM_ERRORS, TELEGRAM_REQUEST_SECONDS
+from .tracing import start_span
+
+
+class _InstrumentedBot(Bot):
+    """Бот, замеряющий время и ошибки запросов к Telegram Bot API."""
+
+    async def _post(self, endpoint: str, *args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            with start_span("telegram " + endpoint):
+                return await super()._post(endpoint, *args, **kwargs)
+        except TelegramError:
+            TELEGRAM_ERRORS.inc(method=endpoint)
+            raise
+        finally:
+            TELEGRAM_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, method=endpoint
+            )
+
+
+bot = _InstrumentedBot(os.environ.get("TELEGRAM_TOKEN", ""))
@@ -5,10 +5,15 @@
 """
 
 
+import errno
+import hashlib
 import json
 import os
+import shutil
+import tempfile
+import time
 from functools import partial
-from multiprocessing import Manager, Pool, cpu_count
+from multiprocessing import Pool, cpu_count
 from typing import Any, Optional, Union
 from zipfile import ZipFile
 
@@ -18,12 +23,33 @@ from src.test import Test
 from src.user import User
 
 from .bot import bot
+from .catalog import CATALOG_DIRECTORY
+from .commands import Commands
 from .constants import PATH_OF_DATA, REGEX_FILE
-from .errors import BotFilesException
+from .errors import BotFilesException, BotParseException
+from .interning import Questions, intern_string, intern_widget
+from .log import logger
+from .metrics import QUARANTINED_TESTS, STARTUP_SECONDS
 from .question import Question
+from .reclaimer import TRASH_DIRECTORY, Reclaimer
 from .singleton import Singleton
 from .tree import CommandsTestTree, Node
 from .validate import Validator
+from .versions import Versions
+
+# Максимальное количество тестов одного пользователя
+MAX_TESTS = 30
+_QUOTA_MESSAGE = "У вас больше 30 тестов, вы больше не можете создавать тесты."
+# Директория внутри PATH_OF_DATA для тестов, которые еще не опубликованы,
+# и возраст (в секундах), после которого она считается оставшейся от сбоя
+STAGING_DIRECTORY = ".staging"
+STAGING_MAX_AGE = 60 * 60
+# Директория внутри PATH_OF_DATA для тестов, не прошедших проверку при запуске
+QUARANTINE_DIRECTORY = ".quarantine"
+
+# Результат загрузки файла теста: (пользовательский id, номер директории,
+# путь к файлу, тест или None, ошибка или None)
+LoadResult = tuple[int, int, str, Optional[Test], Optional[str]]
 
 
 class BuilderTest(metaclass=Singleton):
@@ -38,29 +64,32 @@ class BuilderTest(metaclass=Singleton):
         Аргументы: -
         Возвращает: None
         """
+        start = time.perf_counter()
+        self._sweep_staging()
+        Reclaimer.collect()
         self._create_tests_from_files()
+        STARTUP_SECONDS.set(time.perf_counter() - start)
 
     async def create_test(
         self, from_user_id: int, file_content: dict[str, Any]
     ) -> None:
-        directory = os.path.join(PATH_OF_DATA, str(from_user_id))
-        if not os.path.exists(directory):
-            os.mkdir(directory)  # pragma: no coverage
-
-        files: list[str] = os.listdir(directory)
-        number: int = self.get_directory_number(files, [])
-        directory = os.path.join(directory, str(number))
+        """Создает тест, собранный пользователем через /create.
 
-        if not os.path.exists(directory):
-            os.mkdir(directory)  # pragma: no coverage
-
-        path = os.path.join(PATH_OF_DATA, str(from_user_id), str(number))
-
-        with open(os.path.join(path, "test.json"), "w", encoding="utf-8") as f:
-            json.dump(file_content, f)
+        Аргументы:
+            from_user_id - пользовательский id
+            file_content - содержимое json-файла теста
+        Возвращает: None
+        """
+        staging = self._stage()
+        try:
+            with open(os.path.join(staging, "test.json"), "w", encoding="utf-8") as f:
+                json.dump(file_content, f)
 
-        test = self._return_test(path, [])
-        self._add_test(from_user_id, number, os.path.join(directory, test), [])
+            test = self._return_test(staging, [])
+            self._add_test(from_user_id, os.path.join(staging, test), [])
+        finally:
+            # После публикации промежуточной директории уже нет
+            shutil.rmtree(staging, ignore_errors=True)
 
     async def create_test_by_json(
         self, message: Message, file_name: str, errors: list[Union[str, int]]
@@ -73,32 +102,63 @@ class BuilderTest(metaclass=Singleton):
             errors - список ошибок
         Возвращает: None
         """
-        directory = os.path.join(PATH_OF_DATA, str(message.from_user.id))
-        if not os.path.exists(directory):
-            os.mkdir(directory)  # pragma: no coverage
+        # Проверяем ограничение до загрузки файла
+        self.check_quota(message.from_user.id, errors)
+
+        staging = self._stage()
+        try:
+            test = await self._receive(message, file_name, staging, errors)
+            self._add_test(message.from_user.id, os.path.join(staging, test), errors)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
 
-        files: list[str] = os.listdir(directory)
-        number: int = self.get_directory_number(files, errors)
-        errors.append(number)
-        directory = os.path.join(directory, str(number))
+    async def update_test_by_json(
+        self, message: Message, file_name: str, errors: list[Union[str, int]]
+    ) -> None:
+        """Публикует новую версию теста, отправленную его автором.
 
+        Пользователи, которые уже проходят тест, заканчивают его по прежней
+        версии (см. src/versions.py).
+        Аргументы:
+            message - сообщение с документом, отправленным пользователем
+            file_name - имя zip файла
+            errors - список ошибок
+        Возвращает: None
+        """
+        staging = self._stage()
+        try:
+            test = await self._receive(message, file_name, staging, errors)
+            self._update_test(message.from_user.id, os.path.join(staging, test), errors)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    async def _receive(
+        self,
+        message: Message,
+        file_name: str,
+        staging: str,
+        errors: list[Union[str, int]],
+    ) -> str:
+        """Скачивает и распаковывает zip файл в промежуточную директорию.
+
+        Аргументы:
+            message - сообщение с документом, отправленным пользователем
+            file_name - имя zip файла
+            staging - промежуточная директория
+            errors - список ошибок
+        Возвращает: имя json-файла теста
+        """
         file_info = await bot.get_file(file_id=message.document.file_id)
-        if not os.path.exists(directory):
-            os.mkdir(directory)  # pragma: no coverage
-        path_to_file = os.path.join(directory, file_name)
+        path_to_file = os.path.join(staging, file_name)
         with open(path_to_file, "wb") as myzip:
             await file_info.download(out=myzip)
 
         with ZipFile(path_to_file, "r") as myzip:
-            myzip.extractall(directory)
+            myzip.extractall(staging)
 
         os.remove(path_to_file)
-        path = os.path.join(PATH_OF_DATA, str(message.from_user.id), str(number))
 
-        test = self._return_test(path, errors)
-        self._add_test(
-            message.from_user.id, number, os.path.join(directory, test), errors
-        )
+        return self._return_test(staging, errors)
 
     @staticmethod
     def _return_test(path: str, errors: list[Union[str, int]]) -> str:
@@ -126,88 +186,386 @@ class BuilderTest(metaclass=Singleton):
 
     @staticmethod
     def get_directory_number(files: list[str], errors: list[Union[str, int]]) -> int:
-        for number, directory_ in enumerate(files, start=1):
-            if directory_ != str(number):
-                break
-            if number == 30:
-                raise BotFilesException(
-                    errors,
-                    "У вас больше 30 тестов, вы больше не можете создавать тесты.",
-                )
-        else:
-            if len(files) == 0:
-                number = 1
-            else:
-                number += 1
+        """Возвращает наименьший свободный номер директории теста.
 
-        return number
+        Аргументы:
+            files - названия занятых директорий пользователя (в любом порядке)
+            errors - список ошибок
+        Возвращает: номер от 1 до MAX_TESTS
+        Вызывает: BotFilesException, если все номера заняты
+        """
+        used = set(files)
+        for number in range(1, MAX_TESTS + 1):
+            if str(number) not in used:
+                return number
+
+        raise BotFilesException(errors, _QUOTA_MESSAGE)
+
+    @staticmethod
+    def check_quota(from_user_id: int, errors: list[Union[str, int]]) -> None:
+        """Проверяет, что пользователь может создать еще один тест.
+
+        Количество тестов берется из каталога, а не из директории пользователя.
+        Аргументы:
+            from_user_id - пользовательский id
+            errors - список ошибок
+        Возвращает: None
+        Вызывает: BotFilesException, если у пользователя MAX_TESTS тестов
+        """
+        if User.count_tests(from_user_id) >= MAX_TESTS:
+            raise BotFilesException(errors, _QUOTA_MESSAGE)
+
+    @staticmethod
+    def get_version(file_content: dict[str, Any]) -> str:
+        """Возвращает версию теста по содержимому его json-файла.
+
+        Версия - хеш содержимого файла, поэтому она одинакова во всех
+        процессах бота и после перезапуска.
+        Аргументы:
+            file_content - содержимое json-файла теста
+        Возвращает: версию теста
+        """
+        return hashlib.blake2b(
+            json.dumps(file_content, sort_keys=True).encode(), digest_size=8
+        ).hexdigest()
+
+    @staticmethod
+    def _stage() -> str:
+        """Создает промежуточную директорию для нового теста.
+
+        Директория находится внутри PATH_OF_DATA, то есть на той же файловой
+        системе, поэтому готовый тест публикуется атомарным os.rename.
+        Аргументы: -
+        Возвращает: путь к промежуточной директории
+        """
+        root = os.path.join(PATH_OF_DATA, STAGING_DIRECTORY)
+        os.makedirs(root, exist_ok=True)
+        return tempfile.mkdtemp(dir=root)
+
+    @staticmethod
+    def _sweep_staging() -> None:
+        """Удаляет промежуточные директории, оставшиеся после сбоя.
+
+        Директории моложе STAGING_MAX_AGE секунд не удаляются: их может
+        заполнять другой процесс бота с общим PATH_OF_DATA.
+        Аргументы: -
+        Возвращает: None
+        """
+        root = os.path.join(PATH_OF_DATA, STAGING_DIRECTORY)
+        if not os.path.exists(root):
+            return
+        deadline = time.time() - STAGING_MAX_AGE
+        for entry in os.scandir(root):
+            if entry.stat().st_mtime < deadline:
+                logger.info("removing stale staging directory %s", entry.path)
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def _publish(
+        self, staging: str, from_user_id: int, errors: list[Union[str, int]]
+    ) -> int:
+        """Публикует промежуточную директорию под свободным номером.
+
+        os.rename атомарен: тест либо целиком появляется под номером, либо
+        не появляется вовсе. Переименование не удается, если директория с
+        этим номером уже содержит тест, поэтому одновременные публикации
+        (в том числе в разных процессах бота с общим PATH_OF_DATA) не
+        получат один и тот же номер: проигравший берет следующий свободный.
+        Аргументы:
+            staging - промежуточная директория
+            from_user_id - пользовательский id
+            errors - список ошибок
+        Возвращает: номер директории теста
+        Вызывает: BotFilesException, если все номера заняты
+        """
+        for name in os.listdir(staging):
+            with open(os.path.join(staging, name), "rb") as file:
+                os.fsync(file.fileno())
+
+        directory = os.path.join(PATH_OF_DATA, str(from_user_id))
+        os.makedirs(directory, exist_ok=True)
+        while True:
+            number = self.get_directory_number(os.listdir(directory), errors)
+            try:
+                os.rename(staging, os.path.join(directory, str(number)))
+            except OSError as error:
+                if error.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                    raise
+                continue
+            return number
 
     def _add_test(
-        self, from_user_id: int, number: int, path: str, errors: list[Union[str, int]]
-    ) -> None:
+        self, from_user_id: int, path: str, errors: list[Union[str, int]]
+    ) -> int:
+        """Проверяет тест в промежуточной директории и публикует его.
+
+        Аргументы:
+            from_user_id - пользовательский id
+            path - путь к json-файлу теста в промежуточной директории
+            errors - список ошибок
+        Возвращает: номер директории опубликованного теста
+        Вызывает: BotParseException, если команду теста уже занял тест
+            другого процесса бота
+        """
         files_content: list[tuple[int, int, dict[str, Any]]] = []
-        initialized_tests: list[tuple[int, int, Test]] = []
         self._read_file(
             files_content,
             errors,
             from_user_id,
-            number,
+            0,
             path,
             is_raised=True,
         )
-        self._validate(files_content[0][2], errors)
-        self._initialize_test(
-            initialized_tests, from_user_id, number, files_content[0][2]
+        test = self.build_test(from_user_id, 0, files_content[0][2], errors)
+
+        # Команда резервируется в общем реестре до публикации: проверка
+        # в Validator видит только тесты этого процесса
+        token = Commands.reserve(test.command, from_user_id, errors)
+        try:
+            number = self._publish(os.path.dirname(path), from_user_id, errors)
+        except BaseException:
+            Commands.release(test.command, token)
+            raise
+        if not Commands.commit(test.command, token):
+            # Слот освобождается так же, как при /delete: директория
+            # переносится в .trash и удаляется в фоне
+            Reclaimer.delete(from_user_id, number)
+            raise BotParseException(errors, "Тест с такой командой уже существует.")
+
+        User.add_test(from_user_id, number, test.command, test.name)
+        self._append_tests_to_tree([(from_user_id, number, test)])
+        return number
+
+    def build_test(
+        self,
+        from_user_id: int,
+        number: int,
+        file_content: dict[str, Any],
+        errors: list[Union[str, int]],
+        is_new: bool = True,
+    ) -> Test:
+        """Проверяет содержимое json-файла теста и создает по нему тест.
+
+        Аргументы:
+            from_user_id - пользовательский id
+            number - номер директории теста
+            file_content - содержимое json-файла теста
+            errors - список ошибок
+            is_new - False, если создается новая версия существующего теста
+        Возвращает: тест
+        Вызывает: BotParseException, если тест составлен неправильно
+        """
+        initialized_tests: list[tuple[int, int, Test]] = []
+        self._validate(file_content, errors, is_new)
+        self._initialize_test(initialized_tests, from_user_id, number, file_content)
+        return Questions.intern(initialized_tests[0][2])
+
+    def _update_test(
+        self, from_user_id: int, path: str, errors: list[Union[str, int]]
+    ) -> int:
+        """Проверяет новую версию теста и заменяет ею прежнюю.
+
+        Файл теста заменяется атомарным os.replace, а тест в
+        CommandsTestTree - на месте, поэтому обновление не прерывает
+        прохождения: прежняя версия остается в Versions, пока ее проходят.
+        Аргументы:
+            from_user_id - пользовательский id
+            path - путь к json-файлу новой версии в промежуточной директории
+            errors - список ошибок
+        Возвращает: номер директории теста
+        Вызывает: BotParseException, если пользователь не является автором
+            теста с такой командой или тест составлен неправильно
+        """
+        files_content: list[tuple[int, int, dict[str, Any]]] = []
+        self._read_file(files_content, errors, from_user_id, 0, path, is_raised=True)
+        file_content = files_content[0][2]
+
+        command = file_content.get("command")
+        number = (
+            User.find_test(from_user_id, command) if isinstance(command, str) else None
+        )
+        if number is None:
+            raise BotParseException(
+                errors, "Вы не являетесь владельцем теста с такой командой."
+            )
+        test = self.build_test(from_user_id, number, file_content, errors, is_new=False)
+
+        directory = os.path.join(PATH_OF_DATA, str(from_user_id), str(number))
+        names = [name for name in os.listdir(directory) if REGEX_FILE.match(name)]
+        with open(path, "rb") as file:
+            os.fsync(file.fileno())
+        os.replace(
+            path, os.path.join(directory, names[0] if names else os.path.basename(path))
         )
-        User.add_test(from_user_id, number, initialized_tests[0][2].command)
-        self._append_tests_to_tree(initialized_tests)
+
+        previous = CommandsTestTree().replace(test)
+        if previous is None:
+            CommandsTestTree().append(Node(key=test))
+        else:
+            Versions.retire(previous)
+        # Название теста в каталоге могло измениться
+        User.add_test(from_user_id, number, test.command, test.name)
+        return number
 
     def _find_tests(self) -> list[tuple[int, int, str]]:
         tests = []
-        for root, _, files in os.walk(PATH_OF_DATA):
+        for root, directories, files in os.walk(PATH_OF_DATA):
+            if root == PATH_OF_DATA:
+                for name in (
+                    STAGING_DIRECTORY,
+                    QUARANTINE_DIRECTORY,
+                    TRASH_DIRECTORY,
+                    CATALOG_DIRECTORY,
+                ):
+                    if name in directories:
+                        directories.remove(name)
             for file in files:
                 directory = root.replace(PATH_OF_DATA, "")[1:]
-                from_user_id, number = list(map(int, directory.split("/")))
+                ids = directory.split("/")
+                if len(ids) != 2 or not all(map(str.isdigit, ids)):
+                    logger.warning("skipping %s outside of test directories", file)
+                    continue
+                from_user_id, number = list(map(int, ids))
                 tests.append((from_user_id, number, os.path.join(root, file)))
         return tests
 
     def _create_tests_from_files(self) -> None:
-        files_content: Any
-        initialized_tests: Any
+        """Загружает тесты из PATH_OF_DATA, проверяя каждый файл Validator.
 
+        Файлы читаются и проверяются параллельно в процессах Pool. Тест с
+        ошибкой (или с командой, которая уже занята другим тестом) не
+        загружается, а переносится в карантин, поэтому не мешает запуску.
+        Аргументы: -
+        Возвращает: None
+        """
         files_name = self._find_tests()
-        if cpu_count() > 1:
-            with Manager() as manager:
-                with Pool(cpu_count() - 1) as pool:
-                    files_content = manager.list()
-                    initialized_tests = manager.list()
-
-                    pool.starmap(
-                        partial(self._read_file, files_content, []),
-                        files_name,
-                    )
-
-                    pool.starmap(
-                        partial(self._initialize_test, initialized_tests),
-                        list(files_content),
-                    )
-                    initialized_tests = list(initialized_tests)
+        results: list[LoadResult]
+        is_pooled = cpu_count() > 1
+        if is_pooled:
+            with Pool(cpu_count() - 1) as pool:
+                results = pool.starmap(self._load_test, files_name)
         else:
-            files_content = list()
-            initialized_tests = list()
-            for (from_user_id, number, file_name) in files_name:
-                self._read_file(files_content, [], from_user_id, number, file_name)
-
-            for (from_user_id, number, file_content) in files_content:
-                self._initialize_test(
-                    initialized_tests, from_user_id, number, file_content
+            results = [self._load_test(*file_name) for file_name in files_name]
+
+        loaded: list[tuple[int, int, str, Test]] = []
+        quarantined: list[tuple[int, int]] = []
+        commands: set[str] = set()
+        # Из тестов с одной командой загружается тест с наименьшим номером
+        for (from_user_id, number, file_name, test, error) in sorted(
+            results, key=lambda result: result[:3]
+        ):
+            if test is not None and test.command in commands:
+                test, error = None, "Тест с такой командой уже существует."
+            if test is None:
+                self._quarantine(from_user_id, number, file_name, str(error))
+                quarantined.append((from_user_id, number))
+                continue
+            commands.add(test.command)
+            loaded.append((from_user_id, number, file_name, test))
+
+        # Команды, которые в реестре принадлежат тестам других авторов
+        # (например, загруженным другим процессом бота)
+        conflicts = set(
+            Commands.register(
+                (test.command, from_user_id) for from_user_id, _, _, test in loaded
+            )
+        )
+        initialized_tests: list[tuple[int, int, Test]] = []
+        for from_user_id, number, file_name, test in loaded:
+            if test.command in conflicts:
+                self._quarantine(
+                    from_user_id,
+                    number,
+                    file_name,
+                    "Тест с такой командой уже существует.",
                 )
-
-        for (from_user_id, number, test) in initialized_tests:
-            User.add_test(from_user_id, number, test.command)
+                quarantined.append((from_user_id, number))
+                commands.discard(test.command)
+                continue
+            if is_pooled:
+                # Тесты из других процессов получены копиями, поэтому
+                # одинаковые вопросы объединяются здесь
+                Questions.intern(test)
+            initialized_tests.append((from_user_id, number, test))
+
+        # Тесты из карантина убираются из списков тестов пользователей,
+        # оставшихся с прошлых запусков
+        for from_user_id, number in quarantined:
+            command = User.get_test_by_number(from_user_id, number)
+            if command is not None and command not in commands:
+                User.delete_test(from_user_id, command)
+                if command not in conflicts:
+                    Commands.release(command)
+        QUARANTINED_TESTS.set(len(quarantined))
+
+        # Все тесты добавляются в каталог одной пачкой
+        User.add_tests(
+            (from_user_id, number, test.command, test.name)
+            for from_user_id, number, test in initialized_tests
+        )
 
         self._append_tests_to_tree(initialized_tests)
 
+    def _load_test(self, from_user_id: int, number: int, file_name: str) -> LoadResult:
+        """Читает и проверяет файл теста (выполняется в процессе Pool).
+
+        Аргументы:
+            from_user_id - пользовательский id
+            number - номер директории теста
+            file_name - путь к json-файлу теста
+        Возвращает: (пользовательский id, номер, путь, тест или None, ошибка
+            или None); исключения не выходят за пределы функции, чтобы
+            поврежденный файл не останавливал загрузку остальных
+        """
+        files_content: list[tuple[int, int, dict[str, Any]]] = []
+        errors: list[Union[str, int]] = []
+        try:
+            self._read_file(
+                files_content, errors, from_user_id, number, file_name, is_raised=True
+            )
+            test = self.build_test(from_user_id, number, files_content[0][2], errors)
+        except Exception as error:
+            message = str(errors[0]) if errors else f"{type(error).__name__}: {error}"
+            return from_user_id, number, file_name, None, message
+        return from_user_id, number, file_name, test, None
+
+    @staticmethod
+    def _quarantine(from_user_id: int, number: int, file_name: str, error: str) -> None:
+        """Переносит файл теста с ошибкой в карантин.
+
+        Файл переносится в PATH_OF_DATA/.quarantine/<имя>/, а рядом
+        записывается отчет <имя>.json с полями user_id, number, file, error
+        и time. Ошибки файловой системы только записываются в журнал.
+        Аргументы:
+            from_user_id - пользовательский id
+            number - номер директории теста
+            file_name - путь к файлу теста
+            error - описание ошибки
+        Возвращает: None
+        """
+        logger.warning("quarantining %s: %s", file_name, error)
+        name = f"{from_user_id}-{number}-{time.time_ns()}"
+        directory = os.path.join(PATH_OF_DATA, QUARANTINE_DIRECTORY, name)
+        try:
+            os.makedirs(directory)
+            os.rename(file_name, os.path.join(directory, os.path.basename(file_name)))
+            with open(directory + ".json", "w", encoding="utf-8") as report:
+                json.dump(
+                    {
+                        "user_id": from_user_id,
+                        "number": number,
+                        "file": os.path.basename(file_name),
+                        "error": error,
+                        "time": time.time(),
+                    },
+                    report,
+                    ensure_ascii=False,
+                )
+            # Пустая директория теста освобождает его номер
+            if not os.listdir(os.path.dirname(file_name)):
+                os.rmdir(os.path.dirname(file_name))
+        except OSError as os_error:
+            logger.error(os_error)
+
     def _read_file(
         self,
         files_content: Any,
@@ -247,20 +605,30 @@ class BuilderTest(metaclass=Singleton):
             "result_explanation"
         )
 
+        # Короткие строки (тексты кнопок, тип элемента интерфейса, ответы)
+        # повторяются в тысячах тестов, поэтому заменяются общими экземплярами
         test_questions: list[Question] = []
         for question in questions:
             body = question["body"]
-            widget = question.get("widget")
-            answer = question["answer"]
-            answer_explanation = question.get("answer_explanation")
+            widget = intern_widget(question.get("widget"))
+            answer = intern_string(question["answer"])
+            answer_explanation = intern_string(question.get("answer_explanation"))
 
             test_questions.append(Question(body, widget, answer, answer_explanation))
 
+        version = self.get_version(file_content)
         initialized_tests.append(
             (
                 from_user_id,
                 number,
-                Test(command, name, description, test_questions, result_explanation),
+                Test(
+                    command,
+                    name,
+                    description,
+                    test_questions,
+                    result_explanation,
+                    version,
+                ),
             )
         )
 
@@ -272,7 +640,10 @@ class BuilderTest(metaclass=Singleton):
             CommandsTestTree().append(Node(key=test))
 
     def _validate(
-        self, file_content: dict[str, Any], errors: list[Union[str, int]]
+        self,
+        file_content: dict[str, Any],
+        errors: list[Union[str, int]],
+        is_new: bool = True,
     ) -> None:
         command: Any = file_content.get("command")
         name: Any = file_content.get("name")
@@ -287,4 +658,5 @@ class BuilderTest(metaclass=Singleton):
             description,
             questions,
             result_explanation,
+            is_new,
         )
@@ -0,0 +1,339 @@
+"""Модуль хранилищ каталога тестов.
+
+Каталог - это списки тестов пользователей: команда теста, пользовательский
+id автора, номер директории теста, название и время добавления. Файлы
+тестов по-прежнему хранятся в "<PATH_OF_DATA>/<id>/<номер>/<файл>.json"
+(этот формат используется и для импорта, и для экспорта тестов), а
+хранилище каталога отвечает, какие тесты есть у пользователя, кому
+принадлежит тест и сколько у пользователя тестов, не обходя директории.
+
+Хранилище выбирается настройкой CATALOG_SETTINGS["backend"]:
+    redis - список "<id>_tests" с ключами хешей "<id>:<команда>", в хеше
+        одно поле: номер директории - команда (прежний формат), и хеш
+        "<id>:numbers" номер директории - команда для поиска по номеру;
+    sqlite - таблица tests локальной базы SQLite с индексами по команде,
+        автору, названию и времени добавления.
+
+Классы:
+    Catalog - открытый класс, интерфейс хранилища каталога.
+    RedisCatalog - открытый класс, каталог в redis.
+    SQLiteCatalog - открытый класс, каталог в SQLite.
+Функции:
+    create_catalog - открытая функция, создает хранилище по настройкам.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Iterable, Optional, Union, cast
+
+from .constants import CATALOG_SETTINGS, PATH_OF_DATA
+from .redis_client import Redis
+
+# Директория внутри PATH_OF_DATA для базы SQLite по умолчанию
+CATALOG_DIRECTORY = ".catalog"
+
+# Запись каталога: (пользовательский id, номер директории, команда, название)
+Entry = tuple[int, int, str, str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tests (
+    command TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    number INTEGER NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tests_owner ON tests (user_id, number);
+CREATE INDEX IF NOT EXISTS tests_name ON tests (name);
+CREATE INDEX IF NOT EXISTS tests_created ON tests (created);
+"""
+
+
+class Catalog(ABC):
+    """Интерфейс хранилища каталога тестов."""
+
+    @abstractmethod
+    def add_tests(self, entries: Iterable[Entry]) -> None:
+        """Добавляет тесты в списки тестов пользователей.
+
+        Тест, который уже есть в каталоге, не дублируется.
+        Аргументы:
+            entries - записи (пользовательский id, номер, команда, название)
+        Возвращает: None
+        """
+
+    @abstractmethod
+    def delete_test(self, from_user_id: int, command: str) -> None:
+        """Удаляет тест из списка тестов пользователя.
+
+        Аргументы:
+            from_user_id - пользовательский id
+            command - команда теста
+        Возвращает: None
+        """
+
+    @abstractmethod
+    def get_tests_with_numbers(self, from_user_id: int) -> list[dict[str, str]]:
+        """Возвращает тесты пользователя с номерами директорий.
+
+        Аргументы:
+            from_user_id - пользовательский id
+        Возвращает: словари {номер: команда}, упорядоченные по команде
+        """
+
+    @abstractmethod
+    def find_test(self, from_user_id: int, command: str) -> Optional[int]:
+        """Возвращает номер директории теста пользователя.
+
+        Аргументы:
+            from_user_id - пользовательский id
+            command - команда теста
+        Возвращает: номер или None, если пользователь не автор теста
+        """
+
+    @abstractmethod
+    def get_command(self, from_user_id: int, number: int) -> Optional[str]:
+        """Возвращает команду теста пользователя по номеру директории.
+
+        Аргументы:
+            from_user_id - пользовательский id
+            number - номер директории теста
+        Возвращает: команду или None, если номер свободен
+        """
+
+    @abstractmethod
+    def count_tests(self, from_user_id: int) -> int:
+        """Возвращает количество тестов пользователя.
+
+        Аргументы:
+            from_user_id - пользовательский id
+        Возвращает: количество тестов
+        """
+
+    def get_tests(self, from_user_id: int) -> list[str]:
+        """Возвращает команды тестов пользователя в алфавитном порядке.
+
+        Аргументы:
+            from_user_id - пользовательский id
+        Возвращает: команды тестов
+        """
+        return [
+            command
+            for tests in self.get_tests_with_numbers(from_user_id)
+            for command in tests.values()
+        ]
+
+
+class RedisCatalog(Catalog):
+    """Каталог в redis.
+
+    Аргументы конструктора:
+        get_client - функция, возвращающая текущий клиент redis
+    """
+
+    def __init__(self, get_client: Callable[[], Redis]) -> None:
+        self._get_client = get_client
+
+    @staticmethod
+    def _get_key(from_user_id: int, command: str) -> str:
+        return str(from_user_id) + ":" + str(command)
+
+    @staticmethod
+    def _get_numbers_key(from_user_id: int) -> str:
+        # Команды начинаются с "/", поэтому ключ не совпадет с ключом теста
+        return str(from_user_id) + ":numbers"
+
+    def _fill_numbers(self, from_user_id: int) -> dict[Union[str, bytes], str]:
+        # Хеш номеров строится по списку тестов для тестов, добавленных до
+        # его появления. Хеш создается только полным: add_tests заполняет
+        # его перед добавлением первого номера
+        numbers: dict[Union[str, bytes], str] = {
+            number: command
+            for tests in self.get_tests_with_numbers(from_user_id)
+            for number, command in tests.items()
+        }
+        if numbers:
+            self._get_client().hset(
+                self._get_numbers_key(from_user_id), mapping=numbers
+            )
+        return numbers
+
+    def add_tests(self, entries: Iterable[Entry]) -> None:
+        entries = list(entries)
+        users = sorted({from_user_id for from_user_id, _, _, _ in entries})
+        client = self._get_client()
+        pipeline = client.pipeline(transaction=False)
+        for from_user_id, _, command, _ in entries:
+            pipeline.exists(self._get_key(from_user_id, command))
+        for from_user_id in users:
+            pipeline.exists(self._get_numbers_key(from_user_id))
+        results = pipeline.execute()
+        exists = results[: len(entries)]
+        for from_user_id, has_numbers in zip(users, results[len(entries) :]):
+            if not has_numbers:
+                self._fill_numbers(from_user_id)
+
+        pipeline = client.pipeline(transaction=False)
+        added: set[str] = set()
+        for (from_user_id, number, command, _), is_existing in zip(entries, exists):
+            key = self._get_key(from_user_id, command)
+            if is_existing or key in added:
+                continue
+            added.add(key)
+            pipeline.hset(key, mapping={str(number): command})
+            pipeline.hset(self._get_numbers_key(from_user_id), str(number), command)
+            pipeline.lpush(str(from_user_id) + "_tests", key)
+        pipeline.execute()
+
+    def delete_test(self, from_user_id: int, command: str) -> None:
+        key = self._get_key(from_user_id, command)
+        client = self._get_client()
+        numbers = client.hkeys(key)
+        pipeline = client.pipeline(transaction=False)
+        pipeline.lrem(str(from_user_id) + "_tests", 1, key)
+        pipeline.delete(key)
+        if numbers:
+            pipeline.hdel(self._get_numbers_key(from_user_id), *numbers)
+        pipeline.execute()
+
+    def get_tests_with_numbers(self, from_user_id: int) -> list[dict[str, str]]:
+        client = self._get_client()
+        pipeline = client.pipeline(transaction=False)
+        for key in client.lrange(str(from_user_id) + "_tests", 0, -1):
+            pipeline.hgetall(key)
+        return sorted(
+            [tests for tests in pipeline.execute() if tests],
+            key=lambda x: list(x.values()),
+        )
+
+    def find_test(self, from_user_id: int, command: str) -> Optional[int]:
+        for number in self._get_client().hkeys(self._get_key(from_user_id, command)):
+            return int(number)
+        return None
+
+    def get_command(self, from_user_id: int, number: int) -> Optional[str]:
+        numbers_key = self._get_numbers_key(from_user_id)
+        pipeline = self._get_client().pipeline(transaction=False)
+        pipeline.hget(numbers_key, str(number))
+        pipeline.exists(numbers_key)
+        command, has_numbers = pipeline.execute()
+        if command is not None or has_numbers:
+            return cast(Optional[str], command)
+        return self._fill_numbers(from_user_id).get(str(number))
+
+    def count_tests(self, from_user_id: int) -> int:
+        return int(self._get_client().llen(str(from_user_id) + "_tests"))
+
+
+class SQLiteCatalog(Catalog):
+    """Каталог в локальной базе SQLite.
+
+    Соединение общее для всех потоков процесса и защищено блокировкой.
+    Аргументы конструктора:
+        path - файл базы (":memory:" - база в памяти)
+    """
+
+    def __init__(self, path: str) -> None:
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        # isolation_level=None - каждая команда выполняется в своей
+        # транзакции, если транзакция не начата явно
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(_SCHEMA)
+
+    def add_tests(self, entries: Iterable[Entry]) -> None:
+        created = time.time()
+        rows = [
+            (command, from_user_id, number, name, created)
+            for from_user_id, number, command, name in entries
+        ]
+        with self._lock:
+            # Все записи добавляются одной транзакцией
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.executemany(
+                    "INSERT INTO tests (command, user_id, number, name, created) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT (command) DO UPDATE SET "
+                    "number = excluded.number, name = excluded.name "
+                    "WHERE tests.user_id = excluded.user_id",
+                    rows,
+                )
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def delete_test(self, from_user_id: int, command: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM tests WHERE command = ? AND user_id = ?",
+                (command, from_user_id),
+            )
+
+    def get_tests_with_numbers(self, from_user_id: int) -> list[dict[str, str]]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT number, command FROM tests WHERE user_id = ? "
+                "ORDER BY command",
+                (from_user_id,),
+            ).fetchall()
+        return [{str(number): command} for number, command in rows]
+
+    def find_test(self, from_user_id: int, command: str) -> Optional[int]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT number FROM tests WHERE command = ? AND user_id = ?",
+                (command, from_user_id),
+            ).fetchone()
+        return int(row[0]) if row else None
+
+    def get_command(self, from_user_id: int, number: int) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT command FROM tests WHERE user_id = ? AND number = ?",
+                (from_user_id, number),
+            ).fetchone()
+        return str(row[0]) if row else None
+
+    def count_tests(self, from_user_id: int) -> int:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT count(*) FROM tests WHERE user_id = ?", (from_user_id,)
+            ).fetchone()
+        return int(row[0])
+
+    def close(self) -> None:
+        """Закрывает соединение с базой.
+
+        Аргументы: -
+        Возвращает: None
+        """
+        with self._lock:
+            self._connection.close()
+
+
+def create_catalog(get_client: Callable[[], Redis]) -> Catalog:
+    """Создает хранилище каталога по CATALOG_SETTINGS.
+
+    Аргументы:
+        get_client - функция, возвращающая текущий клиент redis
+    Возвращает: хранилище каталога
+    Вызывает: ValueError, если CATALOG_SETTINGS["backend"] неизвестен
+    """
+    backend = CATALOG_SETTINGS["backend"]
+    if backend == "redis":
+        return RedisCatalog(get_client)
+    elif backend == "sqlite":
+        return SQLiteCatalog(
+            CATALOG_SETTINGS["path"]
+            or os.path.join(PATH_OF_DATA, CATALOG_DIRECTORY, "catalog.sqlite3")
+        )
+    raise ValueError(f'Неизвестное хранилище каталога "{backend}".')
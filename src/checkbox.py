@@ -0,0 +1,187 @@
+"""Модуль для работы с флаговыми кнопками.
+
+Состояние флаговых кнопок хранится в виде битовой маски: n-ый бит маски
+установлен, если включена (n + 1)-ая флаговая кнопка. Маска, по которой
+построена клавиатура, записывается в callback_data каждой кнопки в виде
+"маска:номер" (для кнопки "Ответить" номер отсутствует). Клавиатуры,
+отправленные в прежнем формате (callback_data "номер" или "Ответить"),
+считаются устаревшими: на их нажатия отвечает EXPIRED.
+
+Функции:
+    create_markup - открытая функция, строит клавиатуру флаговых кнопок.
+    parse_callback_data - открытая функция, разбирает callback_data кнопки.
+    get_checked - открытая функция, возвращает номера включенных кнопок.
+Классы:
+    _Checkboxes - закрытый класс, объединяет быстрые нажатия в одно изменение клавиатуры.
+Экземпляры классов:
+    Checkboxes - экземпляр класса для обработки нажатий на флаговые кнопки.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from telegram import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import TelegramError
+
+from .constants import CHECKBOX_DEBOUNCE, CHECKBOX_LIMIT
+from .log import logger
+
+CHECKED = "✅"
+SUBMIT = "Ответить"
+EXPIRED = "Клавиатура устарела, вопрос отправлен заново."
+
+
+def create_markup(labels: list[str], mask: int = 0) -> InlineKeyboardMarkup:
+    """Строит клавиатуру флаговых кнопок (по две кнопки в ряду) и кнопку "Ответить".
+
+    Аргументы:
+        labels - тексты флаговых кнопок
+        mask - битовая маска включенных кнопок
+    Возвращает: клавиатуру Телеграма
+    """
+    keyboard = [
+        [
+            InlineKeyboardButton(
+                label + CHECKED if mask >> number & 1 else label,
+                callback_data=f"{mask}:{number}",
+            )
+            for number, label in enumerate(labels[row : row + 2], start=row)
+        ]
+        for row in range(0, len(labels), 2)
+    ]
+    keyboard.append([InlineKeyboardButton(SUBMIT, callback_data=f"{mask}:")])
+
+    return InlineKeyboardMarkup(keyboard)
+
+
+def parse_callback_data(data: str) -> tuple[int, Optional[int]]:
+    """Разбирает callback_data флаговой кнопки.
+
+    Аргументы:
+        data - callback_data кнопки
+    Возвращает: битовую маску и номер кнопки (None для кнопки "Ответить")
+    Вызывает: ValueError, если callback_data не подходит под формат
+    """
+    mask, separator, number = data.partition(":")
+    if not separator:
+        raise ValueError(data)
+
+    return int(mask), int(number) if number else None
+
+
+def get_checked(mask: int) -> list[int]:
+    """Возвращает номера включенных флаговых кнопок (начиная с 1) по возрастанию.
+
+    Аргументы:
+        mask - битовая маска включенных кнопок
+    Возвращает: список номеров
+    """
+    return [number + 1 for number in range(mask.bit_length()) if mask >> number & 1]
+
+
+def _get_labels(markup: InlineKeyboardMarkup, mask: int) -> list[str]:
+    labels = []
+    for row in markup.inline_keyboard[:-1]:
+        for button in row:
+            _, number = parse_callback_data(str(button.callback_data))
+            if number is not None and mask >> number & 1:
+                labels.append(button.text[: -len(CHECKED)])
+            else:
+                labels.append(button.text)
+
+    return labels
+
+
+@dataclass
+class _Checkbox:
+    labels: list[str]
+    mask: int
+    rendered_mask: int
+    task: Optional["asyncio.Task[Any]"] = None
+
+
+class _Checkboxes:
+    """Класс для обработки нажатий на флаговые кнопки.
+
+    Нажатия на одно сообщение, пришедшие в течение CHECKBOX_DEBOUNCE секунд,
+    объединяются в одно изменение клавиатуры. Хранит не более CHECKBOX_LIMIT
+    сообщений, при вытеснении состояние восстанавливается из callback_data.
+    """
+
+    def __init__(self) -> None:
+        self._messages: dict[tuple[int, int], _Checkbox] = {}
+
+    async def toggle(self, query: CallbackQuery) -> None:
+        """Переключает флаговую кнопку и планирует изменение клавиатуры.
+
+        Аргументы:
+            query - запрос от нажатой кнопки
+        Возвращает: None
+        """
+        rendered_mask, number = parse_callback_data(str(query.data))
+        if number is None:
+            return
+
+        key = (query.message.chat_id, query.message.message_id)
+        checkbox = self._messages.get(key)
+        if checkbox is None:
+            checkbox = _Checkbox(
+                _get_labels(query.message.reply_markup, rendered_mask),
+                rendered_mask,
+                rendered_mask,
+            )
+            self._remember(key, checkbox)
+
+        checkbox.mask ^= 1 << number
+        if checkbox.task is None:
+            checkbox.task = asyncio.create_task(self._edit(query, checkbox))
+
+    def submit(self, query: CallbackQuery) -> list[int]:
+        """Возвращает ответ пользователя и забывает состояние сообщения.
+
+        Аргументы:
+            query - запрос от кнопки "Ответить"
+        Возвращает: номера включенных флаговых кнопок
+        """
+        mask, _ = parse_callback_data(str(query.data))
+        checkbox = self._messages.pop(
+            (query.message.chat_id, query.message.message_id), None
+        )
+        if checkbox is not None:
+            mask = checkbox.mask
+            if checkbox.task is not None:
+                checkbox.task.cancel()
+
+        return get_checked(mask)
+
+    def _remember(self, key: tuple[int, int], checkbox: _Checkbox) -> None:
+        if len(self._messages) >= CHECKBOX_LIMIT:
+            oldest = next(iter(self._messages))
+            self._messages.pop(oldest)
+        self._messages[key] = checkbox
+
+    async def _edit(self, query: CallbackQuery, checkbox: _Checkbox) -> None:
+        await asyncio.sleep(CHECKBOX_DEBOUNCE)
+        checkbox.task = None
+        if checkbox.mask == checkbox.rendered_mask:
+            return
+
+        rendered_mask, checkbox.rendered_mask = checkbox.rendered_mask, checkbox.mask
+        try:
+            await query.edit_message_reply_markup(
+                reply_markup=create_markup(checkbox.labels, checkbox.mask),
+            )
+        except TelegramError as error:
+            # Задача не ожидается обработчиком, поэтому ошибка (например,
+            # BadRequest или RetryAfter) только записывается в лог; следующее
+            # нажатие снова изменит клавиатуру
+            checkbox.rendered_mask = rendered_mask
+            logger.warning(
+                "checkbox: keyboard of message %s is not edited: %s",
+                query.message.message_id,
+                error,
+            )
+
+
+Checkboxes = _Checkboxes()
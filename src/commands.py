@@ -0,0 +1,147 @@
+"""Модуль реестра команд тестов, общего для всех процессов бота.
+
+CommandsTestTree проверяет уникальность команды только в своем процессе,
+поэтому несколько процессов бота (или одновременные загрузки) могли бы
+принять тесты с одной командой. Реестр хранит в redis ключ
+"command:<команда теста>" для каждой занятой команды:
+    "<id автора>:<метка>" - команда зарезервирована на время публикации
+        теста и освобождается сама через RESERVATION_TTL секунд;
+    "<id автора>" - тест с командой опубликован.
+Резервирование выполняется одной командой SET NX EX, поэтому из
+одновременных попыток занять команду удается только одна.
+
+Классы:
+    _Commands - закрытый класс реестра команд.
+Экземпляры классов:
+    Commands - экземпляр класса _Commands.
+"""
+
+import uuid
+from typing import Iterable, Optional, Union, cast
+
+import redis
+
+from .errors import BotParseException
+from .log import logger
+from .user import User
+
+COMMANDS_PREFIX = "command:"
+# Время (в секундах), за которое тест должен быть опубликован после
+# резервирования команды
+RESERVATION_TTL = 60
+
+
+class _Commands:
+    """Реестр команд тестов с резервированием, публикацией и освобождением."""
+
+    def reserve(
+        self, command: str, from_user_id: int, errors: list[Union[str, int]]
+    ) -> str:
+        """Резервирует команду на время публикации теста.
+
+        Аргументы:
+            command - команда теста
+            from_user_id - пользовательский id
+            errors - список ошибок
+        Возвращает: метку резервирования (для commit и release)
+        Вызывает: BotParseException, если команда уже занята
+        """
+        token = f"{from_user_id}:{uuid.uuid4().hex}"
+        if not User.redis_.set(
+            COMMANDS_PREFIX + command, token, nx=True, ex=RESERVATION_TTL
+        ):
+            raise BotParseException(errors, "Тест с такой командой уже существует.")
+        return token
+
+    def commit(self, command: str, token: str) -> bool:
+        """Закрепляет зарезервированную команду за опубликованным тестом.
+
+        Аргументы:
+            command - команда теста
+            token - метка резервирования
+        Возвращает: False, если резервирование истекло и команду успел
+            занять другой тест, иначе True
+        """
+        return self._replace(command, token, token.partition(":")[0])
+
+    def release(self, command: str, token: Optional[str] = None) -> None:
+        """Освобождает команду.
+
+        Аргументы:
+            command - команда теста
+            token - метка резервирования; если задана, команда освобождается,
+                только пока резервирование принадлежит этой метке
+        Возвращает: None
+        """
+        if token is None:
+            User.redis_.delete(COMMANDS_PREFIX + command)
+        else:
+            self._replace(command, token, None)
+
+    def register(self, tests: Iterable[tuple[str, int]]) -> list[str]:
+        """Записывает в реестр команды тестов, найденных на диске.
+
+        Команда записывается командой SET NX, только если она свободна:
+        публикация другого процесса или тест другого автора не затираются.
+        Команда, которая уже принадлежит тому же автору (опубликована или
+        зарезервирована), не считается конфликтом.
+        Аргументы:
+            tests - пары (команда теста)-(пользовательский id автора)
+        Возвращает: команды, которые в реестре принадлежат другим авторам
+        """
+        pending = {COMMANDS_PREFIX + command: str(uid) for command, uid in tests}
+        conflicts = []
+        while pending:
+            pipeline = User.redis_.pipeline(transaction=False)
+            for key, owner in pending.items():
+                pipeline.set(key, owner, nx=True)
+            for key in pending:
+                pipeline.get(key)
+            results = pipeline.execute()
+
+            released = {}
+            for (key, owner), is_set, value in zip(
+                pending.items(), results, results[len(pending) :]
+            ):
+                if is_set:
+                    continue
+                if value is None:
+                    # Команду освободили между SET NX и GET
+                    released[key] = owner
+                elif value.partition(":")[0] != owner:
+                    command = key[len(COMMANDS_PREFIX) :]
+                    logger.warning(
+                        "command %s of user %s is registered to %s",
+                        command,
+                        owner,
+                        value,
+                    )
+                    conflicts.append(command)
+            pending = released
+        return conflicts
+
+    @staticmethod
+    def _replace(command: str, token: str, value: Optional[str]) -> bool:
+        # Проверка метки и изменение выполняются в одной транзакции WATCH,
+        # чтобы не затронуть резервирование другого процесса
+        key = COMMANDS_PREFIX + command
+        with User.redis_.pipeline() as pipeline:
+            try:
+                pipeline.watch(key)
+                # После WATCH конвейер выполняет команды сразу и возвращает
+                # ответ, а не себя, как указано в types-redis
+                current = cast(Optional[str], pipeline.get(key))
+                if current is not None and current != token:
+                    return False
+                pipeline.multi()
+                if value is None:
+                    pipeline.delete(key)
+                else:
+                    pipeline.set(key, value)
+                pipeline.execute()
+            except redis.WatchError:
+                return False
+        return True
+
+
+Commands = _Commands()
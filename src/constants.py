@@ -8,6 +8,12 @@ PATH_OF_DATA = "./data"
 WIDGET_TYPES = ("input", "button", "checkbox")
 
 
+# Время (в секундах), в течение которого нажатия на флаговые кнопки
+# объединяются в одно изменение клавиатуры.
+CHECKBOX_DEBOUNCE = 0.3
+CHECKBOX_LIMIT = 10000
+
+
 REGEX_COMMAND = re.compile(r"^/test_[a-zA-Z0-9_]{1,35}$")
 REGEX_FILE = re.compile(r"^[a-zA-Z0-9_-]+\.json$")
 REGEX_LIST = re.compile(r"^/list [0-9]+-[0-9]+$")
@@ -18,3 +24,114 @@ REDIS_SETTINGS: dict[str, Any] = {
     "encoding": "utf-8",
     "decode_responses": True,
 }
+
+SESSION_SETTINGS: dict[str, Any] = {
+    # Максимальное количество пользователей в кэше сессий процесса
+    "cache_size": int(os.environ.get("SESSION_CACHE_SIZE", 10000)),
+    # Интервал (в секундах) записи изменений сессий в redis,
+    # 0 - изменения записываются сразу
+    "flush_interval": float(os.environ.get("SESSION_FLUSH_INTERVAL", 0.5)),
+    # Время (в секундах) без активности, после которого удаляются поля
+    # прохождения теста и черновик теста, создаваемого через /create
+    "session_ttl": int(os.environ.get("SESSION_TTL", 24 * 60 * 60)),
+    "draft_ttl": int(os.environ.get("DRAFT_TTL", 3 * 24 * 60 * 60)),
+    # Интервал (в секундах) запуска очистки и количество сессий в одной пачке
+    "sweep_interval": float(os.environ.get("SESSION_SWEEP_INTERVAL", 60)),
+    "sweep_batch": 500,
+    # Формат хранения сессии в redis: "hash" - хеш с полями по ключу
+    # пользовательского id, "packed" - одна компактная запись (src/session.py)
+    # по ключу "session:<id>"; хеши переносятся в записи при первом обращении
+    "encoding": os.environ.get("SESSION_ENCODING", "hash"),
+}
+
+METRICS_SETTINGS: dict[str, Any] = {
+    "host": os.environ.get("METRICS_HOST", "127.0.0.1"),
+    # 0 - HTTP сервер с метриками не запускается
+    "port": int(os.environ.get("METRICS_PORT", 8000)),
+}
+
+TRACING_SETTINGS: dict[str, Any] = {
+    # Доля обновлений, для которых записывается трасса (от 0 до 1)
+    "sample_rate": float(os.environ.get("TRACING_SAMPLE_RATE", 0.01)),
+    "path": os.environ.get("TRACING_FILE", "traces.jsonl"),
+    # URL OTLP/HTTP коллектора, если не задан - трассы пишутся в файл
+    "endpoint": os.environ.get("TRACING_ENDPOINT"),
+    "batch_size": 512,
+    "interval": 5.0,
+}
+
+ANSWERS_SETTINGS: dict[str, Any] = {
+    # Файл журнала ответов на вопросы тестов (одно событие на строку)
+    "path": os.environ.get("ANSWERS_FILE", "answers.jsonl"),
+    # Максимальное количество событий в одной записи и время ожидания пачки
+    "batch_size": 1000,
+    "interval": 1.0,
+    # Размер файла, после которого он переименовывается в "<path>.1", и
+    # количество хранимых прежних файлов (0 - прежние файлы удаляются).
+    # Статистика тестов хранится в redis и от журнала не зависит
+    "max_bytes": int(os.environ.get("ANSWERS_MAX_BYTES", 100 * 1024 * 1024)),
+    "backup_count": int(os.environ.get("ANSWERS_BACKUP_COUNT", 1)),
+}
+
+WATCHER_SETTINGS: dict[str, Any] = {
+    # Интервал (в секундах) проверки PATH_OF_DATA на тесты, добавленные,
+    # измененные или удаленные в обход бота, 0 - проверка не выполняется
+    "interval": float(os.environ.get("CATALOG_WATCH_INTERVAL", 0)),
+    # Время (в секундах), в течение которого файл теста не должен меняться,
+    # чтобы изменение было применено
+    "debounce": float(os.environ.get("CATALOG_WATCH_DEBOUNCE", 2)),
+}
+
+CATALOG_SETTINGS: dict[str, Any] = {
+    # Хранилище списков тестов пользователей: "redis" - списки и хеши redis,
+    # "sqlite" - локальная база SQLite (см. src/catalog.py)
+    "backend": os.environ.get("CATALOG_BACKEND", "redis"),
+    # Файл базы SQLite, по умолчанию <PATH_OF_DATA>/.catalog/catalog.sqlite3
+    "path": os.environ.get("CATALOG_DATABASE"),
+}
+
+RECLAIMER_SETTINGS: dict[str, Any] = {
+    # Количество потоков, удаляющих директории тестов после /delete
+    "workers": int(os.environ.get("RECLAIMER_WORKERS", 2)),
+    "batch_size": 100,
+    # Количество попыток удаления и задержка (в секундах) перед повтором
+    "retries": 5,
+    "retry_delay": 1.0,
+}
+
+PROFILER_SETTINGS: dict[str, Any] = {
+    # Идентификаторы пользователей Телеграма, которым доступна команда /profile
+    "admins": frozenset(
+        int(user_id)
+        for user_id in os.environ.get("ADMIN_IDS", "").split(",")
+        if user_id.strip()
+    ),
+    # Каталог для результатов профилирования (рядом с PATH_OF_DATA)
+    "path": os.environ.get("PROFILER_PATH", "./profiles"),
+    # Интервал между снимками стеков в секундах
+    "interval": float(os.environ.get("PROFILER_INTERVAL", 0.005)),
+    # Длительность профилирования по умолчанию и максимальная (в секундах)
+    "duration": 30.0,
+    "max_duration": 300.0,
+    # Количество самых медленных обработчиков в отчете
+    "top": 10,
+}
+
+LOG_SETTINGS: dict[str, Any] = {
+    "filename": os.environ.get("LOG_FILE", "logfile.log"),
+    "level": os.environ.get("LOG_LEVEL", "INFO"),
+    # Уровни для отдельных логгеров (библиотеки пишут много отладочных записей)
+    "levels": {
+        "httpx": "WARNING",
+        "httpcore": "WARNING",
+        "telegram": "WARNING",
+        "apscheduler": "WARNING",
+    },
+    # "size" - ротация по размеру файла, "time" - по времени (см. when)
+    "rotation": os.environ.get("LOG_ROTATION", "size"),
+    "max_bytes": int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024)),
+    "when": os.environ.get("LOG_WHEN", "midnight"),
+    "backup_count": int(os.environ.get("LOG_BACKUP_COUNT", 5)),
+    # Максимальное количество записей об обновлениях в секунду
+    "updates_rate": float(os.environ.get("LOG_UPDATES_RATE", 50)),
+}
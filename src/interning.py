@@ -0,0 +1,145 @@
+"""Модуль общих экземпляров одинаковых вопросов тестов.
+
+Популярные тесты загружают заново с небольшими изменениями, поэтому
+многие вопросы разных тестов (и разных версий одного теста) совпадают.
+Question не зависит от теста и не меняется после создания, поэтому
+одинаковые вопросы заменяются одним экземпляром: вопрос определяется
+хешем своего содержимого (тело, элемент интерфейса, ответ, объяснение).
+Вместе с вопросом общими становятся его подготовленные сообщения и
+клавиатура. Пул хранит вопросы по слабым ссылкам, поэтому вопрос
+удаленного теста освобождается, как только его не использует ни один тест.
+
+Разные вопросы тоже повторяют одни и те же короткие строки (тексты кнопок
+"Да", "Нет", числа, тип элемента интерфейса), поэтому строки из файла
+теста заменяются общими экземплярами (sys.intern), а одинаковые
+клавиатуры и кнопки создаются один раз.
+
+Функции:
+    intern_string - открытая функция, возвращает общий экземпляр строки.
+    intern_widget - открытая функция, заменяет строки элемента интерфейса общими.
+    get_markup - открытая функция, возвращает общую клавиатуру вопроса.
+Классы:
+    _QuestionPool - закрытый класс пула вопросов.
+Экземпляры классов:
+    Questions - экземпляр класса _QuestionPool.
+"""
+
+import hashlib
+import json
+import sys
+import weakref
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Optional, TypeVar, Union
+
+from telegram import InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+
+from .checkbox import create_markup
+
+if TYPE_CHECKING:
+    from .question import Question
+    from .test import Test
+
+# Количество различных клавиатур (и кнопок), которые хранятся для
+# повторного использования. Объекты Телеграма не поддерживают слабые
+# ссылки, поэтому кэш ограничен: вытесненная клавиатура просто
+# создается заново для следующего вопроса
+MARKUPS_CACHE_SIZE = 4096
+
+_T = TypeVar("_T")
+
+
+def intern_string(value: _T) -> _T:
+    """Возвращает общий экземпляр строки.
+
+    Аргументы:
+        value - строка или другое значение (возвращается без изменений)
+    Возвращает: общий экземпляр строки или value
+    """
+    if type(value) is str:
+        return sys.intern(value)  # type: ignore
+    return value
+
+
+def intern_widget(widget: Optional[dict[str, Any]]) -> Optional[dict[str, Any]]:
+    """Заменяет тип и тексты кнопок элемента интерфейса общими экземплярами строк.
+
+    Аргументы:
+        widget - элемент интерфейса вопроса из файла теста
+    Возвращает: новый элемент интерфейса (или None, если его нет)
+    """
+    if not widget:
+        return widget
+    interned = dict(widget)
+    interned["type"] = intern_string(widget.get("type"))
+    if isinstance(widget.get("body"), list):
+        interned["body"] = [intern_string(label) for label in widget["body"]]
+    return interned
+
+
+@lru_cache(maxsize=MARKUPS_CACHE_SIZE)
+def _get_button(label: str) -> KeyboardButton:
+    return KeyboardButton(label)
+
+
+@lru_cache(maxsize=MARKUPS_CACHE_SIZE)
+def get_markup(
+    widget_type: str, labels: tuple[str, ...]
+) -> Optional[Union[ReplyKeyboardMarkup, InlineKeyboardMarkup]]:
+    """Возвращает общую клавиатуру для элемента интерфейса вопроса.
+
+    Клавиатуры только отправляются пользователю и не изменяются, поэтому
+    вопросы с одинаковыми кнопками используют одну клавиатуру.
+    Аргументы:
+        widget_type - тип элемента интерфейса
+        labels - тексты кнопок
+    Возвращает: клавиатуру Телеграма или None для поля ввода
+    """
+    if widget_type == "button":
+        keyboard = [
+            [_get_button(label) for label in labels[:2]],
+            [_get_button(label) for label in labels[2:]],
+        ]
+        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    elif widget_type == "checkbox":
+        return create_markup(list(labels))
+    return None
+
+
+def _get_key(question: "Question") -> bytes:
+    content = (
+        question.body,
+        question.widget_type,
+        question.widget_body,
+        question.answer,
+        question.answer_epxlanation,
+    )
+    return hashlib.blake2b(
+        json.dumps(content, sort_keys=True).encode(), digest_size=16
+    ).digest()
+
+
+class _QuestionPool:
+    """Пул вопросов, в котором одинаковые вопросы хранятся один раз."""
+
+    def __init__(self) -> None:
+        self._questions: "weakref.WeakValueDictionary[bytes, Question]" = (
+            weakref.WeakValueDictionary()
+        )
+
+    def intern(self, test: "Test") -> "Test":
+        """Заменяет вопросы теста одинаковыми вопросами из пула.
+
+        Аргументы:
+            test - тест (его список вопросов изменяется на месте)
+        Возвращает: тот же тест
+        """
+        questions = test.questions
+        for number, question in enumerate(questions):
+            questions[number] = self._questions.setdefault(_get_key(question), question)
+        return test
+
+    def __len__(self) -> int:
+        return len(self._questions)
+
+
+Questions = _QuestionPool()
@@ -1,11 +1,160 @@
+"""Модуль логирования.
+
+Записи помещаются в очередь и записываются в файл отдельным потоком
+(QueueListener), поэтому логирование не блокирует цикл событий.
+Файл содержит по одной JSON-записи на строку.
+
+Классы:
+    JsonFormatter - открытый класс, форматирует записи в JSON.
+    JsonQueueHandler - открытый класс, помещает записи в очередь.
+    RateLimitFilter - открытый класс, ограничивает количество записей в секунду.
+Функции:
+    setup_logging - открытая функция, настраивает логирование.
+Экземпляры классов:
+    logger - логгер бота.
+    updates_logger - логгер обработанных обновлений (с ограничением частоты).
+"""
+
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
+import time
+from typing import Any, Optional
+
+from .constants import LOG_SETTINGS
+
+# Поля, которые можно передать через extra и которые попадут в JSON-запись.
+STRUCTURED_FIELDS = ("user_id", "command", "state", "latency")
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись в одну строку JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: dict[str, Any] = {
+            "time": self.formatTime(record, "%Y-%m-%d %H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        exception = getattr(record, "exception_text", None)
+        if exception is None and record.exc_info:
+            exception = self.formatException(record.exc_info)
+        if exception:
+            data["exception"] = exception
+
+        return json.dumps(data, ensure_ascii=False)
+
+
+class JsonQueueHandler(logging.handlers.QueueHandler):
+    """Помещает записи в очередь, сохраняя текст исключения.
+
+    QueueHandler.prepare добавляет трассировку к сообщению и удаляет
+    exc_info, поэтому текст исключения переносится в атрибут
+    exception_text, из которого его берет JsonFormatter.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        exception = record.exc_text
+        if record.exc_info:
+            exception = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.exc_text = None
+
+        record = super().prepare(record)
+        setattr(record, "exception_text", exception)
+        return record
+
+
+class RateLimitFilter(logging.Filter):
+    """Пропускает не больше rate записей в секунду, остальные отбрасывает.
+
+    Количество отброшенных записей добавляется к сообщению следующей
+    пропущенной записи.
+    """
+
+    def __init__(self, rate: float, name: str = "") -> None:
+        super().__init__(name)
+        self._rate = rate
+        self._tokens = rate
+        self._last = time.monotonic()
+        self._dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self._rate, self._tokens + (now - self._last) * self._rate)
+        self._last = now
+        if self._tokens < 1:
+            self._dropped += 1
+            return False
+
+        self._tokens -= 1
+        if self._dropped:
+            record.msg = f"{record.msg} (dropped: {self._dropped})"
+            self._dropped = 0
+        return True
+
+
+def _create_file_handler(settings: dict[str, Any]) -> logging.Handler:
+    if settings["rotation"] == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            settings["filename"],
+            when=settings["when"],
+            backupCount=settings["backup_count"],
+            encoding="utf-8",
+        )
+    return logging.handlers.RotatingFileHandler(
+        settings["filename"],
+        maxBytes=settings["max_bytes"],
+        backupCount=settings["backup_count"],
+        encoding="utf-8",
+    )
+
+
+def setup_logging(
+    settings: dict[str, Any] = LOG_SETTINGS,
+) -> Optional[logging.handlers.QueueListener]:
+    """Настраивает логирование через очередь.
+
+    Аргументы:
+        settings - настройки логирования (см. LOG_SETTINGS)
+    Возвращает: запущенный QueueListener или None, если логирование уже настроено
+    """
+    root = logging.getLogger()
+    if any(
+        isinstance(handler, logging.handlers.QueueHandler) for handler in root.handlers
+    ):
+        return None
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    file_handler = _create_file_handler(settings)
+    file_handler.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(
+        records, file_handler, respect_handler_level=True
+    )
+
+    root.addHandler(JsonQueueHandler(records))
+    root.setLevel(settings["level"])
+    for name, level in settings["levels"].items():
+        logging.getLogger(name).setLevel(level)
+    logging.getLogger("bot.updates").addFilter(
+        RateLimitFilter(settings["updates_rate"])
+    )
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
 
-FORMAT = "%(asctime)s %(levelname)s %(message)s"
-logging.basicConfig(
-    filename="logfile.log",
-    format=FORMAT,
-    datefmt="%Y-%m-%d %H:%M:%S",
-    level=logging.DEBUG,
-)
+setup_logging()
 
-logger = logging.getLogger()
+logger = logging.getLogger("bot")
+updates_logger = logging.getLogger("bot.updates")
@@ -0,0 +1,363 @@
+"""Модуль метрик в текстовом формате Prometheus.
+
+Классы:
+    Counter - открытый класс, счетчик.
+    Gauge - открытый класс, мгновенное значение (в том числе вычисляемое при запросе).
+    Histogram - открытый класс, гистограмма.
+    Registry - открытый класс, реестр метрик.
+Функции:
+    track_update - открытая функция, замеряет обработку обновления.
+    count_redis_commands - открытая функция, учитывает команды redis.
+    start_server - открытая функция, запускает HTTP сервер с метриками.
+Экземпляры классов:
+    REGISTRY - реестр метрик бота, а также сами метрики бота.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterator, Optional, Sequence
+
+LabelValues = tuple[str, ...]
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ""
+    return (
+        "{"
+        + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+        + "}"
+    )
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type_: str
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}.")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def expose(self) -> str:
+        lines = [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.type_}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Счетчик, значение которого может только увеличиваться."""
+
+    type_ = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: Any) -> float:
+        return self._values.get(self._label_values(labels), 0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    """Мгновенное значение. Может вычисляться функцией в момент запроса метрик."""
+
+    type_ = "gauge"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def get(self) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._value
+
+    def _samples(self) -> list[str]:
+        return [f"{self.name} {_format_value(self.get())}"]
+
+
+class Histogram(_Metric):
+    """Гистограмма значений (например, времени выполнения)."""
+
+    type_ = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            # Счетчики корзин, затем сумма и количество
+            values = self._values.setdefault(key, [0.0] * (len(self._buckets) + 2))
+            for number, bound in enumerate(self._buckets):
+                if value <= bound:
+                    values[number] += 1
+                    break
+            values[-2] += value
+            values[-1] += 1
+
+    def get_count(self, **labels: Any) -> float:
+        values = self._values.get(self._label_values(labels))
+        return values[-1] if values else 0
+
+    def get_sum(self, **labels: Any) -> float:
+        values = self._values.get(self._label_values(labels))
+        return values[-2] if values else 0
+
+    def totals(self) -> dict[LabelValues, tuple[float, float]]:
+        """Возвращает сумму и количество наблюдений для каждого набора меток."""
+        with self._lock:
+            return {
+                key: (values[-2], values[-1]) for key, values in self._values.items()
+            }
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = [(key, list(values)) for key, values in self._values.items()]
+
+        samples = []
+        names = self.labelnames + ("le",)
+        for key, values in items:
+            cumulative = 0.0
+            for number, bound in enumerate(self._buckets):
+                cumulative += values[number]
+                labels = _format_labels(names, key + (_format_value(bound),))
+                samples.append(
+                    f"{self.name}_bucket{labels} {_format_value(cumulative)}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            samples.append(f"{self.name}_sum{labels} {_format_value(values[-2])}")
+            samples.append(f"{self.name}_count{labels} {_format_value(values[-1])}")
+        return samples
+
+
+class Registry:
+    """Реестр метрик."""
+
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: Any) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def expose(self) -> str:
+        """Возвращает все метрики в текстовом формате Prometheus."""
+        return "\n".join(metric.expose() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_SECONDS: Histogram = REGISTRY.register(
+    Histogram(
+        "bot_handler_seconds",
+        "Время обработки обновления по командам.",
+        ("command",),
+    )
+)
+REDIS_COMMANDS: Counter = REGISTRY.register(
+    Counter("bot_redis_commands_total", "Количество команд redis.", ("command",))
+)
+REDIS_COMMANDS_PER_UPDATE: Histogram = REGISTRY.register(
+    Histogram(
+        "bot_redis_commands_per_update",
+        "Количество команд redis за одно обновление.",
+        buckets=(0, 1, 2, 3, 5, 8, 13, 21),
+    )
+)
+SESSION_CACHE: Counter = REGISTRY.register(
+    Counter(
+        "bot_session_cache_total",
+        "Обращения к кэшу сессий пользователей (hit - попадание, miss - промах).",
+        ("result",),
+    )
+)
+EXPIRED_SESSIONS: Counter = REGISTRY.register(
+    Counter(
+        "bot_expired_sessions_total",
+        "Количество очищенных сессий (session - прохождение теста, draft - черновик).",
+        ("group",),
+    )
+)
+RECLAIMED_BYTES: Counter = REGISTRY.register(
+    Counter(
+        "bot_session_reclaimed_bytes_total",
+        "Размер удаленных полей сессий (названия и значения) в байтах.",
+    )
+)
+TELEGRAM_REQUEST_SECONDS: Histogram = REGISTRY.register(
+    Histogram(
+        "bot_telegram_request_seconds",
+        "Время запросов к Telegram Bot API по методам.",
+        ("method",),
+    )
+)
+TELEGRAM_ERRORS: Counter = REGISTRY.register(
+    Counter(
+        "bot_telegram_errors_total",
+        "Количество ошибок запросов к Telegram Bot API по методам.",
+        ("method",),
+    )
+)
+DROPPED_SPANS: Counter = REGISTRY.register(
+    Counter(
+        "bot_dropped_spans_total",
+        "Количество промежутков трассы, которые не удалось экспортировать.",
+    )
+)
+TREE_SIZE: Gauge = REGISTRY.register(
+    Gauge("bot_tree_size", "Количество тестов в дереве команд.")
+)
+TREE_DEPTH: Gauge = REGISTRY.register(Gauge("bot_tree_depth", "Глубина дерева команд."))
+QUESTIONS: Gauge = REGISTRY.register(
+    Gauge("bot_questions", "Количество уникальных вопросов тестов в памяти.")
+)
+STARTUP_SECONDS: Gauge = REGISTRY.register(
+    Gauge("bot_startup_seconds", "Время загрузки тестов при запуске.")
+)
+QUARANTINED_TESTS: Gauge = REGISTRY.register(
+    Gauge(
+        "bot_quarantined_tests",
+        "Количество тестов, перенесенных в карантин при запуске.",
+    )
+)
+
+_update_redis_commands: ContextVar[Optional[list[int]]] = ContextVar(
+    "update_redis_commands", default=None
+)
+
+
+@contextmanager
+def track_update(command: str) -> Iterator[dict[str, str]]:
+    """Замеряет время обработки обновления и количество команд redis в нем.
+
+    Аргументы:
+        command - команда (метка метрики), ее можно изменить через
+            возвращаемый словарь, когда обработчик станет известен
+    """
+    labels = {"command": command}
+    counter = [0]
+    token = _update_redis_commands.set(counter)
+    start = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        HANDLER_SECONDS.observe(time.perf_counter() - start, **labels)
+        REDIS_COMMANDS_PER_UPDATE.observe(counter[0])
+        _update_redis_commands.reset(token)
+
+
+def count_redis_commands(names: Sequence[str]) -> None:
+    """Учитывает выполненные команды redis.
+
+    Аргументы:
+        names - названия команд (для конвейера - все его команды)
+    Возвращает: None
+    """
+    for name in names:
+        REDIS_COMMANDS.inc(command=name)
+    counter = _update_redis_commands.get()
+    if counter is not None:
+        counter[0] += len(names)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+
+        body = REGISTRY.expose().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        return None
+
+
+def start_server(host: str, port: int) -> ThreadingHTTPServer:
+    """Запускает HTTP сервер с метриками (GET /metrics) в отдельном потоке.
+
+    Аргументы:
+        host - адрес
+        port - порт
+    Возвращает: запущенный сервер
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,160 @@
+"""Модуль выборочного профилировщика работающего бота.
+
+Профилировщик запускается на заданное время в отдельном потоке и с
+интервалом PROFILER_SETTINGS["interval"] снимает стеки всех потоков
+процесса (sys._current_frames), поэтому цикл событий не блокируется.
+По окончании в каталог PROFILER_SETTINGS["path"] записываются два файла:
+    profile-<время>.folded - свернутые стеки (формат flamegraph.pl и speedscope);
+    profile-<время>.txt - самые медленные обработчики за время профилирования
+        (по метрике bot_handler_seconds).
+
+Функции:
+    format_collapsed - открытая функция, форматирует свернутые стеки.
+    get_slowest_handlers - открытая функция, находит самые медленные обработчики.
+Классы:
+    _Profiler - закрытый класс, выборочный профилировщик.
+Экземпляры классов:
+    Profiler - экземпляр класса _Profiler.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from types import FrameType
+from typing import Optional
+
+from .constants import PROFILER_SETTINGS
+from .metrics import HANDLER_SECONDS, LabelValues
+
+HandlerTotals = dict[LabelValues, tuple[float, float]]
+
+
+def _get_stack(frame: Optional[FrameType]) -> list[str]:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(
+            f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        )
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def format_collapsed(stacks: Counter[str]) -> str:
+    """Форматирует стеки в свернутом виде: "кадр;кадр;кадр количество".
+
+    Аргументы:
+        stacks - количество снимков для каждого стека (кадры разделены ";")
+    Возвращает: текст файла
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+
+def get_slowest_handlers(
+    before: HandlerTotals, after: HandlerTotals, top: int
+) -> list[tuple[str, int, float]]:
+    """Находит обработчики с наибольшим средним временем за время профилирования.
+
+    Аргументы:
+        before - сумма и количество наблюдений HANDLER_SECONDS в начале
+        after - сумма и количество наблюдений HANDLER_SECONDS в конце
+        top - количество обработчиков
+    Возвращает: список (команда, количество вызовов, среднее время в секундах)
+    """
+    handlers = []
+    for key, (total, count) in after.items():
+        total_before, count_before = before.get(key, (0.0, 0.0))
+        calls = int(count - count_before)
+        if calls:
+            handlers.append((key[0], calls, (total - total_before) / calls))
+
+    handlers.sort(key=lambda handler: handler[2], reverse=True)
+    return handlers[:top]
+
+
+class _Profiler:
+    """Выборочный профилировщик. Одновременно может работать только один."""
+
+    def __init__(self) -> None:
+        self._future: Optional["Future[tuple[str, str]]"] = None
+
+    @property
+    def running(self) -> bool:
+        return self._future is not None and not self._future.done()
+
+    def start(self, duration: float) -> "Future[tuple[str, str]]":
+        """Запускает профилирование в отдельном потоке.
+
+        Аргументы:
+            duration - длительность в секундах
+        Возвращает: Future с путями к файлу стеков и к отчету
+        Вызывает: RuntimeError, если профилирование уже запущено
+        """
+        if self.running:
+            raise RuntimeError("Профилирование уже запущено.")
+
+        future: "Future[tuple[str, str]]" = Future()
+        self._future = future
+        threading.Thread(
+            target=self._run, args=(duration, future), name="profiler", daemon=True
+        ).start()
+        return future
+
+    def _run(self, duration: float, future: "Future[tuple[str, str]]") -> None:
+        try:
+            future.set_result(self._profile(duration))
+        except Exception as error:
+            future.set_exception(error)
+
+    def _profile(self, duration: float) -> tuple[str, str]:
+        own_ident = threading.get_ident()
+        interval = PROFILER_SETTINGS["interval"]
+        names: dict[int, str] = {}
+        stacks: Counter[str] = Counter()
+        samples = 0
+        handlers_before = HANDLER_SECONDS.totals()
+
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                if ident not in names:
+                    names.update(
+                        (thread.ident, thread.name)
+                        for thread in threading.enumerate()
+                        if thread.ident is not None
+                    )
+                stack = _get_stack(frame)
+                stack.insert(0, names.get(ident, str(ident)))
+                stacks[";".join(stack)] += 1
+            samples += 1
+            time.sleep(interval)
+
+        handlers = get_slowest_handlers(
+            handlers_before, HANDLER_SECONDS.totals(), PROFILER_SETTINGS["top"]
+        )
+
+        os.makedirs(PROFILER_SETTINGS["path"], exist_ok=True)
+        name = os.path.join(
+            PROFILER_SETTINGS["path"], time.strftime("profile-%Y%m%d-%H%M%S")
+        )
+        with open(name + ".folded", "w", encoding="utf-8") as file:
+            file.write(format_collapsed(stacks))
+        with open(name + ".txt", "w", encoding="utf-8") as file:
+            file.write(
+                f"Длительность: {duration} с, снимков: {samples}\n"
+                "Самые медленные обработчики (команда, вызовы, среднее время):\n"
+            )
+            file.writelines(
+                f"{command} {calls} {mean:.6f}\n" for command, calls, mean in handlers
+            )
+
+        return name + ".folded", name + ".txt"
+
+
+Profiler = _Profiler()
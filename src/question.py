@@ -7,17 +7,15 @@
 
 from typing import Optional, Union
 
-from telegram import (
-    InlineKeyboardButton,
-    InlineKeyboardMarkup,
-    KeyboardButton,
-    ReplyKeyboardMarkup,
-    ReplyKeyboardRemove,
-)
+from telegram import InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove
 
 from src.user import User
 
 from .bot import bot
+from .interning import get_markup
+from .slots import cached_slot
+
+_REMOVE_MARKUP = ReplyKeyboardRemove(selective=False)
 
 
 class Question:
@@ -33,12 +31,27 @@ class Question:
         markup - элемент интерфейса Телеграма
     """
 
+    # Вопросов в каталоге много, поэтому у экземпляров нет __dict__.
+    # __weakref__ нужен пулу вопросов (src/interning.py)
+    __slots__ = (
+        "_body",
+        "_answer",
+        "_widget_type",
+        "_widget_body",
+        "_answer_explanation",
+        "_markup",
+        "_cached_body_payload",
+        "_cached_right_answer_text",
+        "_cached_explanation_payload",
+        "__weakref__",
+    )
+
     _body: Union[str, dict[str, str]]
     _answer: Union[str, int, list[int]]
     _widget_type: str
     _widget_body: list[str]
     _answer_explanation: Optional[Union[str, dict[str, str]]]
-    _markup: Optional[Union[InlineKeyboardButton, KeyboardButton]]
+    _markup: Optional[Union[ReplyKeyboardMarkup, InlineKeyboardMarkup]]
 
     def __init__(
         self,
@@ -64,7 +77,7 @@ class Question:
         )
 
         widget_type = widget.get("type", "input") if widget else "input"
-        widget_body = widget.get("body") if widget else []
+        widget_body = widget.get("body", []) if widget else []
         markup = None
 
         if isinstance(widget_type, str):
@@ -72,28 +85,7 @@ class Question:
 
         if isinstance(widget_body, list):
             self._widget_body = widget_body
-
-            if self._widget_type == "button":
-                keyboard = [
-                    [KeyboardButton(button) for button in self._widget_body[:2]],
-                    [KeyboardButton(button) for button in self._widget_body[2:]],
-                ]
-
-                markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-            elif self._widget_type == "checkbox":
-                keyboard = [
-                    [
-                        InlineKeyboardButton(button, callback_data=counter)
-                        for counter, button in enumerate(self._widget_body[:2], start=1)
-                    ],
-                    [
-                        InlineKeyboardButton(button, callback_data=counter)
-                        for counter, button in enumerate(self._widget_body[2:], start=3)
-                    ],
-                    [InlineKeyboardButton("Ответить", callback_data="Ответить")],
-                ]
-
-                markup = InlineKeyboardMarkup(keyboard)
+            markup = get_markup(self._widget_type, tuple(self._widget_body))
 
         self._markup = markup
 
@@ -105,6 +97,56 @@ class Question:
     widget_body = property(lambda self: self._widget_body)
     markup = property(lambda self: self._markup)
 
+    @cached_slot
+    def _body_payload(self) -> tuple[Optional[str], str]:
+        """URL рисунка и текст тела вопроса."""
+        if isinstance(self._body, str):
+            return None, self._body
+        return self._body.get("url"), self._body["text"]
+
+    @cached_slot
+    def _right_answer_text(self) -> str:
+        """Правильный ответ в том виде, в котором он показывается пользователю."""
+        if self._widget_type == "button" and isinstance(self._answer, int):
+            return self._widget_body[self._answer - 1]
+        if isinstance(self._answer, list):
+            return self._join_checked(self._answer)
+        return str(self._answer)
+
+    @cached_slot
+    def _explanation_payload(self) -> tuple[Optional[str], str]:
+        """URL рисунка и окончание сообщения с результатом ответа.
+
+        Окончание содержит правильный ответ и объяснение ответа, поэтому
+        при проверке остается подставить только ответ пользователя.
+        """
+        url: Optional[str] = None
+        if isinstance(self._answer_explanation, dict):
+            url = self._answer_explanation.get("url")
+            text = (
+                self._answer_explanation.get("text") or "Объяснение ответа отсутствует."
+            )
+        else:
+            text = str(self._answer_explanation)
+
+        return (
+            url,
+            f'"\nПравильный ответ: "{self._right_answer_text}"\nОбъяснение ответа:\n'
+            + text,
+        )
+
+    def prepare(self) -> None:
+        """Заранее формирует неизменяемые части сообщений вопроса.
+
+        Аргументы: -
+        Возвращает: None
+        """
+        self._body_payload
+        self._explanation_payload
+
+    def _join_checked(self, checked: list[int]) -> str:
+        return ", ".join([self._widget_body[number - 1] for number in checked])
+
     async def __call__(self, from_user_id: int) -> None:
         """Отправляет пользователю описание вопроса.
 
@@ -112,40 +154,33 @@ class Question:
             from_user_id - пользовательский id
         Возвращает: None
         """
-        if isinstance(self._body, str):
-            await bot.send_message(
-                chat_id=from_user_id, text=self._body, reply_markup=self._markup
+        url, text = self._body_payload
+        if url:
+            await bot.send_photo(
+                chat_id=from_user_id,
+                photo=url,
+                caption=text,
+                reply_markup=self._markup,
             )
         else:
-            url = self._body.get("url")
-            text = self._body.get("text")
-
-            if url:
-                await bot.send_photo(
-                    chat_id=from_user_id,
-                    photo=url,
-                    caption=text,
-                    reply_markup=self._markup,
-                )
-            else:
-                await bot.send_message(
-                    chat_id=from_user_id,
-                    text=text,
-                    reply_markup=self._markup,
-                )
+            await bot.send_message(
+                chat_id=from_user_id,
+                text=text,
+                reply_markup=self._markup,
+            )
 
     async def check(
         self,
         from_user_id: int,
         answer: Union[str, int, list[int]],
-    ) -> None:
+    ) -> bool:
         """Проверяет ответ пользователя.
 
         После проверки ответа, сообщает пользователю результат, правильный ответ и объяснение ответа.
         Аргументы:
             from_user_id - пользовательский id
             answer - ответ пользователя на вопрос
-        Возвращает: None
+        Возвращает: True, если ответ правильный
         """
         markup = None
         if (
@@ -153,77 +188,51 @@ class Question:
             and isinstance(self._answer, str)
             and self._widget_type == "input"
         ):
-            if answer == self._answer:
-                message = f'Правильно ✅\nВаш ответ: "{answer}"\nПравильный ответ: "{self._answer}"\nОбъяснение ответа:\n'
-                User.set(
-                    from_user_id,
-                    right_answers_number=int(
-                        User.get(from_user_id, "right_answers_number")
-                    )
-                    + 1,
-                )
-            else:
-                message = f'Неправильно ❌\nВаш ответ: "{answer}"\nПравильный ответ: "{self._answer}"\nОбъяснение ответа:\n'
+            is_right = answer == self._answer
+            user_answer = answer
         elif (
             isinstance(answer, str)
             and isinstance(self._answer, int)
             and self._widget_type == "button"
         ):
-            markup = ReplyKeyboardRemove(selective=False)
-            if answer == self._widget_body[self._answer - 1]:
-                message = f'Правильно ✅\nВаш ответ: "{answer}"\nПравильный ответ: "{self._widget_body[self._answer - 1]}"\nОбъяснение ответа:\n'
-                User.set(
-                    from_user_id,
-                    right_answers_number=int(
-                        User.get(from_user_id, "right_answers_number")
-                    )
-                    + 1,
-                )
-            else:
-                message = f'Неправильно ❌\nВаш ответ: "{answer}"\nПравильный ответ: "{self._widget_body[self._answer - 1]}"\nОбъяснение ответа:\n'
+            markup = _REMOVE_MARKUP
+            is_right = answer == self._right_answer_text
+            user_answer = answer
         elif isinstance(answer, list) and isinstance(self._answer, list):
-            if answer == self._answer:
-                message = f'Правильно ✅\nВаш ответ: "{", ".join([self._widget_body[_answer - 1] for _answer in answer])}"\nПравильный ответ: "{", ".join([self._widget_body[_answer - 1] for _answer in self._answer])}"\nОбъяснение ответа:\n'
-                User.set(
-                    from_user_id,
-                    right_answers_number=int(
-                        User.get(from_user_id, "right_answers_number")
-                    )
-                    + 1,
-                )
-            else:
-                message = f'Неправильно ❌\nВаш ответ: "{", ".join([self._widget_body[_answer - 1] for _answer in answer])}"\nПравильный ответ: "{", ".join([self._widget_body[_answer - 1] for _answer in self._answer])}"\nОбъяснение ответа:\n'
+            is_right = answer == self._answer
+            user_answer = self._join_checked(answer)
+
+        if is_right:
+            User.set(
+                from_user_id,
+                right_answers_number=int(User.get(from_user_id, "right_answers_number"))
+                + 1,
+            )
 
         User.set(
             from_user_id,
             question_index=int(User.get(from_user_id, "question_index")) + 1,
         )
-        if isinstance(self._answer_explanation, str):
-            message += self._answer_explanation
+
+        url, explanation = self._explanation_payload
+        message = (
+            ("Правильно ✅" if is_right else "Неправильно ❌")
+            + '\nВаш ответ: "'
+            + user_answer
+            + explanation
+        )
+        if url:
+            await bot.send_photo(
+                chat_id=from_user_id,
+                photo=url,
+                reply_markup=markup,
+                caption=message,
+            )
+        else:
             await bot.send_message(
                 chat_id=from_user_id,
                 text=message,
                 reply_markup=markup,
             )
-        elif isinstance(self._answer_explanation, dict):
-            url = self._answer_explanation.get("url")
-            text = self._answer_explanation["text"]
-
-            if text:
-                message += text
-            else:
-                message += "Объяснение ответа отсутствует."
-
-            if url:
-                await bot.send_photo(
-                    chat_id=from_user_id,
-                    photo=url,
-                    reply_markup=markup,
-                    caption=message,
-                )
-            else:
-                await bot.send_message(
-                    chat_id=from_user_id,
-                    text=message,
-                    reply_markup=markup,
-                )
+
+        return is_right
@@ -0,0 +1,132 @@
+"""Модуль фонового удаления директорий тестов.
+
+Удаление директории теста (shutil.rmtree) на медленном или сетевом диске
+может занимать секунды, поэтому /delete только переименовывает директорию
+в PATH_OF_DATA/.trash (одна операция с метаданными, номер теста сразу
+освобождается), а сами файлы удаляются пачками в пуле потоков. Неудачное
+удаление повторяется с нарастающей задержкой. Директории, оставшиеся в
+.trash после остановки бота, удаляются при следующем запуске (collect).
+
+Классы:
+    _Reclaimer - закрытый класс фонового удаления.
+Экземпляры классов:
+    Reclaimer - экземпляр класса _Reclaimer.
+"""
+
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
+
+from .constants import PATH_OF_DATA, RECLAIMER_SETTINGS
+from .log import logger
+
+# Директория внутри PATH_OF_DATA для удаленных тестов
+TRASH_DIRECTORY = ".trash"
+
+
+class _Reclaimer:
+    """Удаляет директории тестов в фоновых потоках.
+
+    Аргументы конструктора:
+        path - директория с тестами
+        workers - количество потоков удаления
+        batch_size - максимальное количество директорий в пачке
+        retries - количество попыток удаления директории
+        retry_delay - задержка (в секундах) перед второй попыткой,
+            перед каждой следующей она удваивается
+    """
+
+    def __init__(
+        self,
+        path: str = PATH_OF_DATA,
+        workers: int = RECLAIMER_SETTINGS["workers"],
+        batch_size: int = RECLAIMER_SETTINGS["batch_size"],
+        retries: int = RECLAIMER_SETTINGS["retries"],
+        retry_delay: float = RECLAIMER_SETTINGS["retry_delay"],
+    ) -> None:
+        self._path = path
+        self._workers = workers
+        self._batch_size = batch_size
+        self._retries = retries
+        self._retry_delay = retry_delay
+        self._queue: "queue.SimpleQueue[str]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def delete(self, from_user_id: int, number: Union[int, str]) -> None:
+        """Переносит директорию теста в .trash и ставит ее в очередь удаления.
+
+        Аргументы:
+            from_user_id - пользовательский id
+            number - номер директории теста
+        Возвращает: None
+        """
+        directory = os.path.join(self._path, str(from_user_id), str(number))
+        trash = os.path.join(self._path, TRASH_DIRECTORY)
+        os.makedirs(trash, exist_ok=True)
+        destination = os.path.join(trash, f"{from_user_id}-{number}-{time.time_ns()}")
+        try:
+            os.rename(directory, destination)
+        except FileNotFoundError:
+            return
+        self._put(destination)
+
+    def collect(self) -> int:
+        """Ставит в очередь удаления директории, оставшиеся в .trash.
+
+        Аргументы: -
+        Возвращает: количество директорий
+        """
+        trash = os.path.join(self._path, TRASH_DIRECTORY)
+        if not os.path.exists(trash):
+            return 0
+        paths = [entry.path for entry in os.scandir(trash)]
+        for path in paths:
+            self._put(path)
+        return len(paths)
+
+    def _put(self, path: str) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="reclaimer", daemon=True
+                )
+                self._thread.start()
+        self._queue.put(path)
+
+    def _run(self) -> None:
+        with ThreadPoolExecutor(self._workers, "reclaimer") as executor:
+            while True:
+                batch = [self._queue.get()]
+                while len(batch) < self._batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                removed = sum(executor.map(self._remove, batch))
+                logger.info("reclaimer: removed %d of %d", removed, len(batch))
+
+    def _remove(self, path: str) -> bool:
+        delay = self._retry_delay
+        for attempt in range(1, self._retries + 1):
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                elif os.path.exists(path):
+                    os.remove(path)
+                return True
+            except OSError as error:
+                if attempt == self._retries:
+                    # Директория останется в .trash до следующего запуска
+                    logger.error("reclaimer: %s is not removed: %s", path, error)
+                    return False
+                time.sleep(delay)
+                delay *= 2
+        return False
+
+
+Reclaimer = _Reclaimer()
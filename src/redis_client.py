@@ -0,0 +1,64 @@
+"""Модуль клиента redis с метриками и трассировкой.
+
+Команды учитываются в метриках (bot_redis_commands_total,
+bot_redis_commands_per_update) и оборачиваются в промежутки трассы как при
+прямом вызове, так и в конвейере (pipeline): команды конвейера учитываются
+при его выполнении, а команды, которые конвейер выполняет сразу (после
+WATCH), - по одной.
+
+Классы:
+    InstrumentedRedis - открытый класс, клиент redis.
+Типы:
+    Redis - клиент redis с ответами-строками (для аннотаций).
+    Pipeline - конвейер redis с ответами-строками (для аннотаций).
+"""
+
+from typing import TYPE_CHECKING, Any
+
+import redis
+
+from .metrics import count_redis_commands
+from .tracing import start_span
+
+if TYPE_CHECKING:
+    Redis = redis.StrictRedis[str]
+    Pipeline = redis.client.Pipeline[str]
+else:
+    # Классы redis не параметризуются во время выполнения
+    Redis = redis.StrictRedis
+    Pipeline = redis.client.Pipeline
+
+
+class _InstrumentedPipeline(Pipeline):
+    """Конвейер, учитывающий выполненные команды."""
+
+    def immediate_execute_command(self, *args: Any, **options: Any) -> Any:
+        name = str(args[0]).upper()
+        count_redis_commands([name])
+        with start_span("redis " + name):
+            return super().immediate_execute_command(  # type: ignore[no-untyped-call]
+                *args, **options
+            )
+
+    def execute(self, raise_on_error: bool = True) -> list[Any]:
+        names = [str(args[0]).upper() for args, _ in self.command_stack]
+        count_redis_commands(names)
+        with start_span("redis PIPELINE", commands=len(names)):
+            return super().execute(raise_on_error)
+
+
+class InstrumentedRedis(Redis):
+    """Клиент redis, учитывающий команды в метриках и трассах."""
+
+    def execute_command(self, *args: Any, **options: Any) -> Any:
+        name = str(args[0]).upper()
+        count_redis_commands([name])
+        with start_span("redis " + name):
+            return super().execute_command(*args, **options)
+
+    def pipeline(
+        self, transaction: bool = True, shard_hint: Any = None
+    ) -> _InstrumentedPipeline:
+        return _InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
@@ -0,0 +1,157 @@
+"""Модуль компактной записи сессии пользователя.
+
+Сессия (словарь строковых полей) записывается в одно значение redis:
+    байт версии схемы (SCHEMA_VERSION);
+    байт-маска известных полей (FIELDS), которые присутствуют в сессии;
+    значения известных полей по порядку: числа - беззнаковый varint,
+        строки - varint длины и байты UTF-8;
+    количество остальных полей (varint) и пары строк (название, значение).
+Числовое поле, значение которого не является каноничной записью
+неотрицательного числа, записывается как остальное поле.
+Записи прежних версий схемы (SCHEMAS) декодируются по своему списку полей,
+а записываются всегда в текущей версии.
+
+Функции:
+    encode_session - открытая функция, кодирует сессию.
+    decode_session - открытая функция, декодирует сессию.
+    get_schema_version - открытая функция, возвращает версию схемы записи.
+"""
+
+SCHEMA_VERSION = 2
+
+# Известные поля каждой версии схемы: (название, True - если значение -
+# неотрицательное число). Маска полей занимает один байт, поэтому полей
+# не больше 8
+SCHEMAS = {
+    1: (
+        ("state", True),
+        ("question_index", True),
+        ("right_answers_number", True),
+        ("active_test", False),
+        ("checked", False),
+        ("jsondata", False),
+    ),
+    2: (
+        ("state", True),
+        ("question_index", True),
+        ("right_answers_number", True),
+        ("active_test", False),
+        ("checked", False),
+        ("jsondata", False),
+        ("active_version", False),
+    ),
+}
+FIELDS = SCHEMAS[SCHEMA_VERSION]
+
+
+def _write_varint(buffer: bytearray, number: int) -> None:
+    while number > 0x7F:
+        buffer.append(number & 0x7F | 0x80)
+        number >>= 7
+    buffer.append(number)
+
+
+def _read_varint(data: bytes, position: int) -> tuple[int, int]:
+    number = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, position
+        shift += 7
+
+
+def _write_string(buffer: bytearray, string: str) -> None:
+    encoded = string.encode("utf-8")
+    _write_varint(buffer, len(encoded))
+    buffer += encoded
+
+
+def _read_string(data: bytes, position: int) -> tuple[str, int]:
+    length, position = _read_varint(data, position)
+    end = position + length
+    if end > len(data):
+        raise ValueError("Запись сессии обрезана.")
+    return data[position:end].decode("utf-8"), end
+
+
+def _is_number(value: str) -> bool:
+    return value.isdigit() and value.isascii() and str(int(value)) == value
+
+
+def encode_session(session: dict[str, str]) -> bytes:
+    """Кодирует сессию в компактную запись.
+
+    Аргументы:
+        session - поля сессии
+    Возвращает: запись
+    """
+    mask = 0
+    values = bytearray()
+    other = dict(session)
+    for number, (name, is_number) in enumerate(FIELDS):
+        value = session.get(name)
+        if value is None or (is_number and not _is_number(value)):
+            continue
+        del other[name]
+        mask |= 1 << number
+        if is_number:
+            _write_varint(values, int(value))
+        else:
+            _write_string(values, value)
+
+    buffer = bytearray((SCHEMA_VERSION, mask))
+    buffer += values
+    _write_varint(buffer, len(other))
+    for name, value in other.items():
+        _write_string(buffer, name)
+        _write_string(buffer, value)
+
+    return bytes(buffer)
+
+
+def decode_session(data: bytes) -> dict[str, str]:
+    """Декодирует компактную запись сессии.
+
+    Аргументы:
+        data - запись
+    Возвращает: поля сессии
+    Вызывает: ValueError, если версия схемы неизвестна или запись повреждена
+    """
+    fields = SCHEMAS.get(get_schema_version(data)) if len(data) >= 2 else None
+    if fields is None:
+        raise ValueError("Неизвестная версия записи сессии.")
+
+    try:
+        mask = data[1]
+        position = 2
+        session: dict[str, str] = {}
+        for number, (name, is_number) in enumerate(fields):
+            if not mask >> number & 1:
+                continue
+            if is_number:
+                value, position = _read_varint(data, position)
+                session[name] = str(value)
+            else:
+                session[name], position = _read_string(data, position)
+
+        count, position = _read_varint(data, position)
+        for _ in range(count):
+            name, position = _read_string(data, position)
+            session[name], position = _read_string(data, position)
+    except (IndexError, UnicodeDecodeError) as error:
+        raise ValueError("Запись сессии повреждена.") from error
+
+    return session
+
+
+def get_schema_version(data: bytes) -> int:
+    """Возвращает версию схемы компактной записи сессии.
+
+    Аргументы:
+        data - запись
+    Возвращает: версию схемы (0 - пустая запись)
+    """
+    return data[0] if data else 0
@@ -0,0 +1,56 @@
+"""Модуль кэшируемых свойств для классов со __slots__.
+
+functools.cached_property хранит значение в __dict__ экземпляра, поэтому
+не работает в классах со __slots__. cached_slot хранит значение в слоте
+"_cached_" + имя свойства без начальных подчеркиваний, который должен
+быть объявлен в __slots__ класса.
+
+Классы:
+    cached_slot - открытый класс, кэшируемое свойство для классов со __slots__.
+"""
+
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+_T = TypeVar("_T")
+
+
+class cached_slot(Generic[_T]):
+    """Свойство, значение которого вычисляется при первом обращении.
+
+    Пример:
+        class Question:
+            __slots__ = ("_body", "_cached_text")
+
+            @cached_slot
+            def text(self) -> str:
+                return self._body.strip()
+    """
+
+    def __init__(self, function: Callable[[Any], _T]) -> None:
+        self._function = function
+        self._slot: Any = None
+        self.__doc__ = function.__doc__
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        """Находит слот, в котором хранится значение свойства.
+
+        Аргументы:
+            owner - класс
+            name - имя свойства
+        Вызывает: TypeError, если слот не объявлен в __slots__ класса
+        """
+        slot_name = "_cached_" + name.lstrip("_")
+        slot = owner.__dict__.get(slot_name)
+        if slot is None:
+            raise TypeError(f'Слот "{slot_name}" не объявлен в {owner.__name__}.')
+        self._slot = slot
+
+    def __get__(self, instance: Any, owner: Optional[type] = None) -> _T:
+        if instance is None:
+            return self  # type: ignore
+        try:
+            return self._slot.__get__(instance, owner)  # type: ignore
+        except AttributeError:
+            value = self._function(instance)
+            self._slot.__set__(instance, value)
+            return value
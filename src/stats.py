@@ -0,0 +1,216 @@
+"""Модуль статистики тестов для их авторов.
+
+Статистика каждой версии теста хранится в хеше redis
+"stats:<команда теста>:<версия>", поэтому после обновления теста
+номера вопросов новой версии не смешиваются с прежними. Хеш обновляется
+по пачкам событий журнала ответов (src/answers.py) командами HINCRBY,
+поэтому чтение статистики не зависит от количества прохождений:
+    attempts, completed, stopped - количество прохождений (всего,
+        до конца, остановленных командой /stop);
+    timed, seconds - количество и суммарное время прохождений до конца;
+    score:<n> - количество прохождений с n правильными ответами;
+    q<n>:answers, q<n>:right - количество ответов и правильных ответов
+        на вопрос с номером n (с нуля).
+Версии теста со статистикой перечислены в множестве
+"stats:versions:<команда теста>", чтобы статистику удаленного теста можно
+было удалить, не обходя все ключи redis.
+События тестов, команды которых уже нет в реестре команд (src/commands.py),
+например удаленных командой /delete, пропускаются.
+
+Функции:
+    format_stats - открытая функция, форматирует статистику теста.
+Классы:
+    _Stats - закрытый класс для обновления и чтения статистики.
+Экземпляры классов:
+    Stats - экземпляр класса _Stats.
+"""
+
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Iterable, Optional, cast
+
+import redis
+
+from .commands import COMMANDS_PREFIX
+from .user import User
+
+if TYPE_CHECKING:
+    from .answers import LogEvent
+
+STATS_PREFIX = "stats:"
+_BAR_WIDTH = 20
+
+
+def _get_key(command: str, version: str) -> str:
+    return f"{STATS_PREFIX}{command}:{version}"
+
+
+def _get_versions_key(command: str) -> str:
+    # Команды начинаются с "/", поэтому ключ не совпадет с ключом версии
+    return f"{STATS_PREFIX}versions:{command}"
+
+
+class _Stats:
+    """Класс для обновления и чтения статистики тестов."""
+
+    def update(self, events: list["LogEvent"]) -> None:
+        """Прибавляет к статистике тестов пачку событий журнала ответов.
+
+        Аргументы:
+            events - события
+        Возвращает: None
+        """
+        commands = list({event.test for event in events})
+        keys = [COMMANDS_PREFIX + command for command in commands]
+        with User.redis_.pipeline() as pipeline:
+            while True:
+                try:
+                    # Если команду удалят до записи, транзакция повторится
+                    # и события удаленного теста будут пропущены
+                    pipeline.watch(*keys)
+                    owners = cast(list[Optional[str]], pipeline.mget(keys))
+                    registered = {
+                        command
+                        for command, owner in zip(commands, owners)
+                        if owner is not None
+                    }
+                    counted = [event for event in events if event.test in registered]
+                    increments, seconds = _count(counted)
+                    if not increments:
+                        return
+                    pipeline.multi()
+                    for command, version in {
+                        (event.test, event.version) for event in counted
+                    }:
+                        pipeline.sadd(_get_versions_key(command), version)
+                    for (key, field), amount in increments.items():
+                        pipeline.hincrby(key, field, amount)
+                    for key, total in seconds.items():
+                        pipeline.hincrbyfloat(key, "seconds", total)
+                    pipeline.execute()
+                    return
+                except redis.WatchError:
+                    continue
+
+    def get(self, command: str, version: str) -> dict[str, str]:
+        """Возвращает статистику версии теста.
+
+        Аргументы:
+            command - команда теста
+            version - версия теста
+        Возвращает: словарь (поле статистики)-(значение)
+        """
+        return User.redis_.hgetall(_get_key(command, version))
+
+    def delete(self, command: str) -> None:
+        """Удаляет статистику всех версий теста.
+
+        Аргументы:
+            command - команда теста
+        Возвращает: None
+        """
+        versions_key = _get_versions_key(command)
+        versions = User.redis_.smembers(versions_key)
+        User.redis_.delete(
+            versions_key, *(_get_key(command, version) for version in versions)
+        )
+
+
+def _count(
+    events: Iterable["LogEvent"],
+) -> tuple[Counter[tuple[str, str]], dict[str, float]]:
+    """Приращения полей статистики по событиям.
+
+    Аргументы:
+        events - события
+    Возвращает: приращения (ключ, поле)-(количество) и суммарное время
+        прохождений по ключам
+    """
+    increments: Counter[tuple[str, str]] = Counter()
+    seconds: defaultdict[str, float] = defaultdict(float)
+    for event in events:
+        key = _get_key(event.test, event.version)
+        if event.event == "answer":
+            increments[key, f"q{event.question}:answers"] += 1
+            if event.right:
+                increments[key, f"q{event.question}:right"] += 1
+        else:
+            increments[key, "attempts"] += 1
+            increments[key, f"score:{event.right}"] += 1
+            if event.stopped:
+                increments[key, "stopped"] += 1
+            else:
+                increments[key, "completed"] += 1
+                if event.seconds is not None:
+                    increments[key, "timed"] += 1
+                    seconds[key] += event.seconds
+    return increments, seconds
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    return f"{minutes} мин {seconds} с" if minutes else f"{seconds} с"
+
+
+def format_stats(command: str, stats: dict[str, str], top: int = 3) -> str:
+    """Форматирует статистику теста для отправки автору.
+
+    Аргументы:
+        command - команда теста
+        stats - статистика теста (см. _Stats.get)
+        top - количество самых сложных вопросов
+    Возвращает: текст сообщения
+    """
+    attempts = int(stats.get("attempts", 0))
+    lines = [f"Статистика теста {command}"]
+    if not attempts:
+        lines.append("Тест еще никто не прошел.")
+        return "\n".join(lines)
+
+    lines.append(
+        f"Прохождений: {attempts} (до конца: {stats.get('completed', 0)}, "
+        f"остановлено: {stats.get('stopped', 0)})"
+    )
+    timed = int(stats.get("timed", 0))
+    if timed:
+        lines.append(
+            "Среднее время прохождения: "
+            + _format_duration(float(stats["seconds"]) / timed)
+        )
+
+    scores: dict[int, int] = {}
+    questions: dict[int, list[int]] = {}
+    for field, value in stats.items():
+        if field.startswith("score:"):
+            scores[int(field[6:])] = int(value)
+        elif field.startswith("q"):
+            number, _, name = field[1:].partition(":")
+            counts = questions.setdefault(int(number), [0, 0])
+            counts[name == "right"] = int(value)
+
+    lines.append("Количество правильных ответов:")
+    most = max(scores.values())
+    for score in range(max(scores) + 1):
+        count = scores.get(score, 0)
+        bar = "▇" * round(count / most * _BAR_WIDTH)
+        lines.append(f"{score}: {bar + ' ' if bar else ''}{count}")
+
+    # Вопросы по доле неправильных ответов
+    hardest = sorted(
+        (
+            (1 - right / answers, number, answers)
+            for number, (answers, right) in questions.items()
+            if answers
+        ),
+        key=lambda question: (-question[0], question[1]),
+    )[:top]
+    if hardest:
+        lines.append("Самые сложные вопросы:")
+        lines.extend(
+            f"{number + 1} - {wrong:.0%} неправильных ответов из {answers}"
+            for wrong, number, answers in hardest
+        )
+
+    return "\n".join(lines)
+
+
+Stats = _Stats()
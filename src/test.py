@@ -4,13 +4,38 @@
     Test - открытый класс, содержащий данные и методы для работы над тестами.
 """
 
+from bisect import bisect_right
 from typing import Any, Optional, Union
 
 from telegram import KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove
 
+from .answers import answers
 from .bot import bot
 from .question import Question
+from .slots import cached_slot
 from .user import User
+from .versions import Versions
+
+_START_TEST_MARKUP = ReplyKeyboardMarkup(
+    [[KeyboardButton("/start_test")]], resize_keyboard=True
+)
+_REMOVE_MARKUP = ReplyKeyboardRemove(selective=False)
+_NO_RESULT_EXPLANATION = "Объяснение результата отсутствует."
+
+
+def _plural(number: int, one: str, few: str, many: str) -> str:
+    """Выбирает форму слова "вопрос" для числа.
+
+    Аргументы:
+        number - число
+        one, few, many - формы слова для 1, от 2 до 4 и остальных чисел
+    Возвращает: форму слова
+    """
+    if number == 1:
+        return one
+    elif 1 < number < 5:
+        return few
+    return many
 
 
 class Test:
@@ -23,13 +48,28 @@ class Test:
         description - описание теста
         questions - вопросы теста
         result_explanation - объяснение результата теста
+        version - версия теста (хеш содержимого файла теста)
     """
 
+    __slots__ = (
+        "_command",
+        "_name",
+        "_description",
+        "_questions",
+        "_result_explanation",
+        "_version",
+        "_cached_see_payload",
+        "_cached_answered_lines",
+        "_cached_result_thresholds",
+        "_cached_result_payloads",
+    )
+
     _command: str
     _name: str
     _description: Union[str, dict[str, Any]]
     _questions: list[Question]
     _result_explanation: dict[int, Any]
+    _version: str
 
     def __init__(
         self,
@@ -38,6 +78,7 @@ class Test:
         description: Optional[Union[str, dict[str, Any]]],
         questions: list[Question],
         result_explanation: Optional[dict[str, Any]],
+        version: str = "",
     ):
         """Присваивает и корректирует основные поля теста.
 
@@ -47,9 +88,11 @@ class Test:
             description - описание теста
             questions - вопросы теста
             result_explanation - объяснение результата теста
+            version - версия теста
         Возвращает: None
         """
         self._command = command
+        self._version = version
         self._name = name
         self._description = description or "Описание отсутствует."
         self._questions = questions
@@ -60,19 +103,24 @@ class Test:
             {
                 int(key): value
                 for key, value in sorted(
-                    result_explanation.items(), key=lambda item: item[0]
+                    result_explanation.items(), key=lambda item: int(item[0])
                 )
             }
             if result_explanation
             else {}
         )
 
+        # Тесты без вопросов используются только как ключи поиска в дереве
+        if self._questions:
+            self.prepare()
+
     # Только для чтения
     command = property(lambda self: self._command)
     name = property(lambda self: self._name)
     description = property(lambda self: self._description)
     questions = property(lambda self: self._questions)
     result_explanation = property(lambda self: self._result_explanation)
+    version = property(lambda self: self._version)
 
     async def check(
         self, from_user_id: int, answer: Union[str, int, list[int]]
@@ -85,11 +133,25 @@ class Test:
         Возвращает: None
         """
         question_number = int(User.get(from_user_id, "question_index"))
-        await self._questions[question_number].check(from_user_id, answer)
+        if question_number >= len(self._questions):
+            # Версия, с которой начато прохождение, недоступна (например,
+            # после перезапуска), а в текущей версии меньше вопросов
+            await self._finish(from_user_id)
+            return
+        is_right = await self._questions[question_number].check(from_user_id, answer)
+        answers.record(
+            from_user_id,
+            self._command,
+            self._version,
+            question_number,
+            answer,
+            is_right,
+        )
         if len(self._questions) == question_number + 1:
             await self._finish(from_user_id)
         else:
             await self._questions[question_number + 1].__call__(from_user_id)
+            answers.ask(from_user_id)
 
     async def see(self, from_user_id: int) -> None:
         """Возвращает название и описание теста пользователю.
@@ -100,34 +162,20 @@ class Test:
         Возвращает: None
         """
         User.set(from_user_id, checked=self.command)
-        markup = ReplyKeyboardMarkup(
-            [[KeyboardButton("/start_test")]], resize_keyboard=True
-        )
-        if isinstance(self._description, str):
-            await bot.send_message(
+        url, text = self._see_payload
+        if url:
+            await bot.send_photo(
                 from_user_id,
-                "Название: " + self._name + "\nОписание:\n" + self._description,
-                reply_markup=markup,
+                url,
+                caption=text,
+                reply_markup=_START_TEST_MARKUP,
             )
         else:
-            url: Optional[str] = self._description.get("url")
-            text: Optional[str] = self._description.get("text")
-            if not text:
-                text = "Описание отсутствует."
-
-            if url:
-                await bot.send_photo(
-                    from_user_id,
-                    url,
-                    caption="Название: " + self._name + "\nОписание:\n" + text,
-                    reply_markup=markup,
-                )
-            else:
-                await bot.send_message(
-                    from_user_id,
-                    "Название: " + self._name + "\nОписание:\n" + text,
-                    reply_markup=markup,
-                )
+            await bot.send_message(
+                from_user_id,
+                text,
+                reply_markup=_START_TEST_MARKUP,
+            )
 
     async def start(self, from_user_id: int) -> None:
         """Начинает тест.
@@ -141,12 +189,15 @@ class Test:
         User.set(from_user_id, active_test=self._command)
         User.set(from_user_id, question_index=0)
         User.set(from_user_id, right_answers_number=0)
+        User.set(from_user_id, active_version=self._version)
+        Versions.acquire(self._command, self._version)
         await bot.send_message(
             from_user_id,
             "Тест начался!",
-            reply_markup=ReplyKeyboardRemove(selective=False),
+            reply_markup=_REMOVE_MARKUP,
         )
         await self._questions[0].__call__(from_user_id)
+        answers.start(from_user_id)
 
     async def stop(self, from_user_id: int) -> None:
         """Преждевременно останавливает тест.
@@ -166,79 +217,130 @@ class Test:
         Возвращает: None
         """
         right_answers_number = int(User.get(from_user_id, "right_answers_number"))
+        answers.finish(
+            from_user_id,
+            self._command,
+            self._version,
+            right_answers_number,
+            len(self._questions),
+            is_stop,
+        )
         message = ""
 
         # Если тест преждевременно остановили
         if is_stop:
             answered_questions = int(User.get(from_user_id, "question_index")) + 1
             skipped_questions = len(self._questions) - answered_questions + 1
+            message += (
+                "Вы преждевременно закончили тест, пропустив "
+                + f"{skipped_questions} "
+                + _plural(skipped_questions, "вопрос", "вопроса", "вопросов")
+                + ".\n"
+            )
 
-            if skipped_questions == 1:
-                message += f"Вы преждевременно закончили тест, пропустив {skipped_questions} вопрос.\n"
-            elif skipped_questions < 5:
-                message += f"Вы преждевременно закончили тест, пропустив {skipped_questions} вопроса.\n"
-            else:
-                message += f"Вы преждевременно закончили тест, пропустив {skipped_questions} вопросов.\n"
-
-        if right_answers_number == 1:
-            message += f"Вы ответили на {right_answers_number} вопрос из {len(self._questions)} ({round(right_answers_number / len(self._questions), 4) * 100}%).\n"
-        elif 1 < right_answers_number < 5:
-            message += f"Вы ответили на {right_answers_number} вопроса из {len(self._questions)} ({round(right_answers_number / len(self._questions), 4) * 100}%).\n"
-        else:
-            message += f"Вы ответили на {right_answers_number} вопросов из {len(self._questions)} ({round(right_answers_number / len(self._questions), 4) * 100}%).\n"
-
-        message += "Объяснение результата:\n"
+        message += self._answered_lines[min(right_answers_number, len(self._questions))]
 
+        # Освобождается версия, захваченная при начале теста: если она
+        # недоступна (например, после перезапуска), тест заканчивается по
+        # текущей версии с другим self._version (как в _User.sweep)
+        try:
+            Versions.release(self._command, User.get(from_user_id, "active_version"))
+        except ValueError:
+            # Прохождение начато до появления поля active_version
+            pass
         User.delete(from_user_id, "active_test")
         User.delete(from_user_id, "question_index")
         User.delete(from_user_id, "right_answers_number")
+        User.delete(from_user_id, "active_version")
 
         if not self._result_explanation:
-            await bot.send_message(
-                from_user_id, message + "Объяснение результата отсутствует."
-            )
+            await bot.send_message(from_user_id, message + _NO_RESULT_EXPLANATION)
             return
 
-        # Ищем промежуток объяснения ответа.
-        result_explanation_keys = list(self._result_explanation.keys())
-        for i in range(len(result_explanation_keys)):
-            if right_answers_number < result_explanation_keys[i]:
-                break
-
-        if right_answers_number > result_explanation_keys[i]:
-            result_message = self._result_explanation[
-                result_explanation_keys[len(result_explanation_keys) - 1]
-            ]
-        elif right_answers_number == result_explanation_keys[i]:
-            result_message = self._result_explanation[right_answers_number]
+        url, text = self._find_result_payload(right_answers_number)
+        if url:
+            await bot.send_photo(from_user_id, url, caption=message + text)
         else:
-            if i == 0:
-                if right_answers_number < result_explanation_keys[i]:
-                    result_message = "Объяснение результата отсутствует."
-                else:
-                    result_message = self._result_explanation[
-                        result_explanation_keys[0]
-                    ]
-            else:
-                result_message = self._result_explanation[
-                    result_explanation_keys[i - 1]
-                ]
+            await bot.send_message(from_user_id, message + text)
 
-        if isinstance(result_message, str):
-            await bot.send_message(from_user_id, message + result_message)
+    @cached_slot
+    def _see_payload(self) -> tuple[Optional[str], str]:
+        """URL рисунка и текст описания теста."""
+        url: Optional[str] = None
+        if isinstance(self._description, str):
+            text = self._description
         else:
-            url = result_message.get("url")
-            text = result_message.get("text")
-
-            if url:
-                await bot.send_photo(from_user_id, url, caption=message + text)
-            elif text:
-                await bot.send_message(from_user_id, message + text)
+            url = self._description.get("url")
+            text = self._description.get("text") or "Описание отсутствует."
+
+        return url, "Название: " + self._name + "\nОписание:\n" + text
+
+    @cached_slot
+    def _answered_lines(self) -> list[str]:
+        """Строки с количеством правильных ответов (индекс - количество ответов)."""
+        questions_number = len(self._questions)
+        return [
+            f"Вы ответили на {number} "
+            + _plural(number, "вопрос", "вопроса", "вопросов")
+            + f" из {questions_number} ({round(number / questions_number, 4) * 100}%).\n"
+            + "Объяснение результата:\n"
+            for number in range(questions_number + 1)
+        ]
+
+    @cached_slot
+    def _result_thresholds(self) -> list[int]:
+        """Начала промежутков объяснения результата в порядке возрастания."""
+        return sorted(self._result_explanation.keys())
+
+    @cached_slot
+    def _result_payloads(self) -> list[tuple[Optional[str], str]]:
+        """URL рисунка и текст объяснения для каждого промежутка результата.
+
+        Порядок совпадает с порядком _result_thresholds.
+        """
+        payloads: list[tuple[Optional[str], str]] = []
+        for key in self._result_thresholds:
+            value = self._result_explanation[key]
+            if isinstance(value, str):
+                payloads.append((None, value))
             else:
-                await bot.send_message(
-                    from_user_id, message + "Объяснение результата отсутствует."
+                payloads.append(
+                    (value.get("url"), value.get("text") or _NO_RESULT_EXPLANATION)
                 )
 
+        return payloads
+
+    def _find_result_payload(
+        self, right_answers_number: int
+    ) -> tuple[Optional[str], str]:
+        """Ищет объяснение результата для количества правильных ответов.
+
+        Выбирается промежуток с наибольшим началом, не превышающим
+        количество правильных ответов.
+        Аргументы:
+            right_answers_number - количество правильных ответов
+        Возвращает: URL рисунка и текст объяснения результата
+        """
+        index = bisect_right(self._result_thresholds, right_answers_number) - 1
+        if index < 0:
+            return None, _NO_RESULT_EXPLANATION
+        return self._result_payloads[index]
+
+    def prepare(self) -> None:
+        """Заранее формирует неизменяемые части сообщений теста и его вопросов.
+
+        После подготовки при ответах пользователя подставляются только
+        пользовательские данные.
+        Аргументы: -
+        Возвращает: None
+        """
+        self._see_payload
+        self._answered_lines
+        self._result_thresholds
+        self._result_payloads
+        for question in self._questions:
+            question.prepare()
+
     def __eq__(self, other: object) -> bool:
         """Сравнивает тесты по команде (знак ==).
 
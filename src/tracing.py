@@ -0,0 +1,278 @@
+"""Модуль трассировки обработки обновлений.
+
+Корневой промежуток (span) открывается на каждое обновление, дочерние -
+на команды redis, запросы к Telegram и поиск в дереве команд. Решение о
+записи трассы принимается один раз для корневого промежутка (доля
+TRACING_SETTINGS["sample_rate"]), поэтому для незаписываемых обновлений
+дочерние промежутки ничего не создают.
+
+Записанные промежутки передаются отдельному потоку, который пачками
+отправляет их в формате OTLP/JSON в файл (по одной пачке на строку)
+или в OTLP-совместимый коллектор по HTTP. Пачки, которые не удалось
+отправить, отбрасываются и учитываются в метрике bot_dropped_spans_total;
+предупреждение об этом записывается в лог не чаще раза в минуту.
+
+Классы:
+    Span - открытый класс, промежуток трассы.
+    SpanExporter - открытый класс, экспортирует промежутки в фоновом потоке.
+Функции:
+    start_trace - открытая функция, открывает корневой промежуток.
+    start_span - открытая функция, открывает дочерний промежуток.
+    traced - открытая функция, декоратор, оборачивающий функцию в промежуток.
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+from .constants import TRACING_SETTINGS
+from .log import logger
+from .metrics import DROPPED_SPANS
+
+Function = TypeVar("Function", bound=Callable[..., Any])
+
+# Минимальный промежуток между предупреждениями об отброшенных пачках
+DROP_WARNING_INTERVAL = 60
+
+
+class Span:
+    """Промежуток трассы."""
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start",
+        "end",
+        "attributes",
+        "error",
+    )
+
+    def __init__(
+        self, name: str, trace_id: str, parent_id: Optional[str], **attributes: Any
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = time.time_ns()
+        self.end = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def to_otlp(self) -> dict[str, Any]:
+        """Возвращает промежуток в формате OTLP/JSON."""
+        span: dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [
+                {"key": key, "value": {"stringValue": str(value)}}
+                for key, value in self.attributes.items()
+                if value is not None
+            ],
+            "status": (
+                {"code": 2, "message": self.error} if self.error else {"code": 1}
+            ),
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class SpanExporter:
+    """Экспортирует промежутки пачками в фоновом потоке.
+
+    Аргументы конструктора:
+        path - файл, в который записываются пачки (если endpoint не задан)
+        endpoint - URL коллектора (например, http://localhost:4318/v1/traces)
+        batch_size - максимальное количество промежутков в пачке
+        interval - максимальное время ожидания пачки в секундах
+    """
+
+    def __init__(
+        self,
+        path: str,
+        endpoint: Optional[str],
+        batch_size: int,
+        interval: float,
+    ) -> None:
+        self._path = path
+        self._endpoint = endpoint
+        self._batch_size = batch_size
+        self._interval = interval
+        self._queue: "queue.SimpleQueue[Span]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        # Отброшено промежутков с последнего предупреждения
+        self._dropped = 0
+        self._warned: Optional[float] = None
+
+    def export(self, span: Span) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._queue.put(span)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._interval
+            while len(batch) < self._batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                self.write(batch)
+            except OSError as error:
+                self._drop(batch, error)
+
+    def _drop(self, batch: list[Span], error: OSError) -> None:
+        DROPPED_SPANS.inc(len(batch))
+        self._dropped += len(batch)
+        now = time.monotonic()
+        if self._warned is None or now - self._warned >= DROP_WARNING_INTERVAL:
+            logger.warning("tracing: %d spans are dropped: %s", self._dropped, error)
+            self._dropped = 0
+            self._warned = now
+
+    def write(self, batch: list[Span]) -> None:
+        """Отправляет пачку промежутков в файл или коллектор.
+
+        Аргументы:
+            batch - промежутки
+        Возвращает: None
+        """
+        data = json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": {
+                            "attributes": [
+                                {
+                                    "key": "service.name",
+                                    "value": {"stringValue": "bot-tests"},
+                                }
+                            ]
+                        },
+                        "scopeSpans": [
+                            {
+                                "scope": {"name": "bot"},
+                                "spans": [span.to_otlp() for span in batch],
+                            }
+                        ],
+                    }
+                ]
+            },
+            ensure_ascii=False,
+        )
+        if self._endpoint:
+            request = urllib.request.Request(
+                self._endpoint,
+                data=data.encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+            )
+            with urllib.request.urlopen(request, timeout=5):
+                pass
+        else:
+            with open(self._path, "a", encoding="utf-8") as file:
+                file.write(data + "\n")
+
+
+exporter = SpanExporter(
+    TRACING_SETTINGS["path"],
+    TRACING_SETTINGS["endpoint"],
+    TRACING_SETTINGS["batch_size"],
+    TRACING_SETTINGS["interval"],
+)
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+@contextmanager
+def _open(span: Span) -> Iterator[Span]:
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as error:
+        span.error = repr(error)
+        raise
+    finally:
+        span.end = time.time_ns()
+        _current_span.reset(token)
+        exporter.export(span)
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Открывает корневой промежуток, если трасса попала в выборку.
+
+    Аргументы:
+        name - название промежутка
+        **attributes - атрибуты промежутка
+    Возвращает: промежуток или None, если трасса не записывается
+    """
+    if random.random() >= TRACING_SETTINGS["sample_rate"]:
+        token = _current_span.set(None)
+        try:
+            yield None
+        finally:
+            _current_span.reset(token)
+        return
+
+    with _open(Span(name, os.urandom(16).hex(), None, **attributes)) as span:
+        yield span
+
+
+@contextmanager
+def start_span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Открывает дочерний промежуток текущего промежутка.
+
+    Аргументы:
+        name - название промежутка
+        **attributes - атрибуты промежутка
+    Возвращает: промежуток или None, если трасса не записывается
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    with _open(Span(name, parent.trace_id, parent.span_id, **attributes)) as span:
+        yield span
+
+
+def traced(name: str) -> Callable[[Function], Function]:
+    """Декоратор, оборачивающий вызовы функции в дочерний промежуток.
+
+    Аргументы:
+        name - название промежутка
+    """
+
+    def decorator(function: Function) -> Function:
+        @wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _current_span.get() is None:
+                return function(*args, **kwargs)
+            with start_span(name):
+                return function(*args, **kwargs)
+
+        return wrapper  # type: ignore
+
+    return decorator
@@ -1,9 +1,9 @@
 from dataclasses import dataclass
 from enum import Enum
-from functools import lru_cache
 from typing import Optional
 
 from src.singleton import Singleton
+from src.tracing import traced
 
 from .test import Test
 
@@ -20,16 +20,35 @@ class Node:
     left: Optional["Node"] = None
     right: Optional["Node"] = None
     color: ColorTree = ColorTree.RED
+    # Высота поддерева (количество узлов на самом длинном пути вниз)
+    height: int = 1
+
+
+def _is_black(node: Optional[Node]) -> bool:
+    return node is None or node.color == ColorTree.BLACK
+
+
+def _get_height(node: Optional[Node]) -> int:
+    return node.height if node is not None else 0
+
+
+def _update_height(node: Node) -> None:
+    node.height = max(_get_height(node.left), _get_height(node.right)) + 1
 
 
 class CommandsTestTree(metaclass=Singleton):
     """Красно-черное дерево"""
 
     root: Optional[Node]
+    size: int
+    # Строки sort(), сбрасываются при изменении дерева
+    _sorted: Optional[list[str]]
 
     def __init__(self) -> None:
         if getattr(self, "root", None) is None:
             self.root = None
+            self.size = 0
+            self._sorted = None
 
     def _left_rotate(self, x: Node) -> None:
         y = x.right
@@ -49,6 +68,8 @@ class CommandsTestTree(metaclass=Singleton):
 
             y.left = x
             x.parent = y
+            _update_height(x)
+            _update_height(y)
 
     def _right_rotate(self, x: Node) -> None:
         y = x.left
@@ -68,6 +89,8 @@ class CommandsTestTree(metaclass=Singleton):
 
             y.right = x
             x.parent = y
+            _update_height(x)
+            _update_height(y)
 
     def append(self, z: Node) -> None:
         y = None
@@ -80,6 +103,8 @@ class CommandsTestTree(metaclass=Singleton):
                 x = x.right
 
         z.parent = y
+        self.size += 1
+        self._sorted = None
         if y is None:
             self.root = z
         elif z.key < y.key:
@@ -88,14 +113,15 @@ class CommandsTestTree(metaclass=Singleton):
             y.right = z
 
         self._fixup(z)
+        self._update_heights(z)
 
     def _fixup(self, z: Node) -> None:
         while z.parent is not None and z.parent.color == ColorTree.RED:
-            self._change_tree(z)
+            z = self._change_tree(z)
         if self.root:
             self.root.color = ColorTree.BLACK
 
-    def _change_tree(self, z: Node) -> None:
+    def _change_tree(self, z: Node) -> Node:
         if z and z.parent and z.parent.parent and z.parent is z.parent.parent.left:
             y = z.parent.parent.right
             if y is not None and y.color == ColorTree.RED:  # Первая ситуация
@@ -127,6 +153,7 @@ class CommandsTestTree(metaclass=Singleton):
                         z.parent.color = ColorTree.BLACK  # Шестая ситуация
                         z.parent.parent.color = ColorTree.RED
                         self._left_rotate(z.parent.parent)
+        return z
 
     def _transplant(self, u: Node, v: Node) -> None:
         if u.parent is None:
@@ -138,13 +165,35 @@ class CommandsTestTree(metaclass=Singleton):
         if v:
             v.parent = u.parent
 
+    def _update_heights(self, x: Optional[Node]) -> None:
+        """Пересчитывает высоты поддеревьев от узла x до корня.
+
+        Узлы, которые при поворотах перестали быть предками x, пересчитываются
+        в _left_rotate и _right_rotate.
+        """
+        while x is not None:
+            _update_height(x)
+            x = x.parent
+
     def _tree_minimum(self, x: Node) -> Node:
         while x.left is not None:
             x = x.left
         return x
 
     def delete(self, z: Node) -> None:
+        self.size -= 1
+        self._sorted = None
+        # Если удаляется черный лист, на его место временно ставится черный
+        # лист-заглушка, чтобы восстановить свойства дерева от него
+        y = z if z.left is None or z.right is None else self._tree_minimum(z.right)
+        leaf = None
+        if y.color == ColorTree.BLACK and y.left is None and y.right is None:
+            leaf = Node(y.key, parent=y, color=ColorTree.BLACK)
+            y.right = leaf
+
         color = z.color
+        # Самый нижний узел, поддерево которого изменилось
+        changed = z.parent
         if z.left is None:
             x = z.right
             self._transplant(z, z.right)  # type: ignore
@@ -152,10 +201,12 @@ class CommandsTestTree(metaclass=Singleton):
             x = z.left
             self._transplant(z, z.left)
         else:
-            m = self._tree_minimum(z.right)
+            m = y
             color = m.color
             x = m.right
+            changed = m
             if m.parent is not z:
+                changed = m.parent
                 self._transplant(m, m.right)  # type: ignore
                 m.right = z.right
                 m.right.parent = m
@@ -166,95 +217,87 @@ class CommandsTestTree(metaclass=Singleton):
         if x and color == ColorTree.BLACK:
             self._delete_fixup(x)
 
-    def _change_delete(self, x: Node) -> None:
-        if x and x.parent and x is x.parent.left:
-            w = x.parent.right
-            if w:
-                if w.color == ColorTree.RED:
-                    w.color = ColorTree.BLACK
-                    x.parent.color = ColorTree.RED
-                    self._left_rotate(x.parent)
-                    w = x.parent.right
-                if (
-                    x
-                    and w
-                    and w.right
-                    and w.left
-                    and w.right.color == ColorTree.BLACK
-                    and w.left.color == ColorTree.BLACK
-                ):
-                    w.color = ColorTree.RED
-                    x = x.parent
-                else:
-                    if (
-                        w
-                        and w.right
-                        and w.left
-                        and x
-                        and x.parent
-                        and w.right.color == ColorTree.BLACK
-                    ):
-                        w.left.color = ColorTree.BLACK
-                        w.color = ColorTree.RED
-                        self._right_rotate(w)
-                        w = x.parent.right
-                    if w and x and x.parent:
-                        w.color = x.parent.color
-                    if x and x.parent:
-                        x.parent.color = ColorTree.BLACK
-                    if w and w.right:
-                        w.right.color = ColorTree.BLACK
-                    if x and x.parent:
-                        self._left_rotate(x.parent)
-                    if self.root:
-                        x = self.root
-        elif x and x.parent:
-            w = x.parent.left
-            if w:
-                if w.color == ColorTree.RED:
-                    w.color = ColorTree.BLACK
-                    x.parent.color = ColorTree.RED
-                    self._right_rotate(x.parent)
-                    w = x.parent.left
-                if (
-                    x
-                    and w
-                    and w.right
-                    and w.left
-                    and w.right.color == ColorTree.BLACK
-                    and w.left.color == ColorTree.BLACK
-                ):
-                    w.color = ColorTree.RED
-                    x = x.parent
-                else:
-                    if (
-                        w
-                        and w.left
-                        and w.right
-                        and x
-                        and x.parent
-                        and w.left.color == ColorTree.BLACK
-                    ):
-                        w.right.color = ColorTree.BLACK
-                        w.color = ColorTree.RED
-                        self._left_rotate(w)
-                        w = x.parent.left
-                    if w and x and x.parent:
-                        w.color = x.parent.color
-                    if x and x.parent:
-                        x.parent.color = ColorTree.BLACK
-                    if w and w.left:
-                        w.left.color = ColorTree.BLACK
-                    if x and x.parent:
-                        self._right_rotate(x.parent)
-                    if self.root:
-                        x = self.root
+        if leaf is not None:
+            if leaf.parent is None:
+                self.root = None
+            elif leaf is leaf.parent.left:
+                leaf.parent.left = None
+            else:
+                leaf.parent.right = None
+        self._update_heights(changed)
+
+    def _change_delete(self, x: Node) -> Node:
+        parent = x.parent
+        if parent is None:
+            return x
+
+        if x is parent.left:
+            w = parent.right
+            if w is None:
+                return parent
+            if w.color == ColorTree.RED:
+                w.color = ColorTree.BLACK
+                parent.color = ColorTree.RED
+                self._left_rotate(parent)
+                w = parent.right
+                if w is None:
+                    return parent
+            if _is_black(w.left) and _is_black(w.right):
+                w.color = ColorTree.RED
+                return parent
+            if _is_black(w.right) and w.left is not None:
+                w.left.color = ColorTree.BLACK
+                w.color = ColorTree.RED
+                self._right_rotate(w)
+                w = parent.right
+            if w is not None:
+                w.color = parent.color
+                if w.right is not None:
+                    w.right.color = ColorTree.BLACK
+            parent.color = ColorTree.BLACK
+            self._left_rotate(parent)
+        else:
+            w = parent.left
+            if w is None:
+                return parent
+            if w.color == ColorTree.RED:
+                w.color = ColorTree.BLACK
+                parent.color = ColorTree.RED
+                self._right_rotate(parent)
+                w = parent.left
+                if w is None:
+                    return parent
+            if _is_black(w.left) and _is_black(w.right):
+                w.color = ColorTree.RED
+                return parent
+            if _is_black(w.left) and w.right is not None:
+                w.right.color = ColorTree.BLACK
+                w.color = ColorTree.RED
+                self._left_rotate(w)
+                w = parent.left
+            if w is not None:
+                w.color = parent.color
+                if w.left is not None:
+                    w.left.color = ColorTree.BLACK
+            parent.color = ColorTree.BLACK
+            self._right_rotate(parent)
+        return self.root if self.root else x
 
     def _delete_fixup(self, x: Node) -> None:
         while x is not self.root and x.color == ColorTree.BLACK:
-            self._change_delete(x)
+            x = self._change_delete(x)
         x.color = ColorTree.BLACK
 
+    def depth(self) -> int:
+        """Возвращает глубину дерева (количество узлов на самом длинном пути).
+
+        Глубина хранится в корне и поддерживается при изменениях дерева,
+        поэтому ее можно читать из другого потока (например, при запросе
+        метрик) без обхода дерева.
+        """
+        return _get_height(self.root)
+
+    @traced("tree.search")
     def search(self, y: Node) -> Optional[Node]:
         x = self.root
         while x is not None and y.key != x.key:
@@ -264,12 +307,32 @@ class CommandsTestTree(metaclass=Singleton):
                 x = x.right
         return x
 
-    @lru_cache(maxsize=None)
-    def sort(self) -> list[str]:
-        result: list[str] = []
-        self._inorder_tree_walk(self.root, result)
+    def replace(self, test: Test) -> Optional[Test]:
+        """Заменяет тест с той же командой новой версией на месте.
+
+        Порядок ключей не меняется, поэтому дерево не перестраивается.
+        Аргументы:
+            test - новая версия теста
+        Возвращает: прежнюю версию или None, если теста с такой командой нет
+        """
+        found = self.search(Node(test))
+        if found is None:
+            return None
+        previous, found.key = found.key, test
+        self._sorted = None
+        return previous
 
-        return result
+    def sort(self) -> list[str]:
+        """Возвращает строки "<команда> - <название>" в порядке команд.
+
+        Список строится обходом дерева при первом вызове после изменения
+        дерева и не должен изменяться вызывающим.
+        """
+        if self._sorted is None:
+            result: list[str] = []
+            self._inorder_tree_walk(self.root, result)
+            self._sorted = result
+        return self._sorted
 
     def _inorder_tree_walk(self, x: Optional[Node], result: list[str]) -> None:
         if x is not None:
@@ -1,16 +1,124 @@
 """Модуль для работы с базой данных redis.
 
+Поля сессий пользователей (state, active_test, question_index и т.д.)
+кэшируются в процессе: при первом обращении хеш пользователя читается из
+redis целиком, затем чтения обслуживаются из кэша (LRU на
+SESSION_SETTINGS["cache_size"] пользователей). Изменения применяются к
+кэшу сразу, а в redis записываются пачкой раз в
+SESSION_SETTINGS["flush_interval"] секунд и при завершении процесса.
+Кэш предполагает, что обновления одного пользователя обрабатывает один
+процесс бота.
+
+Поля прохождения теста (SESSION_FIELDS) и черновика теста (DRAFT_FIELDS)
+удаляются, если пользователь не проявлял активности дольше
+SESSION_SETTINGS["session_ttl"] и SESSION_SETTINGS["draft_ttl"] секунд
+соответственно (см. _User.sweep). Время последней активности хранится в
+отсортированных множествах redis, а на сам хеш пользователя ставится
+EXPIRE на наибольший из сроков. Функции, добавленные add_expire_callback,
+вызываются с id каждого пользователя, поля прохождения теста которого
+удалены.
+
+Если SESSION_SETTINGS["encoding"] равно "packed", сессия хранится одной
+компактной записью (см. src/session.py) по ключу "session:<id>".
+Изменения применяются к записи в транзакции WATCH/MULTI, поэтому запись
+изменений не затирает поля, измененные другим процессом или очисткой
+сессий между чтением и записью. Хеш пользователя,
+оставшийся от прежнего формата, переносится в запись при первом обращении
+к сессии или при вызове _User.migrate, который также перезаписывает записи
+прежней версии схемы.
+
+Списки тестов пользователей (add_test, get_tests и т.д.) хранятся в
+хранилище каталога, выбранном CATALOG_SETTINGS["backend"] (см.
+src/catalog.py): в redis или в локальной базе SQLite.
+
 Классы:
     _User - закрытый класс (одиночка) для работы с пользовательскими данными.
 Экземпляры классов:
     User - экземпляр класс для работы с пользовательскими данными.ф
 """
-from typing import Union
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional, Union, cast
 
 import redis
+from redis.client import NEVER_DECODE
 
-from src.constants import REDIS_SETTINGS
+from src.catalog import Catalog, create_catalog
+from src.constants import REDIS_SETTINGS, SESSION_SETTINGS
+from src.log import logger
+from src.metrics import EXPIRED_SESSIONS, RECLAIMED_BYTES, SESSION_CACHE
+from src.redis_client import InstrumentedRedis, Pipeline, Redis
+from src.session import (
+    SCHEMA_VERSION,
+    decode_session,
+    encode_session,
+    get_schema_version,
+)
 from src.singleton import Singleton
+from src.versions import Versions
+
+SESSION_FIELDS = (
+    "active_test",
+    "active_version",
+    "question_index",
+    "right_answers_number",
+    "checked",
+)
+DRAFT_FIELDS = ("state", "jsondata")
+
+# Группы полей, которые удаляются вместе: (название, ключ множества
+# активности в redis, поля, настройка срока жизни)
+_EXPIRING_GROUPS = (
+    ("session", "sessions:activity", SESSION_FIELDS, "session_ttl"),
+    ("draft", "drafts:activity", DRAFT_FIELDS, "draft_ttl"),
+)
+
+PACKED_PREFIX = "session:"
+# Количество попыток записать сессии в формате "packed", если их
+# одновременно изменил другой процесс
+WRITE_ATTEMPTS = 5
+
+Changes = dict[str, Optional[str]]
+
+
+def _is_packed() -> bool:
+    return bool(SESSION_SETTINGS["encoding"] == "packed")
+
+
+def _get_ttl() -> int:
+    return int(max(SESSION_SETTINGS[setting] for *_, setting in _EXPIRING_GROUPS))
+
+
+def _apply(session: dict[str, str], changes: Changes) -> None:
+    for field, value in changes.items():
+        if value is None:
+            session.pop(field, None)
+        else:
+            session[field] = value
+
+
+def _decode(key: str, record: bytes) -> Optional[dict[str, str]]:
+    """Декодирует запись сессии в формате "packed".
+
+    Возвращает: поля сессии или None, если запись повреждена или записана
+        в неизвестной версии схемы (такая сессия считается пустой)
+    """
+    try:
+        return decode_session(record)
+    except ValueError as error:
+        logger.warning("session: record of user %s is dropped: %s", key, error)
+        return None
+
+
+def _get_size(session: dict[str, str]) -> int:
+    """Возвращает размер сессии в redis в байтах (без служебных данных)."""
+    if _is_packed():
+        return len(encode_session(session)) if session else 0
+    return sum(
+        len(field.encode()) + len(value.encode()) for field, value in session.items()
+    )
 
 
 class _User(metaclass=Singleton):
@@ -20,8 +128,420 @@ class _User(metaclass=Singleton):
     себе информацию про состояние теста для конкретного пользователя.
     """
 
+    _redis: Redis
+    # Кэш сессий: пользовательский id -> поля
+    _sessions: "OrderedDict[str, dict[str, str]]"
+    # Изменения, еще не записанные в redis (None - поле удалено)
+    _pending: dict[str, Changes]
+    # Изменения, которые записываются в redis прямо сейчас
+    _flushing: dict[str, Changes]
+
     def __init__(self) -> None:
-        self.redis_ = redis.StrictRedis(**REDIS_SETTINGS)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._flushes = 0
+        self._catalog: Optional[Catalog] = None
+        self._expire_callbacks: list[Callable[[int], None]] = []
+        self.redis_ = InstrumentedRedis(**REDIS_SETTINGS)
+        atexit.register(self.flush)
+
+    def add_expire_callback(self, callback: Callable[[int], None]) -> None:
+        """Добавляет функцию, которая вызывается при очистке сессии.
+
+        Аргументы:
+            callback - функция, принимающая пользовательский id
+        Возвращает: None
+        """
+        self._expire_callbacks.append(callback)
+
+    @property
+    def redis_(self) -> Redis:
+        return self._redis
+
+    @redis_.setter
+    def redis_(self, value: Redis) -> None:
+        """Заменяет клиент redis и сбрасывает кэш сессий."""
+        with self._lock:
+            self._redis = value
+            self._sessions = OrderedDict()
+            self._pending = {}
+            self._flushing = {}
+
+    def _get_session(self, from_user_id: int) -> dict[str, str]:
+        key = str(from_user_id)
+        session = self._sessions.get(key)
+        if session is not None:
+            self._sessions.move_to_end(key)
+            SESSION_CACHE.inc(result="hit")
+            return session
+
+        SESSION_CACHE.inc(result="miss")
+        while True:
+            flushes = self._flushes
+            session = self._load(self._redis, [key])[0]
+            with self._lock:
+                # Если во время чтения завершилась запись изменений,
+                # прочитанные данные могут быть устаревшими
+                if flushes != self._flushes:
+                    continue
+                for changes in (self._flushing.get(key), self._pending.get(key)):
+                    _apply(session, changes or {})
+
+                self._sessions[key] = session
+                if len(self._sessions) > SESSION_SETTINGS["cache_size"]:
+                    self._sessions.popitem(last=False)
+                return session
+
+    def _load(self, client: Redis, keys: list[str]) -> list[dict[str, str]]:
+        """Читает сессии пользователей одной пачкой.
+
+        В формате "packed" хеши прежнего формата, для которых еще нет
+        записи, переносятся в записи.
+        Аргументы:
+            client - клиент redis
+            keys - пользовательские id
+        Возвращает: поля сессий в порядке keys
+        """
+        if not keys:
+            return []
+        pipeline = client.pipeline(transaction=False)
+        if not _is_packed():
+            for key in keys:
+                pipeline.hgetall(key)
+            return [dict(session) for session in pipeline.execute()]
+
+        for key in keys:
+            pipeline.execute_command(  # type: ignore[no-untyped-call]
+                "GET", PACKED_PREFIX + key, NEVER_DECODE=[]
+            )
+        records = pipeline.execute()
+        sessions = []
+        corrupted = []
+        for key, record in zip(keys, records):
+            session = _decode(key, record) if record else {}
+            if session is None:
+                corrupted.append(PACKED_PREFIX + key)
+                session = {}
+            sessions.append(session)
+        if corrupted:
+            client.delete(*corrupted)
+
+        missing = [key for key, record in zip(keys, records) if record is None]
+        if missing:
+            for key in missing:
+                pipeline.hgetall(key)
+            legacy = dict(zip(missing, pipeline.execute()))
+            pipeline = client.pipeline()
+            for number, key in enumerate(keys):
+                if legacy.get(key):
+                    sessions[number] = dict(legacy[key])
+                    pipeline.set(
+                        PACKED_PREFIX + key,
+                        encode_session(sessions[number]),
+                        ex=_get_ttl(),
+                        # Запись, созданная другим процессом, не заменяется
+                        nx=True,
+                    )
+                    pipeline.delete(key)
+            if len(pipeline):
+                pipeline.execute()
+        return sessions
+
+    def _change(self, from_user_id: int, changes: Changes) -> None:
+        key = str(from_user_id)
+        session = self._sessions.get(key)
+        if session is not None:
+            _apply(session, changes)
+
+        if SESSION_SETTINGS["flush_interval"] <= 0:
+            with self._flush_lock:
+                self._write(self._redis, {key: changes})
+            return
+
+        with self._lock:
+            self._pending.setdefault(key, {}).update(changes)
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_periodically, name="session-flush", daemon=True
+                )
+                self._flusher.start()
+
+    def _update_packed(
+        self,
+        client: Redis,
+        keys: list[str],
+        update: Callable[[Pipeline, list[dict[str, str]]], None],
+    ) -> None:
+        """Изменяет сессии в формате "packed" одной транзакцией.
+
+        Записи сессий и хеши прежнего формата отслеживаются командой WATCH,
+        читаются, изменяются функцией update и записываются в MULTI/EXEC.
+        Если сессию изменил другой процесс (или очистка) между чтением и
+        записью, транзакция повторяется с новыми значениями.
+        Аргументы:
+            client - клиент redis
+            keys - пользовательские id
+            update - функция, которая изменяет прочитанные сессии (в порядке
+                keys) и добавляет команды записи в транзакцию
+        Возвращает: None
+        Вызывает: redis.WatchError, если сессии менялись при каждой попытке
+        """
+        packed_keys = [PACKED_PREFIX + key for key in keys]
+        with client.pipeline() as pipeline:
+            for attempt in range(WRITE_ATTEMPTS):
+                try:
+                    sessions: list[dict[str, str]] = []
+                    legacy = []
+                    if keys:
+                        pipeline.watch(*packed_keys, *keys)
+                        # После WATCH конвейер выполняет команды сразу
+                        records = pipeline.execute_command(  # type: ignore[no-untyped-call]
+                            "MGET", *packed_keys, NEVER_DECODE=[]
+                        )
+                        for key, record in zip(keys, records):
+                            decoded = _decode(key, record) if record else None
+                            if decoded is not None:
+                                sessions.append(decoded)
+                                continue
+                            # Хеш прежнего формата переносится в запись,
+                            # поврежденная запись заменяется
+                            session = cast(dict[str, str], pipeline.hgetall(key))
+                            if session:
+                                legacy.append(key)
+                            sessions.append(session)
+                    pipeline.multi()
+                    if legacy:
+                        pipeline.delete(*legacy)
+                    update(pipeline, sessions)
+                    pipeline.execute()
+                    return
+                except redis.WatchError:
+                    if attempt == WRITE_ATTEMPTS - 1:
+                        raise
+
+    def _write(
+        self,
+        client: Redis,
+        changes: dict[str, Changes],
+    ) -> None:
+        now = time.time()
+        ttl = _get_ttl()
+
+        def touch(pipeline: Pipeline) -> None:
+            for key, fields in changes.items():
+                for _, activity_key, group_fields, _ in _EXPIRING_GROUPS:
+                    if not fields.keys().isdisjoint(group_fields):
+                        pipeline.zadd(activity_key, {key: now})
+
+        if _is_packed():
+
+            def update(pipeline: Pipeline, sessions: list[dict[str, str]]) -> None:
+                for (key, fields), session in zip(changes.items(), sessions):
+                    _apply(session, fields)
+                    self._store(pipeline, key, session, ex=ttl)
+                touch(pipeline)
+
+            self._update_packed(client, list(changes), update)
+            return
+
+        pipeline = client.pipeline(transaction=False)
+        for key, fields in changes.items():
+            deleted = [field for field, value in fields.items() if value is None]
+            if deleted:
+                pipeline.hdel(key, *deleted)
+            values: dict[Union[str, bytes], str] = {
+                field: value for field, value in fields.items() if value is not None
+            }
+            if values:
+                pipeline.hset(key, mapping=values)
+            pipeline.expire(key, ttl)
+        touch(pipeline)
+        pipeline.execute()
+
+    @staticmethod
+    def _store(
+        pipeline: Pipeline,
+        key: str,
+        session: dict[str, str],
+        ex: Optional[int] = None,
+        keepttl: bool = False,
+    ) -> None:
+        """Записывает сессию целиком в формате "packed" (пустую - удаляет)."""
+        if session:
+            pipeline.set(
+                PACKED_PREFIX + key, encode_session(session), ex=ex, keepttl=keepttl
+            )
+        else:
+            pipeline.delete(PACKED_PREFIX + key)
+
+    def _flush_periodically(self) -> None:
+        while True:
+            time.sleep(SESSION_SETTINGS["flush_interval"])
+            self.flush()
+            with self._lock:
+                if not self._pending:
+                    self._flusher = None
+                    return
+
+    def flush(self) -> None:
+        """Записывает накопленные изменения сессий в redis одной пачкой.
+
+        Если redis недоступен, изменения остаются в очереди до следующей записи.
+        Аргументы: -
+        Возвращает: None
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                client = self._redis
+                self._flushing, self._pending = self._pending, {}
+
+            try:
+                self._write(client, self._flushing)
+            except redis.RedisError as error:
+                logger.error(error)
+                with self._lock:
+                    if client is self._redis:
+                        for key, fields in self._flushing.items():
+                            self._pending[key] = fields | self._pending.get(key, {})
+                    self._flushing = {}
+                return
+
+            with self._lock:
+                self._flushing = {}
+                self._flushes += 1
+
+    def sweep(self) -> tuple[int, int, bool]:
+        """Удаляет поля сессий пользователей, которые давно не проявляли активности.
+
+        За один вызов обрабатывается не больше SESSION_SETTINGS["sweep_batch"]
+        пользователей из каждой группы полей.
+        Аргументы: -
+        Возвращает: количество очищенных сессий, размер удаленных полей в
+            байтах и True, если остались сессии для очистки
+        """
+        cleared = 0
+        reclaimed = 0
+        has_more = False
+        batch = SESSION_SETTINGS["sweep_batch"]
+        for name, activity_key, fields, setting in _EXPIRING_GROUPS:
+            now = time.time()
+            keys = self._redis.zrangebyscore(
+                activity_key, "-inf", now - SESSION_SETTINGS[setting], 0, batch
+            )
+            if not keys:
+                continue
+            has_more = has_more or len(keys) == batch
+
+            with self._lock:
+                # Изменения пользователей еще не записаны - они активны
+                active = {key for key in keys if key in self._pending}
+                active.update(key for key in keys if key in self._flushing)
+            expired = [key for key in keys if key not in active]
+
+            packed = _is_packed()
+            removed = dict.fromkeys(fields)
+            # Сессии, очищенные последней попыткой записи: (id, прежние поля)
+            expired_sessions: list[tuple[str, dict[str, str]]] = []
+
+            def clear(
+                pipeline: Pipeline,
+                sessions: list[dict[str, str]],
+            ) -> None:
+                expired_sessions.clear()
+                for key, session in zip(expired, sessions):
+                    if not packed:
+                        pipeline.hdel(key, *fields)
+                    if any(field in session for field in fields):
+                        expired_sessions.append((key, dict(session)))
+                        _apply(session, removed)
+                        if packed:
+                            self._store(pipeline, key, session, keepttl=True)
+                if expired:
+                    pipeline.zrem(activity_key, *expired)
+                if active:
+                    pipeline.zadd(activity_key, dict.fromkeys(active, now))
+
+            # Блокировка не дает записи изменений вернуть удаленные поля
+            with self._flush_lock:
+                if packed:
+                    self._update_packed(self._redis, expired, clear)
+                else:
+                    pipeline = self._redis.pipeline(transaction=False)
+                    clear(pipeline, self._load(self._redis, expired))
+                    pipeline.execute()
+                for key in expired:
+                    cached = self._sessions.get(key)
+                    if cached is not None:
+                        _apply(cached, removed)
+
+            for key, session in expired_sessions:
+                cleared += 1
+                EXPIRED_SESSIONS.inc(group=name)
+                command = session.get("active_test")
+                version = session.get("active_version")
+                if "active_version" in fields and command and version:
+                    # Прохождение брошено - прежняя версия теста
+                    # больше не нужна этой сессии
+                    Versions.release(command, version)
+                if name == "session":
+                    for callback in self._expire_callbacks:
+                        callback(int(key))
+                size = _get_size(session)
+                _apply(session, removed)
+                reclaimed += size - _get_size(session)
+
+        RECLAIMED_BYTES.inc(reclaimed)
+        return cleared, reclaimed, has_more
+
+    def migrate(self, cursor: int = 0) -> tuple[int, int]:
+        """Переносит пачку сессий прежнего формата в компактные записи.
+
+        Хеши прежнего формата переносятся в записи, а записи прежней версии
+        схемы (см. src/session.py) перезаписываются в текущей версии.
+        Аргументы:
+            cursor - курсор SCAN (0 - начать сначала)
+        Возвращает: курсор следующей пачки (0 - перенос завершен) и
+            количество перенесенных сессий
+        """
+        if not _is_packed():
+            return 0, 0
+        cursor, keys = self._redis.scan(cursor, count=SESSION_SETTINGS["sweep_batch"])
+        legacy = [key for key in keys if key.isdigit()]
+        packed = [
+            key[len(PACKED_PREFIX) :]
+            for key in keys
+            if key.startswith(PACKED_PREFIX) and key[len(PACKED_PREFIX) :].isdigit()
+        ]
+        migrated = 0
+
+        with self._flush_lock:
+            if legacy:
+                # Хеши без записи переносятся при чтении, остальные устарели
+                self._load(self._redis, legacy)
+                migrated += len(legacy) - self._redis.delete(*legacy)
+
+            pipeline = self._redis.pipeline(transaction=False)
+            for key in packed:
+                pipeline.execute_command(  # type: ignore[no-untyped-call]
+                    "GET", PACKED_PREFIX + key, NEVER_DECODE=[]
+                )
+            outdated = [
+                key
+                for key, record in zip(packed, pipeline.execute() if packed else [])
+                if record and get_schema_version(record) != SCHEMA_VERSION
+            ]
+
+            def rewrite(pipeline: Pipeline, sessions: list[dict[str, str]]) -> None:
+                for key, session in zip(outdated, sessions):
+                    self._store(pipeline, key, session, keepttl=True)
+
+            if outdated:
+                self._update_packed(self._redis, outdated, rewrite)
+                migrated += len(outdated)
+        return cursor, migrated
 
     def get(self, from_user_id: int, field: str) -> str:
         """Возвращает значение поля по его названию и по пользовательскому id.
@@ -30,14 +550,23 @@ class _User(metaclass=Singleton):
             from_user_id - пользовательский id
             field - название поля
         Возвращает:
-            значение поля, извлеченное из redis
+            значение поля, извлеченное из кэша сессий или из redis
         """
-        user_information = self.redis_.hgetall(str(from_user_id))
-        user_field = user_information.get(field)
+        user_field = self._get_session(from_user_id).get(field)
         if user_field is None:
             raise ValueError()
 
-        return str(user_field)
+        return user_field
+
+    def get_all(self, from_user_id: int) -> dict[str, str]:
+        """Возвращает все поля пользователя.
+
+        Аргументы:
+            from_user_id - пользовательский id
+        Возвращает:
+            словарь (название поля)-(значение)
+        """
+        return dict(self._get_session(from_user_id))
 
     def set(self, from_user_id: int, **kwargs: Union[str, int]) -> None:
         """Устанавливает значение поля по его названию и по пользовательскому id.
@@ -47,9 +576,8 @@ class _User(metaclass=Singleton):
             **kwargs - (название поля)-(значение)
         Возвращает: None
         """
-        self.redis_.hset(
-            str(from_user_id),
-            mapping=kwargs,  # type: ignore
+        self._change(
+            from_user_id, {field: str(value) for field, value in kwargs.items()}
         )
 
     def delete(self, from_user_id: int, *args: str) -> None:
@@ -60,47 +588,67 @@ class _User(metaclass=Singleton):
             *args - названия полей
         Возвращает: None
         """
-        for arg in args:
-            self.redis_.hdel(
-                str(from_user_id),
-                arg,
-            )
+        self._change(from_user_id, dict.fromkeys(args))
+
+    @property
+    def catalog(self) -> Catalog:
+        """Хранилище списков тестов пользователей (создается при первом обращении)."""
+        if self._catalog is None:
+            self._catalog = create_catalog(lambda: self._redis)
+        return self._catalog
 
     def get_tests_with_numbers(self, from_user_id: int) -> list[dict[str, str]]:
-        return sorted(
-            [
-                self.redis_.hgetall(name)
-                for name in self.redis_.lrange(str(from_user_id) + "_tests", 0, -1)
-            ],
-            key=lambda x: list(x.values()),
-        )
+        return self.catalog.get_tests_with_numbers(from_user_id)
 
     def get_tests(self, from_user_id: int) -> list[str]:
-        return sorted(
-            [
-                list(self.redis_.hgetall(name).values())[0]
-                for name in self.redis_.lrange(str(from_user_id) + "_tests", 0, -1)
-            ]
-        )
+        return self.catalog.get_tests(from_user_id)
 
-    def add_test(self, from_user_id: int, number: int, name: str) -> None:
+    def find_test(self, from_user_id: int, name: str) -> Optional[int]:
+        """Возвращает номер директории теста пользователя.
+
+        Аргументы:
+            from_user_id - пользовательский id
+            name - название теста
+        Возвращает: номер или None, если пользователь не является автором теста
+        """
+        return self.catalog.find_test(from_user_id, name)
+
+    def get_test_by_number(self, from_user_id: int, number: int) -> Optional[str]:
+        """Возвращает название теста пользователя по номеру директории.
+
+        Аргументы:
+            from_user_id - пользовательский id
+            number - номер директории теста
+        Возвращает: название теста или None, если номер свободен
+        """
+        return self.catalog.get_command(from_user_id, number)
+
+    def count_tests(self, from_user_id: int) -> int:
+        return self.catalog.count_tests(from_user_id)
+
+    def add_test(
+        self, from_user_id: int, number: int, name: str, title: str = ""
+    ) -> None:
         """Добавляет название теста в список тестов пользователя.
 
         Аргументы:
             from_user_id - пользовательский id
             number - номер директории, где хранится пользовательский тест
             name - название теста
+            title - отображаемое название теста (поле "name" файла теста)
         Возвращает: None
         """
-        hset_name = str(from_user_id) + ":" + str(name)
-        if name not in self.get_tests(from_user_id):
-            self.redis_.hset(
-                hset_name,
-                mapping={
-                    str(number): name,
-                },
-            )
-            self.redis_.lpush(str(from_user_id) + "_tests", hset_name)
+        self.catalog.add_tests([(from_user_id, number, name, title)])
+
+    def add_tests(self, tests: Iterable[tuple[int, int, str, str]]) -> None:
+        """Добавляет тесты в списки тестов пользователей одной пачкой.
+
+        Аргументы:
+            tests - (пользовательский id, номер директории, название,
+                отображаемое название) для каждого теста
+        Возвращает: None
+        """
+        self.catalog.add_tests(tests)
 
     def delete_test(self, from_user_id: int, name: str) -> None:
         """Удаляет тест из списка тестов пользователя.
@@ -110,9 +658,7 @@ class _User(metaclass=Singleton):
             name - название теста
         Возвращает: None
         """
-        hset_name = str(from_user_id) + ":" + str(name)
-        self.redis_.lrem(str(from_user_id) + "_tests", 1, hset_name)
-        self.redis_.delete(hset_name)
+        self.catalog.delete_test(from_user_id, name)
 
 
 User = _User()
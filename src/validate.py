@@ -28,6 +28,7 @@ class Validator:
         description: Any,
         questions: Any,
         result_explanation: Any,
+        is_new: bool = True,
     ) -> None:
         """Проверяет правильность всех команд.
 
@@ -38,21 +39,26 @@ class Validator:
             description - поле "Описание"
             questions - поле "Вопросы"
             result_explanation - поле "Объяснение результата"
+            is_new - False, если проверяется новая версия существующего теста
+                (тогда команда должна быть уже занята этим тестом)
         Возвращает: None
         """
-        is_command_right(command, errors)
+        is_command_right(command, errors, is_new)
         is_name_right(name, errors)
         is_description_right(description, errors)
         are_questions_right(questions, errors)
         is_result_explanation_right(result_explanation, len(questions), errors)
 
 
-def is_command_right(command: Any, errors: list[Union[str, int]]) -> None:
+def is_command_right(
+    command: Any, errors: list[Union[str, int]], is_new: bool = True
+) -> None:
     """Проверяет правильность поля "Команда".
 
     Аргументы:
         command - поле "Команда"
         errors - список ошибок
+        is_new - если False, то занятость команды не проверяется
     Возвращает: None
     Вызывает: BotParseException, если:
         - Команда не является непустой строкой
@@ -68,7 +74,11 @@ def is_command_right(command: Any, errors: list[Union[str, int]]) -> None:
             'Команда не подходит под заданный шаблон. В начале должно стоять слово "test_". Далее к нему приписываются все буквы латинского алфавита (прописные и/или строчные) и/или десятичные цифры и/или _. Максимальная длина команды с учетом начального слова не должна превышать 40.',
         )
 
-    if CommandsTestTree().search(Node(Test(command, "", None, [], None))) is not None:
+    if (
+        is_new
+        and CommandsTestTree().search(Node(Test(command, "", None, [], None)))
+        is not None
+    ):
         raise BotParseException(errors, "Тест с такой командой уже существует.")
 
 
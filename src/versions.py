@@ -0,0 +1,88 @@
+"""Модуль версий тестов, которые проходят пользователи.
+
+Тест неизменяем: обновление (/update или изменение файла в PATH_OF_DATA)
+создает новый экземпляр Test с другой версией (хешем содержимого файла) и
+заменяет им прежний в CommandsTestTree. Сессия запоминает версию, с
+которой пользователь начал тест (поле active_version), поэтому
+прохождение продолжается по прежней версии. Прежняя версия хранится,
+пока ее проходит хотя бы один пользователь этого процесса (счетчик
+ссылок увеличивается при начале теста и уменьшается при окончании или
+при очистке сессии по сроку), и затем удаляется.
+
+Классы:
+    _Versions - закрытый класс реестра прежних версий тестов.
+Экземпляры классов:
+    Versions - экземпляр класса _Versions.
+"""
+
+from collections import Counter
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from .test import Test
+
+
+class _Versions:
+    """Реестр прежних версий тестов со счетчиками ссылок."""
+
+    def __init__(self) -> None:
+        # Количество прохождений каждой версии: (команда, версия)-(количество)
+        self._references: Counter[tuple[str, str]] = Counter()
+        # Замененные версии, которые еще проходят пользователи
+        self._retired: dict[tuple[str, str], "Test"] = {}
+
+    def acquire(self, command: str, version: str) -> None:
+        """Отмечает начало прохождения версии теста.
+
+        Аргументы:
+            command - команда теста
+            version - версия теста
+        Возвращает: None
+        """
+        self._references[command, version] += 1
+
+    def release(self, command: str, version: str) -> None:
+        """Отмечает окончание прохождения версии теста.
+
+        Прежняя версия удаляется, когда ее больше никто не проходит.
+        Аргументы:
+            command - команда теста
+            version - версия теста
+        Возвращает: None
+        """
+        key = (command, version)
+        if self._references[key] > 1:
+            self._references[key] -= 1
+        else:
+            self._references.pop(key, None)
+            self._retired.pop(key, None)
+
+    def retire(self, test: "Test") -> None:
+        """Сохраняет замененную или удаленную версию теста, если ее проходят.
+
+        Аргументы:
+            test - прежняя версия теста
+        Возвращает: None
+        """
+        key = (test.command, test.version)
+        if self._references[key] > 0:
+            self._retired[key] = test
+
+    def get(self, command: str, version: str) -> Optional["Test"]:
+        """Возвращает прежнюю версию теста.
+
+        Аргументы:
+            command - команда теста
+            version - версия теста
+        Возвращает: версию теста или None, если она не заменялась или ее
+            уже никто не проходит
+        """
+        return self._retired.get((command, version))
+
+    @property
+    def size(self) -> int:
+        """Количество хранимых прежних версий."""
+        return len(self._retired)
+
+
+Versions = _Versions()
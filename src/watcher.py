@@ -0,0 +1,266 @@
+"""Модуль отслеживания тестов, измененных в PATH_OF_DATA в обход бота.
+
+Тесты, которые восстановлены из резервной копии или добавлены вручную
+в "<PATH_OF_DATA>/<пользовательский id>/<номер>/<файл>.json", без
+отслеживания появились бы только после перезапуска. Наблюдатель
+периодически сравнивает время изменения и размер файлов тестов с
+предыдущим обходом (os.scandir не читает сами файлы). Изменение файла
+применяется, только когда файл не менялся WATCHER_SETTINGS["debounce"]
+секунд, поэтому копирование множества файлов обрабатывается один раз.
+Обход директорий и чтение файлов выполняются в отдельном потоке, а
+проверка тестов и изменение CommandsTestTree и User - в цикле событий,
+по одному файлу за шаг.
+
+Новая команда теста занимается через общий реестр (src/commands.py), как
+при загрузке теста через бота: файл с командой, занятой тестом другого
+автора или другого процесса, отклоняется. Файл, версия которого совпадает
+с версией теста в CommandsTestTree (например, записанный самим ботом при
+загрузке теста или /update), не применяется повторно.
+
+Классы:
+    _CatalogWatcher - закрытый класс наблюдателя за тестами.
+Экземпляры классов:
+    Watcher - экземпляр класса _CatalogWatcher.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Optional, Union
+
+from .builder import STAGING_DIRECTORY, BuilderTest
+from .commands import Commands
+from .constants import PATH_OF_DATA, REGEX_FILE, WATCHER_SETTINGS
+from .errors import BotParseException
+from .log import logger
+from .test import Test
+from .tree import CommandsTestTree, Node
+from .user import User
+from .versions import Versions
+
+# Время изменения (в наносекундах) и размер файла
+Signature = tuple[int, int]
+
+
+class _CatalogWatcher:
+    """Наблюдатель за файлами тестов в PATH_OF_DATA.
+
+    Аргументы конструктора:
+        path - директория с тестами
+        debounce - время (в секундах) без изменений файла до его обработки
+    """
+
+    def __init__(
+        self,
+        path: str = PATH_OF_DATA,
+        debounce: float = WATCHER_SETTINGS["debounce"],
+    ) -> None:
+        self._path = path
+        self._debounce = debounce
+        # Файлы, изменения которых уже применены
+        self._files: dict[str, Signature] = {}
+        # Измененные файлы: (новая подпись или None, если файл удален)-(время
+        # последнего изменения подписи)
+        self._pending: dict[str, tuple[Optional[Signature], float]] = {}
+        # Команды тестов, добавленных наблюдателем
+        self._commands: dict[str, str] = {}
+
+    def start(self) -> None:
+        """Запоминает текущие файлы тестов (они уже загружены BuilderTest).
+
+        Аргументы: -
+        Возвращает: None
+        """
+        self._files = self._scan()
+        self._pending.clear()
+
+    def collect(self) -> tuple[list[str], list[str]]:
+        """Находит файлы тестов, изменения которых можно применить.
+
+        Аргументы: -
+        Возвращает: пути к добавленным или измененным файлам и к удаленным
+        """
+        now = time.monotonic()
+        current = self._scan()
+        for path in current.keys() | self._files.keys() | self._pending.keys():
+            signature = current.get(path)
+            pending = self._pending.get(path)
+            if signature == self._files.get(path):
+                self._pending.pop(path, None)
+            elif pending is None or pending[0] != signature:
+                self._pending[path] = (signature, now)
+
+        changed: list[str] = []
+        removed: list[str] = []
+        for path, (signature, since) in list(self._pending.items()):
+            if now - since < self._debounce:
+                continue
+            del self._pending[path]
+            if signature is None:
+                del self._files[path]
+                removed.append(path)
+            else:
+                self._files[path] = signature
+                changed.append(path)
+        return changed, removed
+
+    async def poll(self) -> None:
+        """Применяет изменения файлов тестов, не блокируя надолго цикл событий.
+
+        Аргументы: -
+        Возвращает: None
+        """
+        changed, removed = await asyncio.to_thread(self.collect)
+        if not changed and not removed:
+            return
+        contents = await asyncio.to_thread(self._read, changed)
+
+        applied = 0
+        for path in removed:
+            applied += self._remove(path)
+            await asyncio.sleep(0)
+        for path, content in contents:
+            applied += self._apply(path, content)
+            await asyncio.sleep(0)
+
+        logger.info(
+            "catalog: %d changed, %d removed, %d applied",
+            len(changed),
+            len(removed),
+            applied,
+        )
+
+    def _scan(self) -> dict[str, Signature]:
+        files: dict[str, Signature] = {}
+        for user in self._scandir(self._path):
+            if user.name == STAGING_DIRECTORY or not user.name.isdigit():
+                continue
+            for directory in self._scandir(user.path):
+                if not directory.name.isdigit():
+                    continue
+                for file in self._scandir(directory.path):
+                    if not REGEX_FILE.match(file.name):
+                        continue
+                    try:
+                        stat = file.stat()
+                    except FileNotFoundError:
+                        continue
+                    files[file.path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    @staticmethod
+    def _scandir(path: str) -> list[os.DirEntry[str]]:
+        # Директория может быть удалена во время обхода
+        try:
+            with os.scandir(path) as entries:
+                return list(entries)
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+
+    @staticmethod
+    def _read(paths: list[str]) -> list[tuple[str, Any]]:
+        contents = []
+        for path in paths:
+            try:
+                with open(path, encoding="utf-8") as file:
+                    contents.append((path, json.load(file)))
+            except (OSError, ValueError) as error:
+                logger.warning("catalog: %s is not loaded: %s", path, error)
+        return contents
+
+    @staticmethod
+    def _get_ids(path: str) -> tuple[int, int]:
+        directory = os.path.dirname(path)
+        return int(os.path.basename(os.path.dirname(directory))), int(
+            os.path.basename(directory)
+        )
+
+    @staticmethod
+    def _search(command: str) -> Optional[Node]:
+        return CommandsTestTree().search(Node(Test(command, "", None, [], None)))
+
+    def _apply(self, path: str, content: Any) -> bool:
+        from_user_id, number = self._get_ids(path)
+        known = User.get_test_by_number(from_user_id, number)
+        old = self._commands.get(path, known)
+
+        found = self._search(old) if old is not None else None
+        if (
+            found is not None
+            and isinstance(content, dict)
+            and found.key.version == BuilderTest.get_version(content)
+        ):
+            # Файл записан самим ботом (загрузка теста или /update), и тест
+            # в дереве уже этой версии
+            return False
+
+        # Прежняя версия теста убирается из дерева на время проверки, чтобы
+        # ее команда не считалась занятой
+        if found is not None:
+            CommandsTestTree().delete(found)
+        errors: list[Union[str, int]] = []
+        try:
+            if not isinstance(content, dict):
+                raise ValueError("Содержимое файла должно быть объектом.")
+            test = BuilderTest().build_test(from_user_id, number, content, errors)
+            if test.command != known:
+                # Новая команда занимается через общий реестр: ее мог занять
+                # тест другого автора или другого процесса бота
+                token = Commands.reserve(test.command, from_user_id, errors)
+                if not Commands.commit(test.command, token):
+                    raise BotParseException(
+                        errors, "Тест с такой командой уже существует."
+                    )
+        except Exception as error:
+            if found is not None:
+                CommandsTestTree().append(Node(key=found.key))
+            logger.warning(
+                "catalog: %s is rejected: %s", path, errors[0] if errors else error
+            )
+            return False
+
+        CommandsTestTree().append(Node(key=test))
+        if found is not None:
+            Versions.retire(found.key)
+        if known is not None and known != test.command:
+            User.delete_test(from_user_id, known)
+            Commands.release(known)
+        # Название теста в каталоге могло измениться и при той же команде
+        User.add_test(from_user_id, number, test.command, test.name)
+        self._commands[path] = test.command
+        return True
+
+    def forget(self, from_user_id: int, number: Union[int, str]) -> None:
+        """Забывает команды тестов из директории, удаленной через /delete.
+
+        Аргументы:
+            from_user_id - пользовательский id
+            number - номер директории теста
+        Возвращает: None
+        """
+        directory = os.path.join(self._path, str(from_user_id), str(number))
+        for path in [
+            path for path in self._commands if os.path.dirname(path) == directory
+        ]:
+            del self._commands[path]
+
+    def _remove(self, path: str) -> bool:
+        from_user_id, number = self._get_ids(path)
+        known = User.get_test_by_number(from_user_id, number)
+        command = self._commands.pop(path, known)
+        if command is None or known != command:
+            # Тест удален через /delete, и команду мог занять тест другого
+            # автора - он не должен быть убран из дерева
+            return False
+
+        found = self._search(command)
+        if found is not None:
+            CommandsTestTree().delete(found)
+            Versions.retire(found.key)
+        User.delete_test(from_user_id, command)
+        Commands.release(command)
+        return True
+
+
+Watcher = _CatalogWatcher()
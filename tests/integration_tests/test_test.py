@@ -10,10 +10,13 @@ from src.test import Test
 from src.user import User
 
 
+@patch("src.test.answers")
 @patch("src.test.bot.send_photo")
 @patch("src.test.bot.send_message")
 @pytest.mark.asyncio
-async def test_Test(mock_send_message: Mock, mock_send_photo: Mock) -> None:
+async def test_Test(
+    mock_send_message: Mock, mock_send_photo: Mock, mock_answers: Mock
+) -> None:
     User.redis_ = FakeStrictRedis(**REDIS_SETTINGS)
     user_id = 1
 
@@ -121,6 +124,10 @@ async def test_Test(mock_send_message: Mock, mock_send_photo: Mock) -> None:
     assert mock_kwargs["reply_markup"].keyboard[0][1].text == "No"
 
     await test.check(user_id, "No")
+    assert mock_answers.record.call_args_list == [
+        call(user_id, "/test_test", "", 0, "Ответ 1", True),
+        call(user_id, "/test_test", "", 1, "No", False),
+    ]
     assert User.get(user_id, "question_index") == "2"
     assert User.get(user_id, "right_answers_number") == "1"
 
@@ -0,0 +1,152 @@
+import json
+import time
+from pathlib import Path
+from unittest.mock import ANY, patch
+
+import pytest
+
+from src.answers import (
+    AnswerEvent,
+    AnswerLog,
+    FinishEvent,
+    LogEvent,
+    aggregate,
+    read_events,
+)
+
+
+class TestAnswerLog:
+    def test_record(self, tmp_path: Path) -> None:
+        path = tmp_path / "answers.jsonl"
+        log = AnswerLog(str(path), 10, 0.01)
+        with patch("src.answers.time.monotonic", side_effect=[10.0, 12.5, 100.0]):
+            log.ask(1)
+            log.record(1, "/test_test", "1", 0, [1, 3], True)
+            log.record(2, "/test_test", "1", 0, "Нет", False)
+
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            events = list(read_events(str(path))) if path.exists() else []
+            if len(events) == 2:
+                break
+            time.sleep(0.01)
+
+        assert [
+            (
+                event["event"],
+                event["user_id"],
+                event["answer"],
+                event["right"],
+                event["seconds"],
+            )
+            for event in events
+        ] == [("answer", 1, [1, 3], True, 2.5), ("answer", 2, "Нет", False, None)]
+
+    def test_finish(self, tmp_path: Path) -> None:
+        log = AnswerLog(str(tmp_path / "answers.jsonl"), 10, 0.01)
+        batches: list[list[LogEvent]] = []
+        log._on_batch = batches.append
+        with patch("src.answers.time.monotonic", side_effect=[10.0, 70.0]):
+            log.start(1)
+            log.finish(1, "/test_test", "1", 2, 3, False)
+
+        deadline = time.monotonic() + 5
+        while not batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert log._asked == log._started == {}
+        assert batches == [
+            [FinishEvent("finish", ANY, 1, "/test_test", "1", 2, 3, False, 60)]
+        ]
+
+    def test_forget(self, tmp_path: Path) -> None:
+        log = AnswerLog(str(tmp_path / "answers.jsonl"), 10, 0.01)
+        log.start(1)
+        log.start(2)
+        log.forget(1)
+        log.forget(3)
+        assert list(log._started) == list(log._asked) == [2]
+
+    @pytest.mark.parametrize("backup_count", [0, 2])
+    def test_rotate(self, tmp_path: Path, backup_count: int) -> None:
+        path = tmp_path / "answers.jsonl"
+        event = AnswerEvent("answer", 0.0, 1, "/test_test", "1", 0, "Да", True, None)
+        size = len(json.dumps(event._asdict(), ensure_ascii=False).encode()) + 1
+        log = AnswerLog(
+            str(path), 10, 60, max_bytes=2 * size, backup_count=backup_count
+        )
+
+        for question in range(7):
+            log.write([event._replace(question=question)])
+
+        def questions(name: str) -> list[int]:
+            return [event["question"] for event in read_events(str(tmp_path / name))]
+
+        # Файл заменяется новым после каждых двух событий
+        assert questions("answers.jsonl") == [6]
+        backups = {"answers.jsonl.1": [4, 5], "answers.jsonl.2": [2, 3]}
+        assert (
+            sorted(path.name for path in tmp_path.glob("answers.jsonl.*"))
+            == list(backups)[:backup_count]
+        )
+        for name in list(backups)[:backup_count]:
+            assert questions(name) == backups[name]
+
+    def test_full_batch_wakes_writer(self, tmp_path: Path) -> None:
+        log = AnswerLog(str(tmp_path / "answers.jsonl"), 2, 60)
+        batches: list[list[LogEvent]] = []
+        log._on_batch = batches.append
+        for question in range(3):
+            log.record(1, "/test_test", "1", question, "Да", True)
+
+        deadline = time.monotonic() + 5
+        while not batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert batches[0] == [
+            AnswerEvent("answer", ANY, 1, "/test_test", "1", question, "Да", True, None)
+            for question in range(2)
+        ]
+
+    def test_read_events_skips_broken_lines(self, tmp_path: Path) -> None:
+        path = tmp_path / "answers.jsonl"
+        path.write_text(json.dumps({"test": "/test_test"}) + "\n{\n", encoding="utf-8")
+        assert list(read_events(str(path))) == [{"test": "/test_test"}]
+
+
+class TestAggregate:
+    def test_aggregate(self) -> None:
+        events = [
+            {"test": "/a", "question": 0, "answer": "Да", "right": True, "seconds": 2},
+            {
+                "test": "/a",
+                "question": 0,
+                "answer": "Нет",
+                "right": False,
+                "seconds": 4,
+            },
+            {
+                "test": "/a",
+                "question": 0,
+                "answer": "Да",
+                "right": True,
+                "seconds": None,
+            },
+            {"test": "/a", "question": 1, "answer": [1, 3], "right": False},
+            {"test": "/b", "question": 0, "answer": [3], "right": True, "seconds": 1},
+            {"event": "finish", "test": "/b", "right": 1, "questions": 1},
+        ]
+        stats = aggregate(events)
+
+        first = stats["/a"][0]
+        assert (first.answers, first.right) == (3, 2)
+        assert first.difficulty == pytest.approx(1 / 3)
+        assert first.mean_seconds == 3
+        assert first.options == {"Да": 2, "Нет": 1}
+
+        second = stats["/a"][1]
+        assert second.difficulty == 1
+        assert second.mean_seconds is None
+        assert second.options == {"1": 1, "3": 1}
+
+        assert stats["/b"][0].difficulty == 0
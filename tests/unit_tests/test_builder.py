@@ -1,6 +1,10 @@
+import json
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from json import JSONDecodeError
+from pathlib import Path
 from typing import Any, Callable, Iterable, Union
 from unittest.mock import AsyncMock, Mock, call, patch
 
@@ -10,10 +14,10 @@ from pytest import Config
 
 from src.builder import BuilderTest
 from src.constants import PATH_OF_DATA
-from src.errors import BotFilesException
+from src.errors import BotFilesException, BotParseException
 from src.question import Question
 from src.test import Test
-from src.tree import ColorTree, Node
+from src.tree import ColorTree, CommandsTestTree, Node
 
 
 class TestBuilder:
@@ -28,12 +32,12 @@ class TestBuilder:
 @patch("src.builder.bot.get_file", new_callable=AsyncMock)
 @patch("src.builder.BuilderTest._add_test")
 @patch("src.builder.BuilderTest._return_test")
-@patch("src.builder.BuilderTest.get_directory_number")
+@patch("src.builder.shutil.rmtree")
+@patch("src.builder.BuilderTest._stage", return_value="staging")
+@patch("src.builder.BuilderTest.check_quota")
 @patch("src.builder.os.remove")
 @patch("src.builder.ZipFile")
 @patch("src.builder.open")
-@patch("src.builder.os.listdir")
-@patch("src.builder.os.path.exists")
 @patch("src.builder.BuilderTest.__init__", return_value=None)
 @pytest.mark.asyncio
 class TestCreateTest:
@@ -52,62 +56,43 @@ class TestCreateTest:
     async def test_create_test_by_json(
         self,
         mock__init__: Mock,
-        mock_path_exists: Mock,
-        mock_listdir: Mock,
         mock_open: Mock,
         mock_ZipFile: Mock,
         mock_remove: Mock,
-        mock_get_directory_number: Mock,
+        mock_check_quota: Mock,
+        mock_stage: Mock,
+        mock_rmtree: Mock,
         mock_return_test: Mock,
         mock_add_test: Mock,
         mock_get_file: Mock,
     ) -> None:
         errors: list[Union[str, int]] = []
         message = self.create_document("/create")
-        mock_listdir.return_value = [str(i) for i in range(1, 6)]
-        mock_get_directory_number.return_value = 1
         mock_return_test.return_value = "test.json"
         file_mock = AsyncMock()
         file_mock.download_file.return_value = "data_from_download_file"
         mock_get_file.return_value = file_mock
         await BuilderTest().create_test_by_json(message, "file.zip", errors)
 
-        path_to_file = PATH_OF_DATA + "/-1/1/file.zip"
-        mock_get_directory_number.assert_called_once_with(
-            [str(i) for i in range(1, 6)], errors
-        )
+        path_to_file = "staging/file.zip"
+        mock_check_quota.assert_called_once_with(-1, errors)
         mock_get_file.assert_called_once_with(
             file_id="-1",
         )
 
-        mock_path_exists.assert_has_calls(
-            [
-                call(PATH_OF_DATA + "/-1"),
-                call().__bool__(),
-                call(PATH_OF_DATA + "/-1/1"),
-                call().__bool__(),
-            ]
-        )
-
-        assert errors[0] == 1
+        assert errors == []
 
         mock_open.assert_called_once_with(path_to_file, "wb")
 
         mock_ZipFile.assert_called_once_with(path_to_file, "r")
-        mock_ZipFile().__enter__().extractall.assert_called_once_with(
-            PATH_OF_DATA + "/-1/1"
-        )
+        mock_ZipFile().__enter__().extractall.assert_called_once_with("staging")
 
         mock_remove.assert_called_once_with(path_to_file)
 
-        mock_return_test.assert_called_once_with(PATH_OF_DATA + "/-1/1", errors)
+        mock_return_test.assert_called_once_with("staging", errors)
 
-        mock_add_test.assert_called_once_with(
-            -1,
-            1,
-            PATH_OF_DATA + "/-1/1/test.json",
-            errors,
-        )
+        mock_add_test.assert_called_once_with(-1, "staging/test.json", errors)
+        mock_rmtree.assert_called_once_with("staging", ignore_errors=True)
 
 
 @patch("src.builder.os.listdir")
@@ -161,6 +146,7 @@ class TestGetDirectoryNumber:
             (["1", "2", "3", "4", "5"], 6),
             (["1", "2", "4", "5"], 3),
             (["2", "3"], 1),
+            (["3", "1", "2"], 4),
             ([], 1),
         ],
     )
@@ -181,7 +167,106 @@ class TestGetDirectoryNumber:
             str(errors[0]),
         )
 
+    @patch("src.builder.User.count_tests")
+    def test_check_quota(self, mock_count_tests: Mock, mock__init__: Mock) -> None:
+        errors: list[Union[str, int]] = []
+        mock_count_tests.return_value = 29
+        BuilderTest().check_quota(1, errors)
+
+        mock_count_tests.return_value = 30
+        with pytest.raises(BotFilesException):
+            BuilderTest().check_quota(1, errors)
+        assert errors == [
+            "У вас больше 30 тестов, вы больше не можете создавать тесты."
+        ]
+        mock_count_tests.assert_called_with(1)
+
+
+def _stage(path: Path) -> str:
+    with patch("src.builder.PATH_OF_DATA", str(path)):
+        staging = BuilderTest._stage()
+    with open(os.path.join(staging, "test.json"), "w") as file:
+        file.write("{}")
+    return staging
+
+
+@patch("src.builder.BuilderTest.__init__", return_value=None)
+class TestPublish:
+    def test_publish(self, mock__init__: Mock, tmp_path: Path) -> None:
+        (tmp_path / "-1" / "2").mkdir(parents=True)
+        first, second = _stage(tmp_path), _stage(tmp_path)
+        with patch("src.builder.PATH_OF_DATA", str(tmp_path)):
+            assert BuilderTest()._publish(first, -1, []) == 1
+            assert BuilderTest()._publish(second, -1, []) == 3
+
+        assert sorted(os.listdir(tmp_path / "-1")) == ["1", "2", "3"]
+        assert os.listdir(tmp_path / "-1" / "3") == ["test.json"]
+        assert os.listdir(tmp_path / ".staging") == []
+
+    def test_concurrent(self, mock__init__: Mock, tmp_path: Path) -> None:
+        stagings = [_stage(tmp_path) for _ in range(31)]
+        with patch("src.builder.PATH_OF_DATA", str(tmp_path)):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                numbers = list(
+                    executor.map(
+                        lambda staging: BuilderTest()._publish(staging, -1, []),
+                        stagings[:30],
+                    )
+                )
+            assert sorted(numbers) == list(range(1, 31))
+
+            errors: list[Union[str, int]] = []
+            with pytest.raises(BotFilesException):
+                BuilderTest()._publish(stagings[30], -1, errors)
+
+    def test_race(self, mock__init__: Mock, tmp_path: Path) -> None:
+        # Номер 1 публикует другой процесс между os.listdir и os.rename
+        other, staging = _stage(tmp_path), _stage(tmp_path)
+        listdir = os.listdir
+
+        def publish_other(path: str) -> list[str]:
+            files = listdir(path)
+            if path == str(tmp_path / "-1") and not files:
+                os.rename(other, os.path.join(path, "1"))
+            return files
+
+        with patch("src.builder.PATH_OF_DATA", str(tmp_path)), patch(
+            "src.builder.os.listdir", side_effect=publish_other
+        ):
+            assert BuilderTest()._publish(staging, -1, []) == 2
+
 
+@patch("src.builder.BuilderTest.__init__", return_value=None)
+class TestStaging:
+    def test_sweep_staging(self, mock__init__: Mock, tmp_path: Path) -> None:
+        stale, fresh = _stage(tmp_path), _stage(tmp_path)
+        os.utime(stale, (0, 0))
+        with patch("src.builder.PATH_OF_DATA", str(tmp_path)):
+            BuilderTest._sweep_staging()
+        assert os.listdir(tmp_path / ".staging") == [os.path.basename(fresh)]
+
+    def test_find_tests_skips_staging(self, mock__init__: Mock, tmp_path: Path) -> None:
+        _stage(tmp_path)
+        (tmp_path / "1" / "1").mkdir(parents=True)
+        (tmp_path / "1" / "1" / "test.json").write_text("{}")
+        with patch("src.builder.PATH_OF_DATA", str(tmp_path)):
+            assert BuilderTest()._find_tests() == [
+                (1, 1, str(tmp_path / "1" / "1" / "test.json"))
+            ]
+
+    @patch("src.builder.BuilderTest._add_test", side_effect=BotFilesException([], ""))
+    @pytest.mark.asyncio
+    async def test_failed_test_is_not_published(
+        self, mock_add_test: Mock, mock__init__: Mock, tmp_path: Path
+    ) -> None:
+        with patch("src.builder.PATH_OF_DATA", str(tmp_path)):
+            with pytest.raises(BotFilesException):
+                await BuilderTest().create_test(-1, {"command": "/test_test"})
+        assert os.listdir(tmp_path) == [".staging"]
+        assert os.listdir(tmp_path / ".staging") == []
+
+
+@patch("src.builder.Commands")
 @patch("src.builder.Test.__init__", return_value=None)
 @patch("src.builder.BuilderTest._append_tests_to_tree")
 @patch("src.builder.User.add_test")
@@ -199,6 +284,7 @@ class TestAddTest:
         mock_add_test: Mock,
         mock_append_tests_to_tree: Mock,
         mock_test__init__: Mock,
+        mock_commands: Mock,
     ) -> None:
         errors: list[Union[str, int]] = []
 
@@ -215,6 +301,8 @@ class TestAddTest:
 
         class_ = Test("", "", None, [], None)
         class_._command = "0"
+        class_._name = "Тест"
+        class_._questions = []
 
         def _mock_initialize_test(
             initialized_tests: list[tuple[int, int, Test]],
@@ -228,16 +316,132 @@ class TestAddTest:
         mock_read_file.side_effect = _mock_read_file
         mock_initialize_test.side_effect = _mock_initialize_test
 
-        BuilderTest()._add_test(1, 2, "path", errors)
+        with patch("src.builder.BuilderTest._publish", return_value=2) as mock_publish:
+            assert BuilderTest()._add_test(1, "staging/test.json", errors) == 2
 
-        mock_validate.assert_called_once_with('{"command": "/test_test"}', errors)
-        mock_add_test.assert_called_once_with(1, 2, "0")
+        mock_validate.assert_called_once_with('{"command": "/test_test"}', errors, True)
+        mock_publish.assert_called_once_with("staging", 1, errors)
+        mock_commands.reserve.assert_called_once_with("0", 1, errors)
+        mock_commands.commit.assert_called_once_with(
+            "0", mock_commands.reserve.return_value
+        )
+        mock_add_test.assert_called_once_with(1, 2, "0", "Тест")
         mock_calls = mock_append_tests_to_tree.mock_calls[0].args[0][0]
 
         assert mock_calls[0] == 1
         assert mock_calls[1] == 2
         assert mock_calls[2] is class_
 
+    def test_command_taken_by_another_process(
+        self,
+        mock__init__: Mock,
+        mock_read_file: Mock,
+        mock_validate: Mock,
+        mock_initialize_test: Mock,
+        mock_add_test: Mock,
+        mock_append_tests_to_tree: Mock,
+        mock_test__init__: Mock,
+        mock_commands: Mock,
+    ) -> None:
+        errors: list[Union[str, int]] = []
+        class_ = Test("", "", None, [], None)
+        class_._command = "/test_test"
+        class_._questions = []
+        mock_read_file.side_effect = lambda content, *args, **kwargs: content.append(
+            (1, 0, {})
+        )
+        mock_initialize_test.side_effect = lambda tests, *args: tests.append(
+            (1, 0, class_)
+        )
+
+        mock_commands.reserve.side_effect = BotParseException(errors, "")
+        with patch("src.builder.BuilderTest._publish") as mock_publish:
+            with pytest.raises(BotParseException):
+                BuilderTest()._add_test(1, "staging/test.json", errors)
+        mock_publish.assert_not_called()
+
+        mock_commands.reserve.side_effect = None
+        with patch("src.builder.BuilderTest._publish", side_effect=OSError):
+            with pytest.raises(OSError):
+                BuilderTest()._add_test(1, "staging/test.json", errors)
+        mock_commands.release.assert_called_once_with(
+            "/test_test", mock_commands.reserve.return_value
+        )
+
+        # Резервирование истекло, и команду занял другой процесс
+        mock_commands.commit.return_value = False
+        with patch("src.builder.BuilderTest._publish", return_value=2):
+            with patch("src.builder.Reclaimer") as mock_reclaimer:
+                with pytest.raises(BotParseException):
+                    BuilderTest()._add_test(1, "staging/test.json", errors)
+        mock_reclaimer.delete.assert_called_once_with(1, 2)
+        mock_add_test.assert_not_called()
+        mock_append_tests_to_tree.assert_not_called()
+
+
+@patch("src.builder.Versions")
+@patch("src.builder.User.add_test")
+@patch(
+    "src.builder.User.find_test",
+    side_effect=lambda from_user_id, command: 2 if command == "/test_test" else None,
+)
+@patch("src.builder.BuilderTest.__init__", return_value=None)
+class TestUpdateTest:
+    def test_update_test(
+        self,
+        mock__init__: Mock,
+        mock_find_test: Mock,
+        mock_add_test: Mock,
+        mock_versions: Mock,
+        tmp_path: Path,
+        patch_singleton: Config,
+    ) -> None:
+        content = {
+            "command": "/test_test",
+            "name": "Тест",
+            "questions": [
+                {"body": "2 + 2", "widget": {"type": "input"}, "answer": "4"}
+            ],
+        }
+        directory = tmp_path / "1" / "2"
+        directory.mkdir(parents=True)
+        (directory / "old.json").write_text(json.dumps(content), encoding="utf-8")
+        previous = BuilderTest().build_test(1, 2, content, [])
+        CommandsTestTree().append(Node(key=previous))
+
+        content["name"] = "Новый тест"
+        staging = tmp_path / "staging"
+        staging.mkdir()
+        (staging / "new.json").write_text(json.dumps(content), encoding="utf-8")
+        with patch("src.builder.PATH_OF_DATA", str(tmp_path)):
+            assert BuilderTest()._update_test(1, str(staging / "new.json"), []) == 2
+
+        assert os.listdir(directory) == ["old.json"]
+        assert json.loads((directory / "old.json").read_text())["name"] == "Новый тест"
+        found = CommandsTestTree().search(Node(previous))
+        assert found is not None and found.key.name == "Новый тест"
+        assert found.key.version != previous.version
+        mock_versions.retire.assert_called_once_with(previous)
+        mock_find_test.assert_called_once_with(1, "/test_test")
+        mock_add_test.assert_called_once_with(1, 2, "/test_test", "Новый тест")
+
+    def test_not_owner(
+        self,
+        mock__init__: Mock,
+        mock_find_test: Mock,
+        mock_add_test: Mock,
+        mock_versions: Mock,
+        tmp_path: Path,
+    ) -> None:
+        path = tmp_path / "test.json"
+        path.write_text(json.dumps({"command": "/test_other"}), encoding="utf-8")
+        errors: list[Union[str, int]] = []
+
+        with pytest.raises(BotParseException):
+            BuilderTest()._update_test(1, str(path), errors)
+        assert errors == ["Вы не являетесь владельцем теста с такой командой."]
+        mock_add_test.assert_not_called()
+
 
 class TestFindTests:
     @patch("src.builder.BuilderTest.__init__")
@@ -257,12 +461,16 @@ class TestFindTests:
         ]
 
 
-@patch("src.builder.Test.__init__", return_value=None)
-@patch("src.builder.User.add_test")
+def _test(command: str) -> Test:
+    return Test(command, "", None, [], None)
+
+
+@patch("src.builder.Commands")
+@patch("src.builder.User")
+@patch("src.builder.BuilderTest._quarantine")
 @patch("src.builder.BuilderTest._find_tests")
 @patch("src.builder.BuilderTest._append_tests_to_tree")
-@patch("src.builder.BuilderTest._initialize_test")
-@patch("src.builder.BuilderTest._read_file")
+@patch("src.builder.BuilderTest._load_test")
 @patch("src.builder.BuilderTest.__init__", return_value=None)
 @patch("src.builder.cpu_count")
 class TestCreateTestsFromFiles:
@@ -270,101 +478,177 @@ class TestCreateTestsFromFiles:
         self,
         mock_cpu_count: Mock,
         mock__init__: Mock,
-        mock_read_file: Mock,
-        mock_initialize_test: Mock,
+        mock_load_test: Mock,
         mock_append_tests_to_tree: Mock,
         mock_find_tests: Mock,
-        mock_add_test: Mock,
-        mock_test__init__: Mock,
+        mock_quarantine: Mock,
+        mock_user: Mock,
+        mock_commands: Mock,
     ) -> None:
+        mock_commands.register.return_value = []
         mock_cpu_count.return_value = 1
-        mock_find_tests.return_value = [(1, 2, PATH_OF_DATA + "/1/1/test.json")]
-
-        def _mock_read_file(
-            content: list[tuple[int, int, str]],
-            errors: list[Union[str, int]],
-            from_user_id: int,
-            number: int,
-            file_name: str,
-            is_raised: bool = False,
-        ) -> None:
-            content.append((from_user_id, number, '{"command": "/test_test"}'))
-            return
-
-        class_ = Test("", "", None, [], None)
-        class_._command = "0"
-
-        def _mock_initialize_test(
-            initialized_tests: list[tuple[int, int, Test]],
-            from_user_id: int,
-            number: int,
-            file_content: dict[str, Any],
-        ) -> None:
-            initialized_tests.append((from_user_id, number, class_))
-            return
-
-        mock_read_file.side_effect = _mock_read_file
-        mock_initialize_test.side_effect = _mock_initialize_test
+        mock_find_tests.return_value = [(1, 2, PATH_OF_DATA + "/1/2/test.json")]
+        test = _test("/test_test")
+        mock_load_test.return_value = (1, 2, "path", test, None)
 
         BuilderTest()._create_tests_from_files()
 
-        mock_add_test.assert_called_once_with(1, 2, "0")
-        mock_append_tests_to_tree.assert_called_once_with([(1, 2, class_)])
+        mock_load_test.assert_called_once_with(1, 2, PATH_OF_DATA + "/1/2/test.json")
+        assert list(mock_user.add_tests.call_args.args[0]) == [(1, 2, "/test_test", "")]
+        assert list(mock_commands.register.call_args.args[0]) == [("/test_test", 1)]
+        mock_append_tests_to_tree.assert_called_once_with([(1, 2, test)])
+        mock_quarantine.assert_not_called()
 
-    @patch("src.builder.Manager")
     @patch("src.builder.Pool")
     def test_if_cpu_count_greater_than_one(
         self,
         mock_pool: Mock,
-        mock_manager: Mock,
         mock_cpu_count: Mock,
         mock__init__: Mock,
-        mock_read_file: Mock,
-        mock_initialize_test: Mock,
+        mock_load_test: Mock,
         mock_append_tests_to_tree: Mock,
         mock_find_tests: Mock,
-        mock_add_test: Mock,
-        mock_test__init__: Mock,
+        mock_quarantine: Mock,
+        mock_user: Mock,
+        mock_commands: Mock,
     ) -> None:
-        mock_cpu_count.return_value = 2
-        mock_find_tests.return_value = [(1, 2, PATH_OF_DATA + "/1/1/test.json")]
-        mock_manager.return_value.__enter__.return_value.list.side_effect = [[], []]
+        mock_commands.register.return_value = []
+        mock_cpu_count.return_value = 3
+        mock_find_tests.return_value = [(1, 2, PATH_OF_DATA + "/1/2/test.json")]
+        test = _test("/test_test")
+        mock_pool.return_value.__enter__.return_value.starmap.side_effect = (
+            lambda func, iterable: [(1, 2, "path", test, None) for _ in iterable]
+        )
 
-        def mock_pool_map(func: Callable[[], Any], iterable: Iterable[Any]) -> None:
-            for element in iterable:
-                func(*element)
+        BuilderTest()._create_tests_from_files()
 
-        class_ = Test("", "", None, [], None)
-        class_._command = "0"
+        mock_pool.assert_called_once_with(2)
+        assert list(mock_user.add_tests.call_args.args[0]) == [(1, 2, "/test_test", "")]
+        mock_append_tests_to_tree.assert_called_once_with([(1, 2, test)])
 
-        def _mock_read_file(
-            content: list[tuple[int, int, str]],
-            errors: list[Union[str, int]],
-            from_user_id: int,
-            number: int,
-            file_name: str,
-            is_raised: bool = False,
-        ) -> None:
-            content.append((from_user_id, number, '{"command": "/test_test"}'))
-            return
+    def test_invalid_tests_are_quarantined(
+        self,
+        mock_cpu_count: Mock,
+        mock__init__: Mock,
+        mock_load_test: Mock,
+        mock_append_tests_to_tree: Mock,
+        mock_find_tests: Mock,
+        mock_quarantine: Mock,
+        mock_user: Mock,
+        mock_commands: Mock,
+    ) -> None:
+        mock_commands.register.return_value = []
+        mock_cpu_count.return_value = 1
+        mock_find_tests.return_value = [(2, 1, "b"), (1, 3, "c"), (1, 1, "a")]
+        first, second = _test("/test_a"), _test("/test_a")
+        mock_load_test.side_effect = [
+            (2, 1, "b", second, None),
+            (1, 3, "c", None, "KeyError: 'questions'"),
+            (1, 1, "a", first, None),
+        ]
+        mock_user.get_test_by_number.side_effect = lambda from_user_id, number: {
+            (1, 1): "/test_a",
+            (1, 3): "/test_c",
+            (2, 1): "/test_a",
+        }.get((from_user_id, number))
 
-        def _mock_initialize_test(
-            initialized_tests: list[tuple[int, int, object]],
-            from_user_id: int,
-            number: int,
-            file_content: dict[str, Any],
-        ) -> None:
-            initialized_tests.append((from_user_id, number, class_))
-            return
+        BuilderTest()._create_tests_from_files()
 
-        mock_read_file.side_effect = _mock_read_file
-        mock_initialize_test.side_effect = _mock_initialize_test
+        assert mock_quarantine.mock_calls == [
+            call(1, 3, "c", "KeyError: 'questions'"),
+            call(2, 1, "b", "Тест с такой командой уже существует."),
+        ]
+        mock_user.delete_test.assert_called_once_with(1, "/test_c")
+        mock_commands.release.assert_called_once_with("/test_c")
+        assert list(mock_user.add_tests.call_args.args[0]) == [(1, 1, "/test_a", "")]
+        mock_append_tests_to_tree.assert_called_once_with([(1, 1, first)])
 
-        mock_pool.return_value.__enter__.return_value.starmap = mock_pool_map
+    def test_registered_commands_are_quarantined(
+        self,
+        mock_cpu_count: Mock,
+        mock__init__: Mock,
+        mock_load_test: Mock,
+        mock_append_tests_to_tree: Mock,
+        mock_find_tests: Mock,
+        mock_quarantine: Mock,
+        mock_user: Mock,
+        mock_commands: Mock,
+    ) -> None:
+        mock_cpu_count.return_value = 1
+        mock_find_tests.return_value = [(1, 1, "a"), (1, 2, "b")]
+        first, second = _test("/test_a"), _test("/test_b")
+        mock_load_test.side_effect = [
+            (1, 1, "a", first, None),
+            (1, 2, "b", second, None),
+        ]
+        # Команду /test_b другой процесс зарегистрировал за другим автором
+        mock_commands.register.side_effect = lambda tests: [
+            command for command, _ in tests if command == "/test_b"
+        ]
+        mock_user.get_test_by_number.return_value = "/test_b"
 
         BuilderTest()._create_tests_from_files()
-        mock_add_test.assert_called_once_with(1, 2, "0")
-        mock_append_tests_to_tree.assert_called_once_with([(1, 2, class_)])
+
+        mock_quarantine.assert_called_once_with(
+            1, 2, "b", "Тест с такой командой уже существует."
+        )
+        mock_user.delete_test.assert_called_once_with(1, "/test_b")
+        mock_commands.release.assert_not_called()
+        assert list(mock_user.add_tests.call_args.args[0]) == [(1, 1, "/test_a", "")]
+        mock_append_tests_to_tree.assert_called_once_with([(1, 1, first)])
+
+
+@patch("src.builder.BuilderTest.__init__", return_value=None)
+class TestLoadTest:
+    def test_load_test(
+        self, mock__init__: Mock, tmp_path: Path, patch_singleton: Config
+    ) -> None:
+        path = tmp_path / "test.json"
+        content = {
+            "command": "/test_test",
+            "name": "Тест",
+            "questions": [
+                {"body": "2 + 2", "widget": {"type": "input"}, "answer": "4"}
+            ],
+        }
+        path.write_text(json.dumps(content), encoding="utf-8")
+        from_user_id, number, file_name, test, error = BuilderTest()._load_test(
+            1, 2, str(path)
+        )
+        assert (from_user_id, number, file_name, error) == (1, 2, str(path), None)
+        assert test is not None and test.command == "/test_test"
+
+        del content["name"]
+        path.write_text(json.dumps(content), encoding="utf-8")
+        assert BuilderTest()._load_test(1, 2, str(path))[3:] == (
+            None,
+            "Название теста должно быть непустой строкой.",
+        )
+
+        path.write_text("[]", encoding="utf-8")
+        assert BuilderTest()._load_test(1, 2, str(path))[3:] == (
+            None,
+            "AttributeError: 'list' object has no attribute 'get'",
+        )
+
+    def test_quarantine(self, mock__init__: Mock, tmp_path: Path) -> None:
+        directory = tmp_path / "1" / "2"
+        directory.mkdir(parents=True)
+        (directory / "test.json").write_text("{", encoding="utf-8")
+
+        with patch("src.builder.PATH_OF_DATA", str(tmp_path)), patch(
+            "src.builder.time.time_ns", return_value=5
+        ):
+            BuilderTest._quarantine(1, 2, str(directory / "test.json"), "error")
+
+        assert not directory.exists()
+        quarantine = tmp_path / ".quarantine"
+        assert (quarantine / "1-2-5" / "test.json").read_text() == "{"
+        report = json.loads((quarantine / "1-2-5.json").read_text())
+        assert report["user_id"] == 1
+        assert report["number"] == 2
+        assert report["file"] == "test.json"
+        assert report["error"] == "error"
 
 
 @patch("src.builder.open")
@@ -505,6 +789,7 @@ class TestValidate:
             file_content["description"],
             file_content["questions"],
             file_content["result_explanation"],
+            True,
         )
 
 
@@ -0,0 +1,165 @@
+from pathlib import Path
+from typing import Generator, cast
+from unittest.mock import patch
+
+import pytest
+from fakeredis import FakeStrictRedis
+from pytest import Config
+
+from src.catalog import (
+    CATALOG_DIRECTORY,
+    Catalog,
+    RedisCatalog,
+    SQLiteCatalog,
+    create_catalog,
+)
+from src.redis_client import Redis
+from src.user import _User
+
+
+@pytest.fixture(params=["redis", "sqlite"])
+def catalog(request: pytest.FixtureRequest) -> Generator[Catalog, None, None]:
+    if cast(str, getattr(request, "param")) == "redis":
+        client: Redis = FakeStrictRedis(decode_responses=True)
+        yield RedisCatalog(lambda: client)
+    else:
+        catalog = SQLiteCatalog(":memory:")
+        yield catalog
+        catalog.close()
+
+
+class TestCatalog:
+    def test_add_delete(self, catalog: Catalog) -> None:
+        catalog.add_tests([(1, 2, "/test_b", "Б"), (1, 1, "/test_a", "А")])
+        catalog.add_tests([(2, 1, "/test_c", "В"), (1, 2, "/test_b", "Б")])
+
+        assert catalog.get_tests_with_numbers(1) == [
+            {"1": "/test_a"},
+            {"2": "/test_b"},
+        ]
+        assert catalog.get_tests(1) == ["/test_a", "/test_b"]
+        assert catalog.get_tests(2) == ["/test_c"]
+        assert catalog.count_tests(1) == 2
+
+        catalog.delete_test(1, "/test_a")
+        # Удаляется тест только своего автора
+        catalog.delete_test(1, "/test_c")
+        assert catalog.get_tests(1) == ["/test_b"]
+        assert catalog.get_tests(2) == ["/test_c"]
+        assert catalog.count_tests(1) == 1
+        assert catalog.get_tests(3) == []
+        assert catalog.count_tests(3) == 0
+
+    def test_find(self, catalog: Catalog) -> None:
+        catalog.add_tests([(1, 3, "/test_a", "А")])
+
+        assert catalog.find_test(1, "/test_a") == 3
+        assert catalog.find_test(2, "/test_a") is None
+        assert catalog.find_test(1, "/test_b") is None
+        assert catalog.get_command(1, 3) == "/test_a"
+        assert catalog.get_command(1, 1) is None
+        assert catalog.get_command(2, 3) is None
+
+        catalog.delete_test(1, "/test_a")
+        assert catalog.get_command(1, 3) is None
+
+
+class TestRedisCatalog:
+    def test_get_command_without_numbers(self) -> None:
+        client: Redis = FakeStrictRedis(decode_responses=True)
+        catalog = RedisCatalog(lambda: client)
+        # Тесты, добавленные до появления хеша номеров
+        client.hset("1:/test_a", mapping={"3": "/test_a"})
+        client.hset("1:/test_b", mapping={"4": "/test_b"})
+        client.lpush("1_tests", "1:/test_a", "1:/test_b")
+
+        assert catalog.get_command(1, 4) == "/test_b"
+        assert client.hgetall("1:numbers") == {"3": "/test_a", "4": "/test_b"}
+        assert catalog.get_command(1, 5) is None
+        assert catalog.get_command(2, 3) is None
+
+    def test_add_without_numbers(self) -> None:
+        client: Redis = FakeStrictRedis(decode_responses=True)
+        catalog = RedisCatalog(lambda: client)
+        client.hset("1:/test_a", mapping={"1": "/test_a"})
+        client.lpush("1_tests", "1:/test_a")
+
+        catalog.add_tests([(1, 2, "/test_b", "Б")])
+
+        assert catalog.get_command(1, 1) == "/test_a"
+        assert catalog.get_command(1, 2) == "/test_b"
+        assert client.hgetall("1:numbers") == {"1": "/test_a", "2": "/test_b"}
+
+
+class TestSQLiteCatalog:
+    def test_persistent(self, tmp_path: Path) -> None:
+        path = str(tmp_path / "catalog" / "catalog.sqlite3")
+        catalog = SQLiteCatalog(path)
+        catalog.add_tests([(1, 1, "/test_a", "Тест")])
+        catalog.close()
+
+        catalog = SQLiteCatalog(path)
+        assert catalog.get_tests_with_numbers(1) == [{"1": "/test_a"}]
+        catalog.close()
+
+    def test_update(self) -> None:
+        catalog = SQLiteCatalog(":memory:")
+        catalog.add_tests([(1, 1, "/test_a", "Тест")])
+        catalog.add_tests([(1, 2, "/test_a", "Новый тест")])
+
+        assert catalog.get_tests_with_numbers(1) == [{"2": "/test_a"}]
+        assert catalog._connection.execute("SELECT name FROM tests").fetchall() == [
+            ("Новый тест",)
+        ]
+
+        # Тест другого автора с той же командой не перезаписывается
+        catalog.add_tests([(2, 1, "/test_a", "Чужой тест")])
+        assert catalog.get_tests(2) == []
+        assert catalog.get_tests_with_numbers(1) == [{"2": "/test_a"}]
+
+    def test_indexed_queries(self) -> None:
+        catalog = SQLiteCatalog(":memory:")
+        for query, parameters in [
+            ("SELECT number FROM tests WHERE command = ? AND user_id = ?", ("", 1)),
+            ("SELECT command FROM tests WHERE user_id = ? AND number = ?", (1, 1)),
+            ("SELECT count(*) FROM tests WHERE user_id = ?", (1,)),
+            ("SELECT command FROM tests WHERE name = ?", ("",)),
+            ("SELECT command FROM tests ORDER BY created", ()),
+        ]:
+            plan = catalog._connection.execute(
+                "EXPLAIN QUERY PLAN " + query, parameters
+            ).fetchall()
+            assert all("SCAN tests" != row[-1] for row in plan), query
+
+
+class TestCreateCatalog:
+    def test_backends(self, tmp_path: Path) -> None:
+        client: Redis = FakeStrictRedis()
+        with patch.dict("src.catalog.CATALOG_SETTINGS", {"backend": "redis"}):
+            assert isinstance(create_catalog(lambda: client), RedisCatalog)
+
+        with patch.dict(
+            "src.catalog.CATALOG_SETTINGS", {"backend": "sqlite", "path": None}
+        ), patch("src.catalog.PATH_OF_DATA", str(tmp_path)):
+            catalog = create_catalog(lambda: client)
+            assert isinstance(catalog, SQLiteCatalog)
+            catalog.close()
+        assert (tmp_path / CATALOG_DIRECTORY / "catalog.sqlite3").exists()
+
+        with patch.dict("src.catalog.CATALOG_SETTINGS", {"backend": "unknown"}):
+            with pytest.raises(ValueError):
+                create_catalog(lambda: client)
+
+    @patch.dict(
+        "src.catalog.CATALOG_SETTINGS", {"backend": "sqlite", "path": ":memory:"}
+    )
+    @patch("src.user.InstrumentedRedis", FakeStrictRedis)
+    def test_user(self, patch_singleton: Config) -> None:
+        User = _User()
+        User.add_test(123, 2, "/test_test", "Тест")
+
+        assert isinstance(User.catalog, SQLiteCatalog)
+        assert User.get_tests(123) == ["/test_test"]
+        assert User.find_test(123, "/test_test") == 2
+        assert User.get_test_by_number(123, 2) == "/test_test"
+        assert User.redis_.keys() == []
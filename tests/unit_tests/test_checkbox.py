@@ -0,0 +1,112 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from telegram.error import BadRequest
+
+from src.checkbox import _Checkboxes, create_markup, get_checked, parse_callback_data
+
+
+def create_query(data: str, mask: int = 0) -> Mock:
+    query = Mock()
+    query.data = data
+    query.message.chat_id = 1
+    query.message.message_id = 2
+    query.message.reply_markup = create_markup(["1", "2", "3", "4", "5"], mask)
+    query.edit_message_reply_markup = AsyncMock()
+    return query
+
+
+class TestMarkup:
+    def test_create_markup(self) -> None:
+        markup = create_markup(["1", "2", "3", "4", "5"], 0b10010)
+
+        assert [[button.text for button in row] for row in markup.inline_keyboard] == [
+            ["1", "2✅"],
+            ["3", "4"],
+            ["5✅"],
+            ["Ответить"],
+        ]
+        assert [
+            [button.callback_data for button in row] for row in markup.inline_keyboard
+        ] == [["18:0", "18:1"], ["18:2", "18:3"], ["18:4"], ["18:"]]
+
+    @pytest.mark.parametrize(
+        ("data", "result"),
+        [("0:3", (0, 3)), ("5:", (5, None)), ("12:0", (12, 0))],
+    )
+    def test_parse_callback_data(
+        self, data: str, result: tuple[int, int | None]
+    ) -> None:
+        assert parse_callback_data(data) == result
+
+    @pytest.mark.parametrize("data", ["1", "Ответить", "a:1"])
+    def test_parse_wrong_callback_data(self, data: str) -> None:
+        with pytest.raises(ValueError):
+            parse_callback_data(data)
+
+    @pytest.mark.parametrize(
+        ("mask", "checked"),
+        [(0, []), (0b1, [1]), (0b101, [1, 3]), (0b110000, [5, 6])],
+    )
+    def test_get_checked(self, mask: int, checked: list[int]) -> None:
+        assert get_checked(mask) == checked
+
+
+@patch("src.checkbox.CHECKBOX_DEBOUNCE", 0.01)
+@pytest.mark.asyncio
+class TestCheckboxes:
+    async def test_toggles_are_coalesced(self) -> None:
+        checkboxes = _Checkboxes()
+        first_query = create_query("0:0")
+        await checkboxes.toggle(first_query)
+        await checkboxes.toggle(create_query("0:2"))
+        await checkboxes.toggle(create_query("0:4"))
+        await asyncio.sleep(0.05)
+
+        first_query.edit_message_reply_markup.assert_awaited_once()
+        markup = first_query.edit_message_reply_markup.call_args.kwargs["reply_markup"]
+        assert [[button.text for button in row] for row in markup.inline_keyboard] == [
+            ["1✅", "2"],
+            ["3✅", "4"],
+            ["5✅"],
+            ["Ответить"],
+        ]
+        assert checkboxes.submit(create_query("0:")) == [1, 3, 5]
+
+    async def test_unchanged_state_is_not_edited(self) -> None:
+        checkboxes = _Checkboxes()
+        query = create_query("1:1", mask=1)
+        await checkboxes.toggle(query)
+        await checkboxes.toggle(create_query("1:1", mask=1))
+        await asyncio.sleep(0.05)
+
+        query.edit_message_reply_markup.assert_not_awaited()
+        assert checkboxes.submit(create_query("1:", mask=1)) == [1]
+
+    async def test_submit_before_edit(self) -> None:
+        checkboxes = _Checkboxes()
+        query = create_query("2:0", mask=2)
+        await checkboxes.toggle(query)
+
+        assert checkboxes.submit(create_query("2:", mask=2)) == [1, 2]
+        await asyncio.sleep(0.05)
+        query.edit_message_reply_markup.assert_not_awaited()
+
+    async def test_submit_from_callback_data(self) -> None:
+        assert _Checkboxes().submit(create_query("6:", mask=6)) == [2, 3]
+
+    async def test_failed_edit_is_logged(self) -> None:
+        checkboxes = _Checkboxes()
+        query = create_query("0:0")
+        query.edit_message_reply_markup.side_effect = BadRequest("Message not found")
+        with patch("src.checkbox.logger") as mock_logger:
+            await checkboxes.toggle(query)
+            await asyncio.sleep(0.05)
+
+        mock_logger.warning.assert_called_once()
+        # Следующее нажатие снова изменяет клавиатуру
+        next_query = create_query("0:2")
+        await checkboxes.toggle(next_query)
+        await asyncio.sleep(0.05)
+        next_query.edit_message_reply_markup.assert_awaited_once()
@@ -0,0 +1,73 @@
+from typing import Union
+from unittest.mock import Mock, patch
+
+import pytest
+from fakeredis import FakeStrictRedis
+
+from src.commands import RESERVATION_TTL, Commands
+from src.constants import REDIS_SETTINGS
+from src.errors import BotParseException
+
+
+@pytest.fixture
+def redis_() -> FakeStrictRedis:
+    redis_ = FakeStrictRedis(**REDIS_SETTINGS)
+    with patch("src.commands.User", Mock(redis_=redis_)):
+        yield redis_
+
+
+class TestCommands:
+    def test_reserve_commit(self, redis_: FakeStrictRedis) -> None:
+        errors: list[Union[str, int]] = []
+        token = Commands.reserve("/test_test", 1, errors)
+        assert redis_.get("command:/test_test") == token
+        assert 0 < redis_.ttl("command:/test_test") <= RESERVATION_TTL
+
+        with pytest.raises(BotParseException):
+            Commands.reserve("/test_test", 2, errors)
+        assert errors == ["Тест с такой командой уже существует."]
+
+        assert Commands.commit("/test_test", token)
+        assert redis_.get("command:/test_test") == "1"
+        assert redis_.ttl("command:/test_test") == -1
+
+    def test_release(self, redis_: FakeStrictRedis) -> None:
+        token = Commands.reserve("/test_test", 1, [])
+        Commands.release("/test_test", token)
+        other = Commands.reserve("/test_test", 2, [])
+
+        # Метка уже не принадлежит первому резервированию
+        Commands.release("/test_test", token)
+        assert not Commands.commit("/test_test", token)
+        assert redis_.get("command:/test_test") == other
+
+        Commands.release("/test_test")
+        assert redis_.exists("command:/test_test") == 0
+
+    def test_commit_expired_reservation(self, redis_: FakeStrictRedis) -> None:
+        token = Commands.reserve("/test_test", 1, [])
+        redis_.delete("command:/test_test")
+
+        assert Commands.commit("/test_test", token)
+        assert redis_.get("command:/test_test") == "1"
+
+    def test_register(self, redis_: FakeStrictRedis) -> None:
+        assert Commands.register([("/test_a", 1), ("/test_b", 2)]) == []
+
+        assert redis_.mget("command:/test_a", "command:/test_b") == ["1", "2"]
+        with pytest.raises(BotParseException):
+            Commands.reserve("/test_a", 3, [])
+
+    def test_register_keeps_other_owners(self, redis_: FakeStrictRedis) -> None:
+        Commands.register([("/test_a", 1)])
+        token = Commands.reserve("/test_b", 2, [])
+        own = Commands.reserve("/test_c", 3, [])
+
+        conflicts = Commands.register([("/test_a", 4), ("/test_b", 5), ("/test_c", 3)])
+
+        assert conflicts == ["/test_a", "/test_b"]
+        assert redis_.mget("command:/test_a", "command:/test_b", "command:/test_c") == [
+            "1",
+            token,
+            own,
+        ]
@@ -0,0 +1,87 @@
+import gc
+
+import pytest
+from telegram import ReplyKeyboardMarkup
+
+from src.interning import _QuestionPool, get_markup, intern_string, intern_widget
+from src.question import Question
+from src.test import Test
+
+
+def _question(answer: str) -> Question:
+    return Question(
+        {"text": "2 + 2", "url": "https://example.com/image.png"},
+        {"type": "button", "body": ["3", "4"]},
+        answer,
+        None,
+    )
+
+
+class TestQuestionPool:
+    def test_intern(self) -> None:
+        pool = _QuestionPool()
+        first = pool.intern(Test("/test_a", "", None, [_question("4")], None))
+        second = pool.intern(
+            Test("/test_b", "", None, [_question("3"), _question("4")], None)
+        )
+
+        assert second.questions[1] is first.questions[0]
+        assert second.questions[0] is not first.questions[0]
+        assert len(pool) == 2
+
+    def test_unused_questions_are_released(self) -> None:
+        pool = _QuestionPool()
+        test = pool.intern(Test("/test_a", "", None, [_question("4")], None))
+        assert len(pool) == 1
+
+        del test
+        gc.collect()
+        assert len(pool) == 0
+
+
+class TestInternStrings:
+    def test_intern_string(self) -> None:
+        # Строки, собранные во время выполнения, - разные объекты
+        first = "".join(["Д", "а"])
+        second = "".join(["Д", "а"])
+        assert first is not second
+
+        assert intern_string(first) is intern_string(second)
+        assert intern_string(4) == 4
+        assert intern_string(None) is None
+
+    def test_intern_widget(self) -> None:
+        widget = {"type": "button", "body": ["".join(["Д", "а"]), "Нет"]}
+
+        interned = intern_widget(widget)
+
+        assert interned == widget
+        assert interned is not None
+        assert interned["body"][0] is intern_string("".join(["Д", "а"]))
+        assert intern_widget(None) is None
+
+
+class TestGetMarkup:
+    @pytest.mark.parametrize("widget_type", ["button", "checkbox"])
+    def test_shared(self, widget_type: str) -> None:
+        first = Question(
+            "Первый", {"type": widget_type, "body": ["Да", "Нет"]}, 1, None
+        )
+        second = Question(
+            "Второй", {"type": widget_type, "body": ["Да", "Нет"]}, 2, None
+        )
+
+        assert first.markup is not None
+        assert first.markup is second.markup
+        assert get_markup(widget_type, ("Нет", "Да")) is not first.markup
+
+    def test_buttons_are_shared(self) -> None:
+        first = get_markup("button", ("Да", "Нет"))
+        second = get_markup("button", ("Да", "Нет", "Не знаю"))
+
+        assert isinstance(first, ReplyKeyboardMarkup)
+        assert isinstance(second, ReplyKeyboardMarkup)
+        assert first.keyboard[0][0] is second.keyboard[0][0]
+
+    def test_input(self) -> None:
+        assert get_markup("input", ()) is None
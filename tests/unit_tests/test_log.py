@@ -0,0 +1,59 @@
+import json
+import logging
+import queue
+from unittest.mock import patch
+
+from src.log import JsonFormatter, JsonQueueHandler, RateLimitFilter
+
+
+def create_record(message: str = "update", **extra: object) -> logging.LogRecord:
+    record = logging.LogRecord("bot.updates", logging.INFO, "", 0, message, (), None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+class TestJsonFormatter:
+    def test_format(self) -> None:
+        record = create_record(user_id=1, command="/start", latency=0.5)
+        data = json.loads(JsonFormatter().format(record))
+
+        assert data["level"] == "INFO"
+        assert data["logger"] == "bot.updates"
+        assert data["message"] == "update"
+        assert data["user_id"] == 1
+        assert data["command"] == "/start"
+        assert data["latency"] == 0.5
+        assert "state" not in data
+
+    def test_format_exception(self) -> None:
+        records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        logger = logging.getLogger("test.exception")
+        logger.propagate = False
+        logger.addHandler(JsonQueueHandler(records))
+        try:
+            raise ValueError("wrong")
+        except ValueError:
+            logger.exception("failed %s", 1)
+
+        data = json.loads(JsonFormatter().format(records.get_nowait()))
+        assert data["message"] == "failed 1"
+        assert "Traceback" in data["exception"]
+        assert data["exception"].endswith("ValueError: wrong")
+
+
+class TestRateLimitFilter:
+    @patch("src.log.time.monotonic")
+    def test_filter(self, mock_monotonic: object) -> None:
+        mock_monotonic.return_value = 0.0  # type: ignore
+        rate_limit = RateLimitFilter(2)
+
+        assert rate_limit.filter(create_record())
+        assert rate_limit.filter(create_record())
+        assert not rate_limit.filter(create_record())
+        assert not rate_limit.filter(create_record())
+
+        mock_monotonic.return_value = 1.0  # type: ignore
+        record = create_record()
+        assert rate_limit.filter(record)
+        assert record.msg == "update (dropped: 2)"
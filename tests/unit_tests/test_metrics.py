@@ -0,0 +1,80 @@
+import pytest
+
+from src.metrics import (
+    REDIS_COMMANDS_PER_UPDATE,
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+    count_redis_commands,
+    track_update,
+)
+
+
+class TestMetrics:
+    def test_counter(self) -> None:
+        counter = Counter("requests_total", "Количество запросов.", ("method",))
+        counter.inc(method="sendMessage")
+        counter.inc(2, method="sendMessage")
+        counter.inc(method='say "hi"')
+
+        assert counter.get(method="sendMessage") == 3
+        assert counter.expose() == (
+            "# HELP requests_total Количество запросов.\n"
+            "# TYPE requests_total counter\n"
+            'requests_total{method="sendMessage"} 3.0\n'
+            'requests_total{method="say \\"hi\\""} 1.0'
+        )
+
+    def test_wrong_labels(self) -> None:
+        counter = Counter("requests_total", "Количество запросов.", ("method",))
+        with pytest.raises(ValueError):
+            counter.inc(command="/start")
+
+    def test_gauge(self) -> None:
+        gauge = Gauge("tree_size", "Размер дерева.")
+        gauge.set(3)
+        assert gauge.get() == 3
+
+        gauge.set_function(lambda: 5)
+        assert gauge.expose().endswith("tree_size 5.0")
+
+    def test_histogram(self) -> None:
+        histogram = Histogram("latency", "Время.", buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        assert histogram.get_count() == 3
+        assert histogram.get_sum() == 5.55
+        assert histogram.expose().split("\n")[2:] == [
+            'latency_bucket{le="0.1"} 1.0',
+            'latency_bucket{le="1.0"} 2.0',
+            'latency_bucket{le="+Inf"} 3.0',
+            "latency_sum 5.55",
+            "latency_count 3.0",
+        ]
+
+    def test_registry(self) -> None:
+        registry = Registry()
+        registry.register(Gauge("first", "Первая."))
+        registry.register(Gauge("second", "Вторая."))
+
+        exposition = registry.expose()
+        assert "# TYPE first gauge\nfirst 0.0\n" in exposition
+        assert exposition.endswith("second 0.0\n")
+
+
+class TestTrackUpdate:
+    def test_track_update(self) -> None:
+        count = REDIS_COMMANDS_PER_UPDATE.get_count()
+        total = REDIS_COMMANDS_PER_UPDATE.get_sum()
+
+        with track_update("/start") as labels:
+            count_redis_commands(["HGETALL"])
+            count_redis_commands(["HSET", "EXPIRE"])
+            labels["command"] = "/create"
+        count_redis_commands(["HGETALL"])
+
+        assert REDIS_COMMANDS_PER_UPDATE.get_count() == count + 1
+        assert REDIS_COMMANDS_PER_UPDATE.get_sum() == total + 3
@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.profiler import (
+    HandlerTotals,
+    _Profiler,
+    format_collapsed,
+    get_slowest_handlers,
+)
+
+
+class TestProfiler:
+    def test_format_collapsed(self) -> None:
+        stacks = Counter({"MainThread;main (main.py:1);route (main.py:2)": 3})
+        stacks["MainThread;main (main.py:1)"] += 1
+
+        assert format_collapsed(stacks) == (
+            "MainThread;main (main.py:1) 1\n"
+            "MainThread;main (main.py:1);route (main.py:2) 3\n"
+        )
+
+    def test_get_slowest_handlers(self) -> None:
+        before: HandlerTotals = {
+            ("/start",): (1.0, 10.0),
+            ("/list",): (2.0, 1.0),
+        }
+        after: HandlerTotals = {
+            ("/start",): (1.5, 12.0),
+            ("/list",): (2.0, 1.0),
+            ("/help",): (0.1, 1.0),
+            ("button",): (0.8, 2.0),
+        }
+
+        assert get_slowest_handlers(before, after, 2) == [
+            ("button", 2, 0.4),
+            ("/start", 2, 0.25),
+        ]
+
+    def test_profile(self, tmp_path: Path) -> None:
+        def busy_handler() -> None:
+            deadline = time.monotonic() + 0.2
+            while time.monotonic() < deadline:
+                pass
+
+        thread = threading.Thread(target=busy_handler, name="busy")
+        profiler = _Profiler()
+        with patch.dict(
+            "src.profiler.PROFILER_SETTINGS",
+            {"path": str(tmp_path), "interval": 0.001},
+        ):
+            thread.start()
+            future = profiler.start(0.1)
+            assert profiler.running
+            with pytest.raises(RuntimeError):
+                profiler.start(0.1)
+            folded, report = future.result(timeout=5)
+            thread.join()
+
+        assert not profiler.running
+        assert Path(folded).parent == tmp_path
+        lines = Path(folded).read_text(encoding="utf-8").splitlines()
+        assert any(
+            line.startswith("busy;") and "busy_handler (test_profiler.py:" in line
+            for line in lines
+        )
+        assert not any(line.startswith("profiler;") for line in lines)
+        assert Path(report).read_text(encoding="utf-8").startswith("Длительность")
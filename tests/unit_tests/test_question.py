@@ -224,7 +224,8 @@ class TestQuestion:
                 question._widget_body = widget_body
             question._answer = self_answer
             question._answer_explanation = self_answer_explanation
-            await question.check(-1, answer)
+            is_right = await question.check(-1, answer)
+            assert is_right == (len(set_arguments) == 2)
             mock_user_get.assert_has_calls(get_arguments)
             mock_user_set.assert_has_calls(set_arguments)
 
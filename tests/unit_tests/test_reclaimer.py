@@ -0,0 +1,55 @@
+import os
+import time
+from pathlib import Path
+from unittest.mock import Mock, call, patch
+
+from src.reclaimer import TRASH_DIRECTORY, _Reclaimer
+
+
+def _wait_empty(path: Path) -> None:
+    deadline = time.monotonic() + 5
+    while os.listdir(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class TestReclaimer:
+    def test_delete(self, tmp_path: Path) -> None:
+        directory = tmp_path / "1" / "2"
+        directory.mkdir(parents=True)
+        (directory / "test.json").write_text("{}")
+        reclaimer = _Reclaimer(str(tmp_path), workers=2, batch_size=10)
+
+        reclaimer.delete(1, 2)
+        reclaimer.delete(1, 3)
+
+        # Номер теста освобождается сразу
+        assert not directory.exists()
+        _wait_empty(tmp_path / TRASH_DIRECTORY)
+        assert os.listdir(tmp_path / TRASH_DIRECTORY) == []
+
+    def test_collect(self, tmp_path: Path) -> None:
+        reclaimer = _Reclaimer(str(tmp_path))
+        assert reclaimer.collect() == 0
+
+        trash = tmp_path / TRASH_DIRECTORY
+        (trash / "1-2-3").mkdir(parents=True)
+        (trash / "1-2-3" / "test.json").write_text("{}")
+        (trash / "1-3-4").mkdir()
+
+        assert reclaimer.collect() == 2
+        _wait_empty(trash)
+        assert os.listdir(trash) == []
+
+    @patch("src.reclaimer.time.sleep")
+    @patch("src.reclaimer.shutil.rmtree")
+    def test_retries(self, mock_rmtree: Mock, mock_sleep: Mock, tmp_path: Path) -> None:
+        reclaimer = _Reclaimer(str(tmp_path), retries=3, retry_delay=1)
+
+        mock_rmtree.side_effect = [OSError, None]
+        assert reclaimer._remove(str(tmp_path))
+        mock_sleep.assert_called_once_with(1)
+
+        mock_sleep.reset_mock()
+        mock_rmtree.side_effect = OSError
+        assert not reclaimer._remove(str(tmp_path))
+        assert mock_sleep.mock_calls == [call(1), call(2)]
@@ -0,0 +1,66 @@
+from typing import cast
+from unittest.mock import Mock, patch
+
+from fakeredis import FakeStrictRedis
+
+from src.metrics import REDIS_COMMANDS, REDIS_COMMANDS_PER_UPDATE, track_update
+from src.redis_client import InstrumentedRedis
+from src.tracing import start_trace
+
+
+def create_client() -> InstrumentedRedis:
+    return InstrumentedRedis(
+        connection_pool=FakeStrictRedis(decode_responses=True).connection_pool
+    )
+
+
+class TestInstrumentedRedis:
+    def test_commands_are_counted(self) -> None:
+        client = create_client()
+        commands = REDIS_COMMANDS.get(command="HSET")
+        total = REDIS_COMMANDS_PER_UPDATE.get_sum()
+
+        with track_update("/start"):
+            client.hset("1", "state", "0")
+            pipeline = client.pipeline(transaction=False)
+            pipeline.hset("1", "question_index", "0")
+            pipeline.hgetall("1")
+            assert pipeline.execute() == [1, {"state": "0", "question_index": "0"}]
+
+        assert REDIS_COMMANDS.get(command="HSET") == commands + 2
+        assert REDIS_COMMANDS_PER_UPDATE.get_sum() == total + 3
+
+    def test_watched_commands_are_counted(self) -> None:
+        client = create_client()
+        client.set("key", "1")
+        commands = REDIS_COMMANDS.get(command="GET")
+
+        with client.pipeline() as pipeline:
+            pipeline.watch("key")
+            # После WATCH конвейер выполняет команды сразу
+            assert cast(str, pipeline.get("key")) == "1"
+            pipeline.multi()
+            pipeline.set("key", "2")
+            pipeline.execute()
+
+        assert REDIS_COMMANDS.get(command="GET") == commands + 1
+        assert client.get("key") == "2"
+
+    @patch("src.tracing.exporter")
+    @patch.dict("src.tracing.TRACING_SETTINGS", {"sample_rate": 1.0})
+    def test_commands_are_traced(self, mock_exporter: Mock) -> None:
+        client = create_client()
+        with start_trace("update"):
+            client.hgetall("1")
+            pipeline = client.pipeline()
+            pipeline.hgetall("1")
+            pipeline.hgetall("2")
+            pipeline.execute()
+
+        spans = [call.args[0] for call in mock_exporter.export.call_args_list]
+        assert [span.name for span in spans] == [
+            "redis HGETALL",
+            "redis PIPELINE",
+            "update",
+        ]
+        assert spans[1].attributes == {"commands": 2}
@@ -0,0 +1,78 @@
+import pytest
+from hypothesis import given
+from hypothesis import strategies as st
+
+from src.session import (
+    SCHEMA_VERSION,
+    decode_session,
+    encode_session,
+    get_schema_version,
+)
+
+FIELD_NAMES = st.sampled_from(
+    [
+        "state",
+        "question_index",
+        "right_answers_number",
+        "active_test",
+        "checked",
+        "jsondata",
+        "active_version",
+        "question",
+    ]
+)
+# Небольшой алфавит с многобайтными символами UTF-8: произвольный текст
+# генерируется слишком медленно для проверки здоровья hypothesis
+VALUES = st.one_of(
+    st.integers(min_value=0).map(str),
+    st.text(alphabet='0123456789abc_/[], {}"ёЯ€🙂', max_size=32),
+)
+
+
+class TestSession:
+    def test_encode_decode(self) -> None:
+        session = {
+            "active_test": "/test_test",
+            "question_index": "12",
+            "right_answers_number": "3",
+            "checked": "[1, 3]",
+        }
+        data = encode_session(session)
+        assert data[0] == SCHEMA_VERSION
+        assert decode_session(data) == session
+        assert len(data) < sum(len(key) + len(value) for key, value in session.items())
+
+    def test_non_canonical_numbers(self) -> None:
+        session = {"state": "007", "question_index": "-1", "checked": ""}
+        assert decode_session(encode_session(session)) == session
+
+    def test_empty(self) -> None:
+        assert decode_session(encode_session({})) == {}
+
+    @pytest.mark.parametrize(
+        "data", [b"", b"\x00\x00\x00", bytes((SCHEMA_VERSION + 1, 0, 0))]
+    )
+    def test_unknown_version(self, data: bytes) -> None:
+        with pytest.raises(ValueError):
+            decode_session(data)
+
+    def test_previous_version(self) -> None:
+        # Запись версии 1: active_test - известное поле, active_version - нет
+        data = bytes((1, 0b1000, 2)) + b"/t" + b"\x01\x0eactive_version\x02ab"
+        session = {"active_test": "/t", "active_version": "ab"}
+        assert get_schema_version(data) == 1
+        assert decode_session(data) == session
+
+        encoded = encode_session(session)
+        assert get_schema_version(encoded) == SCHEMA_VERSION
+        assert decode_session(encoded) == session
+        assert len(encoded) < len(data)
+
+    def test_truncated(self) -> None:
+        data = encode_session({"active_test": "/test_test"})
+        with pytest.raises(ValueError):
+            decode_session(data[:-3])
+
+    @given(st.dictionaries(FIELD_NAMES, VALUES))
+    def test_round_trip(self, session: dict[str, str]) -> None:
+        assert decode_session(encode_session(session)) == session
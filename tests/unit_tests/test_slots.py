@@ -0,0 +1,44 @@
+import pytest
+
+from src.question import Question
+from src.slots import cached_slot
+from src.test import Test
+
+
+class TestCachedSlot:
+    def test_cached(self) -> None:
+        class Counter:
+            __slots__ = ("calls", "_cached_value")
+
+            def __init__(self) -> None:
+                self.calls = 0
+
+            @cached_slot
+            def value(self) -> int:
+                self.calls += 1
+                return self.calls
+
+        counter = Counter()
+        assert counter.value == 1
+        assert counter.value == 1
+        assert counter.calls == 1
+
+    def test_missing_slot(self) -> None:
+        # До Python 3.12 ошибка __set_name__ оборачивается в RuntimeError
+        with pytest.raises((RuntimeError, TypeError)) as error:
+
+            class Broken:
+                __slots__ = ()
+
+                @cached_slot
+                def value(self) -> int:
+                    return 1
+
+        assert "_cached_value" in str(error.value.__cause__ or error.value)
+
+    @pytest.mark.parametrize(
+        "instance",
+        [Question("", None, "", None), Test("/test", "", None, [], None)],
+    )
+    def test_no_dict(self, instance: object) -> None:
+        assert not hasattr(instance, "__dict__")
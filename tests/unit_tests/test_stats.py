@@ -0,0 +1,93 @@
+from unittest.mock import Mock, patch
+
+from fakeredis import FakeStrictRedis
+
+from src.answers import AnswerEvent, FinishEvent
+from src.commands import COMMANDS_PREFIX
+from src.constants import REDIS_SETTINGS
+from src.stats import STATS_PREFIX, Stats, format_stats
+
+
+def _answer(question: int, right: bool, version: str = "1") -> AnswerEvent:
+    return AnswerEvent(
+        "answer", 0.0, 1, "/test_test", version, question, "Да", right, None
+    )
+
+
+def _finish(right: int, stopped: bool, seconds: float) -> FinishEvent:
+    return FinishEvent("finish", 0.0, 1, "/test_test", "1", right, 2, stopped, seconds)
+
+
+@patch("src.stats.User", Mock(redis_=None))
+class TestStats:
+    def test_update_get_delete(self) -> None:
+        client = FakeStrictRedis(**REDIS_SETTINGS)
+        with patch("src.stats.User.redis_", client):
+            client.set(COMMANDS_PREFIX + "/test_test", "1")
+            Stats.update([_answer(0, True), _answer(1, False), _finish(1, False, 30.0)])
+            Stats.update([_answer(0, False), _finish(0, True, 5.0)])
+            Stats.update([_answer(0, True, version="2")])
+
+            assert Stats.get("/test_test", "1") == {
+                "attempts": "2",
+                "completed": "1",
+                "stopped": "1",
+                "timed": "1",
+                "seconds": "30",
+                "score:0": "1",
+                "score:1": "1",
+                "q0:answers": "2",
+                "q0:right": "1",
+                "q1:answers": "1",
+            }
+            # Статистика новой версии теста не смешивается с прежней
+            assert Stats.get("/test_test", "2") == {
+                "q0:answers": "1",
+                "q0:right": "1",
+            }
+
+            client.hset(STATS_PREFIX + "/test_other:1", "attempts", 1)
+            Stats.delete("/test_test")
+            assert Stats.get("/test_test", "1") == Stats.get("/test_test", "2") == {}
+            assert client.keys(STATS_PREFIX + "*") == [STATS_PREFIX + "/test_other:1"]
+
+    def test_update_skips_deleted_tests(self) -> None:
+        client = FakeStrictRedis(**REDIS_SETTINGS)
+        with patch("src.stats.User.redis_", client):
+            Stats.update([_answer(0, True), _finish(1, False, 30.0)])
+            assert client.keys(STATS_PREFIX + "*") == []
+
+
+class TestFormatStats:
+    def test_format_stats(self) -> None:
+        stats = {
+            "attempts": "4",
+            "completed": "3",
+            "stopped": "1",
+            "timed": "3",
+            "seconds": "225",
+            "score:0": "1",
+            "score:2": "2",
+            "q0:answers": "4",
+            "q0:right": "3",
+            "q1:answers": "3",
+            "q1:right": "1",
+            "q2:answers": "3",
+        }
+        assert format_stats("/test_test", stats, top=2) == (
+            "Статистика теста /test_test\n"
+            "Прохождений: 4 (до конца: 3, остановлено: 1)\n"
+            "Среднее время прохождения: 1 мин 15 с\n"
+            "Количество правильных ответов:\n"
+            "0: ▇▇▇▇▇▇▇▇▇▇ 1\n"
+            "1: 0\n"
+            "2: ▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇ 2\n"
+            "Самые сложные вопросы:\n"
+            "3 - 100% неправильных ответов из 3\n"
+            "2 - 67% неправильных ответов из 3"
+        )
+
+    def test_no_attempts(self) -> None:
+        assert format_stats("/test_test", {}) == (
+            "Статистика теста /test_test\nТест еще никто не прошел."
+        )
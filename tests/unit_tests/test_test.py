@@ -2,6 +2,8 @@ from typing import Any, Optional, Union
 from unittest.mock import AsyncMock, Mock, call, patch
 
 import pytest
+from hypothesis import given
+from hypothesis import strategies as st
 from telegram import ReplyKeyboardMarkup, ReplyKeyboardRemove
 
 from src.question import Question
@@ -209,6 +211,8 @@ class TestFinish:
             ),
         ],
     )
+    @patch("src.test.Versions")
+    @patch("src.test.answers")
     @patch("src.test.User.delete")
     @patch("src.test.Question.__init__", return_value=None)
     @patch("src.test.Test.__init__", return_value=None)
@@ -218,6 +222,8 @@ class TestFinish:
         mock__init__: Mock,
         mock_question__init__: Mock,
         mock_user_delete: Mock,
+        mock_answers: Mock,
+        mock_versions: Mock,
         result_explanation: dict[int, str],
         get_arguments: list[int],
         is_stop: bool,
@@ -227,13 +233,21 @@ class TestFinish:
         with patch(patch_, new_callable=AsyncMock) as mock_bot_action, patch(
             "src.test.User.get",
         ) as mock_user_get:
-            mock_user_get.side_effect = get_arguments
+            # Тест начат с версией "1", а заканчивается по текущей версии "2"
+            mock_user_get.side_effect = [*get_arguments, "1"]
 
             test = Test("", "", None, [], None)
+            test._command = "/test_test"
+            test._version = "2"
             test._questions = [Question("", {}, "", None) for i in range(10)]
             test._result_explanation = result_explanation
             await test._finish(-1, is_stop)
 
+            mock_answers.finish.assert_called_once_with(
+                -1, "/test_test", "2", get_arguments[0], 10, is_stop
+            )
+            mock_versions.release.assert_called_once_with("/test_test", "1")
+
             mock_bot_action.assert_has_awaits([mock_call])
             mock_user_delete.assert_has_calls(
                 [
@@ -244,6 +258,65 @@ class TestFinish:
             )
 
 
+def _find_result_explanation_linearly(
+    result_explanation: dict[int, str], right_answers_number: int
+) -> str:
+    """Прежний линейный поиск промежутка объяснения результата."""
+    result_explanation_keys = list(result_explanation.keys())
+    for i in range(len(result_explanation_keys)):
+        if right_answers_number < result_explanation_keys[i]:
+            break
+
+    if right_answers_number > result_explanation_keys[i]:
+        return result_explanation[
+            result_explanation_keys[len(result_explanation_keys) - 1]
+        ]
+    elif right_answers_number == result_explanation_keys[i]:
+        return result_explanation[right_answers_number]
+    elif i == 0:
+        return "Объяснение результата отсутствует."
+    return result_explanation[result_explanation_keys[i - 1]]
+
+
+class TestFindResultPayload:
+    @given(
+        keys=st.sets(st.integers(min_value=0, max_value=50), min_size=1),
+        right_answers_number=st.integers(min_value=0, max_value=50),
+    )
+    def test_same_as_linear_search(
+        self, keys: set[int], right_answers_number: int
+    ) -> None:
+        with patch("src.test.Test.__init__", return_value=None):
+            test = Test("", "", None, [], None)
+        test._result_explanation = {key: f"Промежуток {key}" for key in sorted(keys)}
+
+        url, text = test._find_result_payload(right_answers_number)
+
+        assert url is None
+        assert text == _find_result_explanation_linearly(
+            test._result_explanation, right_answers_number
+        )
+
+    @given(
+        result_explanation=st.dictionaries(
+            st.integers(min_value=0, max_value=50).map(str),
+            st.text(min_size=1),
+            min_size=1,
+        ),
+        right_answers_number=st.integers(min_value=0, max_value=50),
+    )
+    def test_unsorted_keys(
+        self, result_explanation: dict[str, str], right_answers_number: int
+    ) -> None:
+        test = Test("/test_test", "", None, [], result_explanation)
+
+        _, text = test._find_result_payload(right_answers_number)
+
+        assert text == _find_result_explanation_linearly(
+            test.result_explanation, right_answers_number
+        )
+
+
 class TestTest:
     @patch("src.test.Question")
     def test__init__(self, mock_question: Mock) -> None:
@@ -333,6 +406,7 @@ class TestTest:
         assert first_test > second_test
 
 
+@patch("src.test.answers")
 @patch("src.test.Question.check", new_callable=AsyncMock)
 @patch("src.test.Question.__init__")
 @patch("src.test.Test.__init__")
@@ -347,12 +421,16 @@ class TestCheck:
         mock_test__init__: Mock,
         mock_question__init__: Mock,
         mock_question_check: AsyncMock,
+        mock_answers: Mock,
     ) -> None:
         mock_user_get.return_value = 1
         mock_test__init__.return_value = None
         mock_question__init__.return_value = None
+        mock_question_check.return_value = True
 
         test = Test("", "", None, [], None)
+        test._command = "/test_test"
+        test._version = "1"
         test._questions = [
             Question("", {}, "", None),
             Question("", {}, "", None),
@@ -363,6 +441,10 @@ class TestCheck:
         mock_user_get.assert_called_once_with(-1, "question_index")
         test._questions[1].check.assert_awaited_once_with(-1, "Правильный ответ")  # type: ignore
         test._questions[2].__call__.assert_awaited_once_with(-1)  # type: ignore
+        mock_answers.record.assert_called_once_with(
+            -1, "/test_test", "1", 1, "Правильный ответ", True
+        )
+        mock_answers.ask.assert_called_once_with(-1)
 
     @patch("src.test.Test._finish", new_callable=AsyncMock)
     async def test_check_finish(
@@ -372,18 +454,51 @@ class TestCheck:
         mock_test__init__: Mock,
         mock_question__init__: Mock,
         mock_question_check: Mock,
+        mock_answers: Mock,
     ) -> None:
         mock_user_get.return_value = 1
         mock_test__init__.return_value = None
         mock_question__init__.return_value = None
+        mock_question_check.return_value = False
 
         test = Test("", "", None, [], None)
+        test._command = "/test_test"
+        test._version = "1"
         test._questions = [Question("", {}, "", None), Question("", {}, "", None)]
         await test.check(-1, "Правильный ответ")
 
         mock_user_get.assert_called_once_with(-1, "question_index")
         test._questions[1].check.assert_awaited_once_with(-1, "Правильный ответ")  # type: ignore
         mock_finish.assert_awaited_once_with(-1)
+        mock_answers.record.assert_called_once_with(
+            -1, "/test_test", "1", 1, "Правильный ответ", False
+        )
+        mock_answers.ask.assert_not_called()
+
+    @patch("src.test.Test._finish", new_callable=AsyncMock)
+    async def test_check_unavailable_version(
+        self,
+        mock_finish: AsyncMock,
+        mock_user_get: Mock,
+        mock_test__init__: Mock,
+        mock_question__init__: Mock,
+        mock_question_check: Mock,
+        mock_answers: Mock,
+    ) -> None:
+        # Прохождение начато по версии с большим количеством вопросов
+        mock_user_get.return_value = 2
+        mock_test__init__.return_value = None
+        mock_question__init__.return_value = None
+
+        test = Test("", "", None, [], None)
+        test._command = "/test_test"
+        test._version = "1"
+        test._questions = [Question("", {}, "", None), Question("", {}, "", None)]
+        await test.check(-1, "Ответ")
+
+        mock_question_check.assert_not_called()
+        mock_finish.assert_awaited_once_with(-1)
+        mock_answers.record.assert_not_called()
 
 
 @patch("src.test.Test.__init__", return_value=None)
@@ -392,10 +507,12 @@ class TestCheck:
 @patch("src.test.User.set")
 @patch("src.test.User.delete")
 @patch("src.test.bot.send_message", new_callable=AsyncMock)
+@patch("src.test.answers")
 class TestStart:
     @pytest.mark.asyncio
     async def test_start(
         self,
+        mock_answers: Mock,
         mock_send_message: AsyncMock,
         mock_user_delete: Mock,
         mock_user_set: Mock,
@@ -405,12 +522,14 @@ class TestStart:
     ) -> None:
         test = Test("", "", None, [], None)
         test._command = "/test_test"
+        test._version = "1"
         test._questions = [
             Question("", {}, "", None),
             Question("", {}, "", None),
             Question("", {}, "", None),
         ]
-        await test.start(-1)
+        with patch("src.test.Versions") as mock_versions:
+            await test.start(-1)
 
         mock_user_delete.assert_has_calls([call(-1, "checked")])
         mock_user_set.assert_has_calls(
@@ -418,13 +537,16 @@ class TestStart:
                 call(-1, active_test="/test_test"),
                 call(-1, question_index=0),
                 call(-1, right_answers_number=0),
+                call(-1, active_version="1"),
             ]
         )
+        mock_versions.acquire.assert_called_once_with("/test_test", "1")
 
         mock_calls = mock_send_message.mock_calls[0]
         assert mock_calls.args == (-1, "Тест начался!")
         assert isinstance(mock_calls.kwargs["reply_markup"], ReplyKeyboardRemove)
         test._questions[0].__call__.assert_awaited_once_with(-1)  # type: ignore
+        mock_answers.start.assert_called_once_with(-1)
 
 
 @patch("src.test.Test.__init__", return_value=None)
@@ -0,0 +1,93 @@
+import json
+from pathlib import Path
+from unittest.mock import ANY, Mock, call, patch
+
+import pytest
+
+from src.metrics import DROPPED_SPANS
+from src.tracing import Span, SpanExporter, start_span, start_trace, traced
+
+
+@patch("src.tracing.exporter")
+class TestTracing:
+    @patch.dict("src.tracing.TRACING_SETTINGS", {"sample_rate": 1.0})
+    def test_sampled_trace(self, mock_exporter: Mock) -> None:
+        @traced("tree.search")
+        def search() -> int:
+            return 1
+
+        with start_trace("update", user_id=1) as root:
+            assert root is not None
+            with start_span("telegram sendMessage", chat_id=1) as child:
+                assert child is not None
+                assert child.parent_id == root.span_id
+            assert search() == 1
+
+        spans = [call.args[0] for call in mock_exporter.export.call_args_list]
+        assert [span.name for span in spans] == [
+            "telegram sendMessage",
+            "tree.search",
+            "update",
+        ]
+        assert {span.trace_id for span in spans} == {root.trace_id}
+        assert all(span.end >= span.start for span in spans)
+
+    @patch.dict("src.tracing.TRACING_SETTINGS", {"sample_rate": 0.0})
+    def test_not_sampled_trace(self, mock_exporter: Mock) -> None:
+        with start_trace("update") as root:
+            assert root is None
+            with start_span("redis HGETALL") as child:
+                assert child is None
+
+        mock_exporter.export.assert_not_called()
+
+    @patch.dict("src.tracing.TRACING_SETTINGS", {"sample_rate": 1.0})
+    def test_error(self, mock_exporter: Mock) -> None:
+        with pytest.raises(ValueError):
+            with start_trace("update"):
+                raise ValueError()
+
+        span = mock_exporter.export.call_args.args[0]
+        assert span.to_otlp()["status"] == {"code": 2, "message": "ValueError()"}
+
+    def test_span_without_trace(self, mock_exporter: Mock) -> None:
+        with start_span("redis HGETALL") as span:
+            assert span is None
+
+
+class TestSpanExporter:
+    @patch.dict("src.tracing.TRACING_SETTINGS", {"sample_rate": 1.0})
+    def test_write_to_file(self, tmp_path: Path) -> None:
+        path = tmp_path / "traces.jsonl"
+        exporter = SpanExporter(str(path), None, 10, 1.0)
+        with patch("src.tracing.exporter"):
+            with start_trace("update", command="/start") as span:
+                pass
+
+        assert span is not None
+        exporter.write([span])
+
+        data = json.loads(path.read_text(encoding="utf-8"))
+        otlp_span = data["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+        assert otlp_span["name"] == "update"
+        assert otlp_span["traceId"] == span.trace_id
+        assert otlp_span["attributes"] == [
+            {"key": "command", "value": {"stringValue": "/start"}}
+        ]
+
+    @patch("src.tracing.logger")
+    @patch("src.tracing.time.monotonic")
+    def test_drop(self, mock_monotonic: Mock, mock_logger: Mock) -> None:
+        exporter = SpanExporter("", None, 10, 1.0)
+        batch = [Span("update", "0" * 32, None)]
+        dropped = DROPPED_SPANS.get()
+
+        for now in (100, 130, 160):
+            mock_monotonic.return_value = now
+            exporter._drop(batch * 2, OSError("Connection refused"))
+
+        assert DROPPED_SPANS.get() == dropped + 6
+        assert mock_logger.warning.call_args_list == [
+            call("tracing: %d spans are dropped: %s", 2, ANY),
+            call("tracing: %d spans are dropped: %s", 4, ANY),
+        ]
@@ -1,7 +1,11 @@
+from typing import Optional
 from unittest.mock import Mock, patch
 
+from hypothesis import given
+from hypothesis import strategies as st
 from pytest import Config
 
+from src.singleton import Singleton
 from src.test import Test
 from src.tree import ColorTree, CommandsTestTree, Node
 
@@ -2078,3 +2082,97 @@ class TestDeleteFixup:
         assert c.color.value == "red"
         assert d.color.value == "black"
         assert e.color.value == "black"
+
+
+class TestSizeAndDepth:
+    def test_empty_tree(self, patch_singleton: Config) -> None:
+        assert CommandsTestTree().size == 0
+        assert CommandsTestTree().depth() == 0
+
+    def test_size_and_depth(self, patch_singleton: Config) -> None:
+        nodes = [Node(key=Test(str(number), "", None, [], None)) for number in range(7)]
+        for node in nodes:
+            CommandsTestTree().append(node)
+
+        assert CommandsTestTree().size == 7
+        assert CommandsTestTree().depth() == 4
+
+        CommandsTestTree().delete(nodes[0])
+        assert CommandsTestTree().size == 6
+        assert CommandsTestTree().depth() == 3
+
+
+def check_red_black(node: Optional[Node], parent: Optional[Node] = None) -> int:
+    """Проверяет свойства красно-черного дерева, возвращает черную высоту."""
+    if node is None:
+        return 1
+    assert node.parent is parent
+    if node.color == ColorTree.RED:
+        assert node.left is None or node.left.color == ColorTree.BLACK
+        assert node.right is None or node.right.color == ColorTree.BLACK
+    if node.left is not None:
+        assert node.left.key < node.key
+    if node.right is not None:
+        assert node.key < node.right.key
+    assert (
+        node.height
+        == max(
+            node.left.height if node.left else 0, node.right.height if node.right else 0
+        )
+        + 1
+    )
+    height = check_red_black(node.left, node)
+    assert check_red_black(node.right, node) == height
+    return height + (node.color == ColorTree.BLACK)
+
+
+class TestDeleteInvariants:
+    @given(
+        st.lists(st.integers(0, 10000), unique=True, max_size=200).flatmap(
+            lambda numbers: st.tuples(
+                st.just(numbers),
+                st.lists(st.sampled_from(numbers), unique=True)
+                if numbers
+                else st.just([]),
+            )
+        )
+    )
+    def test_append_and_delete(self, data: tuple[list[int], list[int]]) -> None:
+        numbers, deleted = data
+        with patch.dict(Singleton._instances, clear=True):
+            tree = CommandsTestTree()
+            nodes = {}
+            for number in numbers:
+                nodes[number] = Node(key=Test(f"{number:05d}", "", None, [], None))
+                tree.append(nodes[number])
+            assert tree.root is None or tree.root.color == ColorTree.BLACK
+            check_red_black(tree.root)
+
+            for number in deleted:
+                tree.delete(nodes[number])
+                assert tree.root is None or tree.root.color == ColorTree.BLACK
+                check_red_black(tree.root)
+
+            result: list[str] = []
+            tree._inorder_tree_walk(tree.root, result)
+            assert result == [
+                f"{number:05d} - " for number in sorted(set(numbers) - set(deleted))
+            ]
+            assert tree.size == len(result)
+
+
+class TestReplace:
+    def test_replace(self, patch_singleton: Config) -> None:
+        tree = CommandsTestTree()
+        first = Test("/test_a", "Первая", None, [], None, "1")
+        tree.append(Node(key=first))
+        tree.append(Node(key=Test("/test_b", "", None, [], None)))
+
+        second = Test("/test_a", "Вторая", None, [], None, "2")
+        assert tree.replace(second) is first
+        found = tree.search(Node(Test("/test_a", "", None, [], None)))
+        assert found is not None and found.key is second
+        assert tree.size == 2
+
+        assert tree.replace(Test("/test_c", "", None, [], None)) is None
+        assert tree.size == 2
@@ -1,13 +1,16 @@
-from unittest.mock import patch
+from unittest.mock import Mock, call, patch
 
 import pytest
+import redis
 from fakeredis import FakeStrictRedis
 from pytest import Config
 
+from src.constants import REDIS_SETTINGS
+from src.session import SCHEMA_VERSION, decode_session, encode_session
 from src.user import _User
 
 
-@patch("src.user.redis.StrictRedis", FakeStrictRedis)
+@patch("src.user.InstrumentedRedis", FakeStrictRedis)
 class TestActiveTest:
     def test_get_set_delete(self, patch_singleton: Config) -> None:
         User = _User()
@@ -19,7 +22,10 @@ class TestActiveTest:
         assert User.get(123, "active_test") == "/test_another"
         assert User.get(123, "question") == "2"
 
+        assert User.get_all(123) == {"active_test": "/test_another", "question": "2"}
+
         User.delete(123, "active_test", "question")
+        assert User.get_all(123) == {}
         with pytest.raises(
             ValueError,
         ):
@@ -41,3 +47,246 @@ class TestActiveTest:
         assert User.get_tests(123) == ["/test_test", "/test_user"]
         User.delete_test(123, "/test_user")
         assert User.get_tests(123) == ["/test_test"]
+
+
+@patch.dict("src.user.SESSION_SETTINGS", {"cache_size": 2, "flush_interval": 1000})
+@patch("src.user.InstrumentedRedis", FakeStrictRedis)
+class TestSessionCache:
+    def test_reads_are_cached(self, patch_singleton: Config) -> None:
+        User = _User()
+        User.redis_.hset("1", mapping={"state": "3"})
+        assert User.get(1, "state") == "3"
+
+        User.redis_.hset("1", mapping={"state": "4"})
+        assert User.get(1, "state") == "3"
+        assert User.get_all(1) == {"state": "3"}
+
+    def test_write_behind(self, patch_singleton: Config) -> None:
+        User = _User()
+        User.set(1, state=0, jsondata="{}")
+        User.delete(1, "jsondata")
+        User.set(2, active_test="/test_test")
+
+        assert User.get_all(1) == {"state": "0"}
+        assert User.redis_.hgetall("1") == {}
+
+        User.flush()
+        assert User.redis_.hgetall("1") == {"state": "0"}
+        assert User.redis_.hgetall("2") == {"active_test": "/test_test"}
+
+    def test_eviction_keeps_pending_changes(self, patch_singleton: Config) -> None:
+        User = _User()
+        User.redis_.hset("1", mapping={"state": "3", "jsondata": "{}"})
+        User.get(1, "state")
+        User.set(1, state=4)
+        User.delete(1, "jsondata")
+        User.get_all(2)
+        User.get_all(3)
+
+        assert User.get_all(1) == {"state": "4"}
+
+    def test_failed_flush_is_retried(self, patch_singleton: Config) -> None:
+        User = _User()
+        User.set(1, state=1)
+        with patch.object(_User, "_write", side_effect=redis.ConnectionError):
+            User.flush()
+        User.set(1, question_index=2)
+        assert User.redis_.hgetall("1") == {}
+
+        User.flush()
+        assert User.redis_.hgetall("1") == {"state": "1", "question_index": "2"}
+
+    @patch.dict("src.user.SESSION_SETTINGS", {"flush_interval": 0})
+    def test_write_through(self, patch_singleton: Config) -> None:
+        User = _User()
+        User.set(1, state=1, jsondata="{}")
+        User.delete(1, "jsondata")
+
+        assert User.redis_.hgetall("1") == {"state": "1"}
+
+    def test_replacing_redis_clears_cache(self, patch_singleton: Config) -> None:
+        User = _User()
+        User.set(1, state=1)
+        User.redis_ = FakeStrictRedis(**REDIS_SETTINGS)
+
+        assert User.get_all(1) == {}
+
+
+@patch.dict(
+    "src.user.SESSION_SETTINGS",
+    {"flush_interval": 1000, "session_ttl": 100, "draft_ttl": 200, "sweep_batch": 2},
+)
+@patch("src.user.InstrumentedRedis", FakeStrictRedis)
+@patch("src.user.time.time")
+class TestSweep:
+    def test_sweep(self, mock_time: Mock, patch_singleton: Config) -> None:
+        User = _User()
+        expired = Mock()
+        User.add_expire_callback(expired)
+        mock_time.return_value = 1000
+        User.set(1, active_test="/test_a", question_index=0)
+        User.set(2, state=3, jsondata="{}")
+        User.set(3, active_test="/test_b", state=1)
+        User.flush()
+        assert User.redis_.ttl("1") == 200
+
+        mock_time.return_value = 1150
+        User.set(3, question_index=1)
+        # Пользователь 3 активен (изменения еще не записаны) и не очищается
+        assert User.sweep() == (1, len("active_test/test_aquestion_index0"), True)
+        assert User.sweep() == (0, 0, False)
+        assert User.get_all(1) == {}
+        assert User.get_all(3) == {
+            "active_test": "/test_b",
+            "state": "1",
+            "question_index": "1",
+        }
+
+        # Черновики не изменялись с 1000, прохождение теста 3 - с 1150.
+        # Хеш пользователя 2 к этому времени удален самим redis (EXPIRE),
+        # поэтому очищается только черновик пользователя 3
+        User.flush()
+        mock_time.return_value = 1240
+        assert User.sweep() == (1, len("state1"), True)
+        assert User.sweep() == (0, 0, False)
+        assert User.redis_.hgetall("2") == {}
+        assert User.get_all(3) == {"active_test": "/test_b", "question_index": "1"}
+
+        mock_time.return_value = 1300
+        assert User.sweep() == (1, len("active_test/test_bquestion_index1"), False)
+        assert User.redis_.hgetall("3") == {}
+        assert User.redis_.zcard("sessions:activity") == 0
+        assert User.redis_.zcard("drafts:activity") == 0
+        # Очистка черновика не считается очисткой сессии
+        assert expired.call_args_list == [call(1), call(3)]
+
+
+@patch.dict(
+    "src.user.SESSION_SETTINGS",
+    {"encoding": "packed", "flush_interval": 1000, "session_ttl": 100},
+)
+@patch("src.user.InstrumentedRedis", FakeStrictRedis)
+class TestPackedSessions:
+    def test_write_and_read(self, patch_singleton: Config) -> None:
+        User = _User()
+        User.set(1, active_test="/test_test", question_index=0)
+        User.set(1, question_index=1)
+        User.flush()
+
+        assert User.redis_.exists("1") == 0
+        assert User.redis_.ttl("session:1") == 259200
+        User._sessions.clear()
+        assert User.get_all(1) == {"active_test": "/test_test", "question_index": "1"}
+
+        User.delete(1, "active_test", "question_index")
+        User.flush()
+        assert User.redis_.exists("session:1") == 0
+
+    def test_migrates_hash_on_read(self, patch_singleton: Config) -> None:
+        User = _User()
+        User.redis_.hset("1", mapping={"state": "3", "jsondata": "{}"})
+
+        assert User.get_all(1) == {"state": "3", "jsondata": "{}"}
+        assert User.redis_.exists("1") == 0
+        assert User.redis_.exists("session:1") == 1
+
+    def test_migrates_hash_on_write(self, patch_singleton: Config) -> None:
+        User = _User()
+        User.redis_.hset("1", mapping={"state": "3", "jsondata": "{}"})
+        User.set(1, state=4)
+        User.flush()
+        User._sessions.clear()
+
+        assert User.redis_.exists("1") == 0
+        assert User.get_all(1) == {"state": "4", "jsondata": "{}"}
+
+    def test_corrupted_record_is_dropped(self, patch_singleton: Config) -> None:
+        User = _User()
+        User.redis_.set("session:1", b"\xff\x00")
+
+        assert User.get_all(1) == {}
+        with pytest.raises(ValueError):
+            User.get(1, "state")
+        assert User.redis_.exists("session:1") == 0
+
+    def test_corrupted_record_is_replaced(self, patch_singleton: Config) -> None:
+        User = _User()
+        User.redis_.set("session:1", bytes((SCHEMA_VERSION, 1)))
+        User.set(1, state=2)
+        User.flush()
+        User._sessions.clear()
+
+        assert User.get_all(1) == {"state": "2"}
+
+    def test_migrate(self, patch_singleton: Config) -> None:
+        User = _User()
+        for user_id in range(1, 6):
+            User.redis_.hset(str(user_id), mapping={"state": str(user_id)})
+        User.redis_.hset("1:/test_test", mapping={"2": "/test_test"})
+        # Запись версии схемы 1 с полем active_version среди остальных полей
+        User.redis_.set(
+            "session:6",
+            bytes((1, 0b1000, 2)) + b"/t" + b"\x01\x0eactive_version\x02ab",
+            ex=100,
+        )
+        User.redis_.set("session:7", encode_session({"state": "7"}))
+
+        cursor, migrated = User.migrate()
+        while cursor:
+            cursor, batch_migrated = User.migrate(cursor)
+            migrated += batch_migrated
+
+        assert migrated == 6
+        assert sorted(User.redis_.keys()) == [
+            "1:/test_test",
+            "session:1",
+            "session:2",
+            "session:3",
+            "session:4",
+            "session:5",
+            "session:6",
+            "session:7",
+        ]
+        assert User.get(4, "state") == "4"
+        record = User.redis_.execute_command("GET", "session:6", NEVER_DECODE=[])
+        assert record == encode_session({"active_test": "/t", "active_version": "ab"})
+        assert record[0] == SCHEMA_VERSION
+        assert User.redis_.ttl("session:6") == 100
+
+    @patch("src.user.time.time")
+    def test_sweep(self, mock_time: Mock, patch_singleton: Config) -> None:
+        User = _User()
+        mock_time.return_value = 1000
+        User.set(1, active_test="/test_a", question_index=0, state=2)
+        User.set(2, active_test="/test_b")
+        User.flush()
+        first = {"active_test": "/test_a", "question_index": "0", "state": "2"}
+        reclaimed = (
+            len(encode_session(first))
+            - len(encode_session({"state": "2"}))
+            + len(encode_session({"active_test": "/test_b"}))
+        )
+
+        mock_time.return_value = 1150
+        assert User.sweep() == (2, reclaimed, False)
+        assert User.get_all(1) == {"state": "2"}
+        assert User.redis_.exists("session:2") == 0
+
+    def test_concurrent_write_is_retried(self, patch_singleton: Config) -> None:
+        User = _User()
+        User.set(1, active_test="/test_a", state=2)
+        User.flush()
+        User.set(1, question_index=1)
+
+        def decode(record: bytes) -> dict[str, str]:
+            # Другой процесс изменяет сессию между чтением и записью
+            if mock_decode.call_count == 1:
+                User.redis_.set("session:1", encode_session({"state": "3"}))
+            return decode_session(record)
+
+        with patch("src.user.decode_session", side_effect=decode) as mock_decode:
+            User.flush()
+
+        assert mock_decode.call_count == 2
+        User._sessions.clear()
+        assert User.get_all(1) == {"state": "3", "question_index": "1"}
@@ -37,7 +37,7 @@ class TestValidator:
         validate.Validator(
             errors, command, name, description, questions, result_explanation
         )
-        mock_is_command_right.assert_called_once_with(command, errors)
+        mock_is_command_right.assert_called_once_with(command, errors, True)
         mock_is_name_right.assert_called_once_with(name, errors)
         mock_is_description_right.assert_called_once_with(description, errors)
         mock_are_questions_right.assert_called_once_with(questions, errors)
@@ -92,6 +92,9 @@ class TestIsCommandRight:
             validate.is_command_right(command, errors)
         assert re.match(error, str(errors[0]))
 
+        # Новая версия существующего теста
+        validate.is_command_right(command, errors, is_new=False)
+
 
 class TestIsNameRight:
     """Тест на валидацию имени теста."""
@@ -0,0 +1,28 @@
+from src.test import Test
+from src.versions import _Versions
+
+
+class TestVersions:
+    def test_retired_version_lives_while_used(self) -> None:
+        versions = _Versions()
+        first = Test("/test_test", "", None, [], None, "1")
+        versions.acquire("/test_test", "1")
+        versions.acquire("/test_test", "1")
+
+        versions.retire(first)
+        assert versions.get("/test_test", "1") is first
+
+        versions.release("/test_test", "1")
+        assert versions.get("/test_test", "1") is first
+        versions.release("/test_test", "1")
+        assert versions.get("/test_test", "1") is None
+        assert versions.size == 0
+
+    def test_unused_version_is_not_kept(self) -> None:
+        versions = _Versions()
+        versions.retire(Test("/test_test", "", None, [], None, "1"))
+        assert versions.get("/test_test", "1") is None
+
+        # Прохождение начато до перезапуска процесса
+        versions.release("/test_test", "2")
+        assert versions.size == 0
@@ -0,0 +1,210 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Generator
+from unittest.mock import Mock, patch
+
+import pytest
+from fakeredis import FakeStrictRedis
+from pytest import Config
+
+from src.test import Test
+from src.tree import CommandsTestTree, Node
+from src.user import _User
+from src.watcher import _CatalogWatcher
+
+
+def _content(command: str, name: str = "Тест") -> dict[str, Any]:
+    return {
+        "command": command,
+        "name": name,
+        "questions": [{"body": "2 + 2", "widget": {"type": "input"}, "answer": "4"}],
+    }
+
+
+def _write(path: Path, content: Any) -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(content), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def user(patch_singleton: Config) -> Generator[_User, None, None]:
+    with patch("src.user.InstrumentedRedis", FakeStrictRedis):
+        user = _User()
+    with patch("src.watcher.User", user), patch(
+        "src.commands.User", Mock(redis_=user.redis_)
+    ), patch("src.builder.BuilderTest.__init__", return_value=None):
+        yield user
+
+
+class TestCollect:
+    @patch("src.watcher.time.monotonic")
+    def test_debounce(self, mock_monotonic: Mock, tmp_path: Path) -> None:
+        first = _write(tmp_path / "1" / "1" / "test.json", _content("/test_a"))
+        _write(tmp_path / ".staging" / "tmp" / "test.json", _content("/test_b"))
+        watcher = _CatalogWatcher(str(tmp_path), debounce=2)
+        watcher.start()
+
+        mock_monotonic.return_value = 100
+        assert watcher.collect() == ([], [])
+
+        second = _write(tmp_path / "1" / "2" / "test.json", _content("/test_c"))
+        assert watcher.collect() == ([], [])
+
+        # Файл продолжает изменяться - ожидание начинается заново
+        mock_monotonic.return_value = 101
+        _write(tmp_path / "1" / "2" / "test.json", _content("/test_c", "Другой"))
+        os.remove(first)
+        assert watcher.collect() == ([], [])
+
+        mock_monotonic.return_value = 102
+        assert watcher.collect() == ([], [])
+
+        mock_monotonic.return_value = 103
+        assert watcher.collect() == ([second], [first])
+        assert watcher.collect() == ([], [])
+
+    def test_reverted_change_is_ignored(self, tmp_path: Path) -> None:
+        path = _write(tmp_path / "1" / "1" / "test.json", _content("/test_a"))
+        watcher = _CatalogWatcher(str(tmp_path), debounce=0)
+        watcher.start()
+
+        os.rename(path, path + ".bak")
+        os.rename(path + ".bak", path)
+        assert watcher.collect() == ([], [])
+
+
+class TestPoll:
+    @pytest.mark.asyncio
+    async def test_add_change_remove(self, user: _User, tmp_path: Path) -> None:
+        watcher = _CatalogWatcher(str(tmp_path), debounce=0)
+        watcher.start()
+
+        path = _write(tmp_path / "1" / "3" / "test.json", _content("/test_a"))
+        _write(tmp_path / "1" / "4" / "test.json", {"command": "/test_b"})
+        await watcher.poll()
+        assert CommandsTestTree().sort() == ["/test_a - Тест"]
+        assert user.get_tests_with_numbers(1) == [{"3": "/test_a"}]
+        assert user.redis_.get("command:/test_a") == "1"
+
+        _write(tmp_path / "1" / "3" / "test.json", _content("/test_c"))
+        await watcher.poll()
+        assert CommandsTestTree().size == 1
+        assert CommandsTestTree().sort() == ["/test_c - Тест"]
+        assert watcher._search("/test_c") is not None
+        assert user.get_tests_with_numbers(1) == [{"3": "/test_c"}]
+        assert user.redis_.exists("command:/test_a") == 0
+
+        os.remove(path)
+        await watcher.poll()
+        assert CommandsTestTree().size == 0
+        assert CommandsTestTree().sort() == []
+        assert user.get_tests(1) == []
+        assert user.redis_.exists("command:/test_c") == 0
+
+    @pytest.mark.asyncio
+    async def test_legacy_catalog(self, user: _User, tmp_path: Path) -> None:
+        # Тест добавлен в каталог до появления хеша номеров, после него
+        # загружен еще один тест
+        user.redis_.hset("1:/test_a", mapping={"3": "/test_a"})
+        user.redis_.lpush("1_tests", "1:/test_a")
+        user.redis_.set("command:/test_a", "1")
+        CommandsTestTree().append(Node(Test("/test_a", "Старый", None, [], None)))
+        user.add_test(1, 4, "/test_b", "Тест")
+        watcher = _CatalogWatcher(str(tmp_path), debounce=0)
+        watcher.start()
+
+        path = _write(tmp_path / "1" / "3" / "test.json", _content("/test_a"))
+        await watcher.poll()
+        assert CommandsTestTree().sort() == ["/test_a - Тест"]
+        assert user.get_tests_with_numbers(1) == [{"3": "/test_a"}, {"4": "/test_b"}]
+
+        os.remove(path)
+        await watcher.poll()
+        assert CommandsTestTree().sort() == []
+        assert user.get_tests(1) == ["/test_b"]
+        assert user.redis_.exists("command:/test_a") == 0
+
+    @pytest.mark.asyncio
+    async def test_removed_after_delete(self, user: _User, tmp_path: Path) -> None:
+        watcher = _CatalogWatcher(str(tmp_path), debounce=0)
+        watcher.start()
+        path = _write(tmp_path / "1" / "3" / "test.json", _content("/test_a"))
+        await watcher.poll()
+
+        # /delete, после которого команду занял тест другого автора
+        found = watcher._search("/test_a")
+        assert found is not None
+        CommandsTestTree().delete(found)
+        user.delete_test(1, "/test_a")
+        user.redis_.delete("command:/test_a")
+        watcher.forget(1, 3)
+        assert watcher._commands == {}
+        _write(tmp_path / "2" / "1" / "test.json", _content("/test_a"))
+        await watcher.poll()
+
+        os.remove(path)
+        await watcher.poll()
+        assert watcher._search("/test_a") is not None
+        assert user.get_tests(2) == ["/test_a"]
+
+        # Запись в _commands, не очищенная при /delete, тоже не убирает
+        # тест другого автора
+        watcher._commands[path] = "/test_a"
+        assert watcher._remove(path) is False
+        assert watcher._search("/test_a") is not None
+
+    @pytest.mark.asyncio
+    async def test_invalid_change_keeps_test(self, user: _User, tmp_path: Path) -> None:
+        watcher = _CatalogWatcher(str(tmp_path), debounce=0)
+        watcher.start()
+        path = _write(tmp_path / "1" / "1" / "test.json", _content("/test_a"))
+        _write(tmp_path / "2" / "1" / "test.json", _content("/test_b"))
+        await watcher.poll()
+
+        # Команда занята тестом другого пользователя
+        _write(tmp_path / "1" / "1" / "test.json", _content("/test_b", "Новый"))
+        await watcher.poll()
+        assert CommandsTestTree().size == 2
+        assert watcher._search("/test_a") is not None
+        assert user.get_tests(1) == ["/test_a"]
+
+        with open(path, "w") as file:
+            file.write("{")
+        await watcher.poll()
+        assert watcher._search("/test_a") is not None
+        assert user.get_tests(1) == ["/test_a"]
+
+    @pytest.mark.asyncio
+    async def test_registered_command_is_rejected(
+        self, user: _User, tmp_path: Path
+    ) -> None:
+        watcher = _CatalogWatcher(str(tmp_path), debounce=0)
+        watcher.start()
+        # Команду зарезервировал другой процесс бота
+        user.redis_.set("command:/test_a", "2:token")
+
+        _write(tmp_path / "1" / "1" / "test.json", _content("/test_a"))
+        await watcher.poll()
+        assert CommandsTestTree().size == 0
+        assert CommandsTestTree().sort() == []
+        assert user.get_tests(1) == []
+        assert user.redis_.get("command:/test_a") == "2:token"
+
+    @pytest.mark.asyncio
+    async def test_same_version_is_skipped(self, user: _User, tmp_path: Path) -> None:
+        watcher = _CatalogWatcher(str(tmp_path), debounce=0)
+        watcher.start()
+        path = tmp_path / "1" / "1" / "test.json"
+        _write(path, _content("/test_a"))
+        await watcher.poll()
+        found = watcher._search("/test_a")
+
+        # Файл переписан ботом (например, /update) с тем же содержимым
+        os.utime(path, ns=(0, 0))
+        with patch("src.watcher.Versions") as mock_versions:
+            assert watcher._apply(str(path), _content("/test_a")) is False
+            await watcher.poll()
+        mock_versions.retire.assert_not_called()
+        assert watcher._search("/test_a") is found